@@ -0,0 +1,230 @@
+""" Benchmarks of the indicators and of the kline cache on synthetic candles.
+    Each benchmark is timed on series of several sizes and reports the best time of a few runs,
+    the throughput in rows per second, and the peak memory allocated during one more run.
+    With --compare, results are checked against a previous run and the command fails when a
+    benchmark is slower than in the previous run by more than --threshold.
+    The benchmarks also run on trees older than the kline store, so that results can be compared
+    with the ones of the original code.
+
+        python -m benchmarks.run --output results.json
+        python -m benchmarks.run --sizes 1000 100000 --compare results.json
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+import trading.get_data as get_data
+from trading.indicators import indicators
+try:
+    from trading.store import FIELDS, KlineStore
+except ImportError:  # klines cached in json files only
+    FIELDS, KlineStore = None, None
+
+
+SIZES = [1000, 10000, 100000, 1000000, 5000000]
+# klines are converted from python lists when downloaded, keep the download benchmark reasonable
+MAX_DOWNLOAD_ROWS = 1000000
+MINUTE = 60000
+START = 1577836800000  # 2020-01-01 UTC
+
+
+def synthetic_ohlcv(n, seed=0):
+    """ Random walk candles, one per minute """
+    generator = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(generator.normal(0, 0.001, n)))
+    open_ = np.empty(n)
+    open_[0] = close[0]
+    open_[1:] = close[:-1]
+    spread = np.abs(generator.normal(0, 0.001, n)) * close
+    return pd.DataFrame({
+        "time": START + np.arange(n, dtype=np.float64) * MINUTE,
+        "open": open_,
+        "high": np.maximum(open_, close) + spread,
+        "low": np.minimum(open_, close) - spread,
+        "close": close,
+        "volume": generator.uniform(1, 100, n),
+    })
+
+
+INDICATORS = {
+    "mma": lambda df: indicators.mma(df, 20),
+    "mme": lambda df: indicators.mme(df, 20),
+    "macd": indicators.macd,
+    "bollinger": indicators.bollinger,
+    "stochastic": indicators.stochastic,
+    "rsi": indicators.rsi,
+    "directional_movement": indicators.directional_movement,
+    "parabolic_sar": indicators.parabolic_sar,
+    "ichimoku": indicators.ichimoku,
+}
+if hasattr(indicators, "compute"):
+    INDICATORS["compute"] = lambda df: indicators.compute(df, [
+        "macd", "bollinger", "stochastic", "rsi", "directional_movement", "parabolic_sar", "ichimoku"
+    ])
+
+
+def _klines(df):
+    return [[int(row[0]), *(str(value) for value in row[1:])] for row in df.itertuples(index=False)]
+
+
+def _cache_benchmarks(df):
+    """ get_candle_data() with the klines cached, after a download, and from a legacy json cache """
+    begin, end = int(df["time"].iloc[0]), int(df["time"].iloc[-1])
+    klines = _klines(df) if len(df) <= MAX_DOWNLOAD_ROWS else None
+
+    def remove(folder):
+        if KlineStore is not None:
+            KlineStore(folder, "BENCH", "1m").remove()
+        if os.path.exists(f"{folder}/BENCH_1m_data.json"):
+            os.remove(f"{folder}/BENCH_1m_data.json")
+
+    def write_json(folder):
+        remove(folder)
+        with open(f"{folder}/BENCH_1m_data.json", "w") as fp:
+            json.dump({"data": {"begin": begin, "end": end, "klines": klines if klines is not None else _klines(df)}}, fp)
+
+    def fill(folder):
+        store = KlineStore(folder, "BENCH", "1m")
+        store.write({field: df[field].to_numpy() for field in FIELDS}, [[begin, end]])
+
+    def cached(df, folder):
+        return get_data.get_candle_data("BENCH", begin, end, "1m", folder)
+
+    # without the kline store, get_candle_data() reads the json cache
+    benchmarks = {"get_candle_data_cached": (fill if KlineStore is not None else write_json, cached)}
+    if klines is not None:
+        def download(df, folder):
+            remove(folder)
+            with contextlib.ExitStack() as stack:
+                stack.enter_context(mock.patch.object(get_data, "get_data_from_binance", return_value=klines))
+                if hasattr(get_data, "rate_limiter"):
+                    stack.enter_context(mock.patch.object(get_data.rate_limiter, "acquire", return_value=0))
+                return get_data.get_candle_data("BENCH", begin, end, "1m", folder)
+
+        benchmarks["get_candle_data_download"] = (None, download)
+        if KlineStore is not None:
+            benchmarks["get_candle_data_json_migration"] = (write_json, cached)
+    return benchmarks
+
+
+def measure(function, df, folder, setup=None, repeat=3):
+    """ Best time of repeat runs, and peak memory allocated by one more run """
+    times = []
+    for _ in range(repeat):
+        data = df.copy()
+        if setup:
+            setup(folder)
+        start = time.perf_counter()
+        function(data, folder)
+        times.append(time.perf_counter() - start)
+    data = df.copy()
+    if setup:
+        setup(folder)
+    tracemalloc.start()
+    function(data, folder)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return min(times), peak
+
+
+def run(sizes=SIZES, names=None, repeat=3, log=print):
+    """ Run the benchmarks and return the results as a json-serializable dict """
+    # compile the numba kernels before timing anything
+    warm_up = synthetic_ohlcv(100)
+    for function in INDICATORS.values():
+        function(warm_up.copy())
+
+    results = []
+    for n in sizes:
+        df = synthetic_ohlcv(n)
+        benchmarks = {
+            name: (None, (lambda function: lambda data, folder: function(data))(function))
+            for name, function in INDICATORS.items()
+        }
+        benchmarks.update(_cache_benchmarks(df))
+        with tempfile.TemporaryDirectory() as folder:
+            for name, (setup, function) in benchmarks.items():
+                if names and name not in names:
+                    continue
+                seconds, peak = measure(function, df, folder, setup, repeat if n < 1000000 else 1)
+                result = {
+                    "name": name,
+                    "rows": n,
+                    "seconds": seconds,
+                    "rows_per_second": n / seconds if seconds else None,
+                    "peak_memory_mb": peak / 2**20,
+                }
+                results.append(result)
+                log(f"{name:<32} {n:>9} rows {seconds * 1000:>10.2f} ms "
+                    f"{result['rows_per_second'] or 0:>14,.0f} rows/s {result['peak_memory_mb']:>9.1f} MB")
+
+    return {
+        "meta": {
+            "date": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+            "numba": _numba_version(),
+            "machine": platform.machine(),
+        },
+        "results": results,
+    }
+
+
+def _numba_version():
+    try:
+        import numba
+        return numba.__version__
+    except ImportError:
+        return None
+
+
+def compare(results, previous, threshold=0.2):
+    """ Benchmarks slower than in previous by more than threshold (0.2 for 20%),
+        as a list of (name, rows, previous seconds, seconds) """
+    before = {(result["name"], result["rows"]): result["seconds"] for result in previous["results"]}
+    regressions = []
+    for result in results["results"]:
+        key = (result["name"], result["rows"])
+        if key in before and result["seconds"] > before[key] * (1 + threshold):
+            regressions.append((*key, before[key], result["seconds"]))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark indicators and kline cache")
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES)
+    parser.add_argument("--only", nargs="+", help="names of the benchmarks to run")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="json file to save the results to")
+    parser.add_argument("--compare", help="json file of previous results")
+    parser.add_argument("--threshold", type=float, default=0.2)
+    args = parser.parse_args(argv)
+
+    results = run(args.sizes, args.only, args.repeat)
+    if args.output:
+        with open(args.output, "w") as fp:
+            json.dump(results, fp, indent=2)
+    if args.compare:
+        with open(args.compare, "r") as fp:
+            regressions = compare(results, json.load(fp), args.threshold)
+        for name, rows, before, after in regressions:
+            print(f"Regression: {name} on {rows} rows took {after * 1000:.2f} ms instead of {before * 1000:.2f} ms")
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,18 +1,122 @@
 from binance.client import Client
 
+import threading
+from contextlib import contextmanager
+from queue import Empty, LifoQueue
+
+import trading.config as cfg
+
+
+_lock = threading.Lock()
+_credentials = None
+_pool = None
+
 
 def authent(func):
+    """ Pass a client borrowed from the shared pool to func, unless a client is given """
     def wrapper(*args, **kwargs):
-        kwargs["client"] = client()
-        return func(*args, **kwargs)
+        if kwargs.get("client") is not None:
+            return func(*args, **kwargs)
+        with pool().acquire() as kwargs["client"]:
+            return func(*args, **kwargs)
     return wrapper
 
 
+def credentials():
+    """ API key and secret, read from disk once """
+    global _credentials
+    with _lock:
+        if _credentials is None:
+            with open("API_KEY.txt", "r") as f:
+                api_key = f.read()
+            with open("API_SECRET.txt", "r") as f:
+                api_secret = f.read()
+            _credentials = (api_key, api_secret)
+        return _credentials
+
+
 def client():
-    with open("API_KEY.txt", "r") as f:
-        api_key = f.read()
-    
-    with open("API_SECRET.txt", "r") as f:
-        api_secret = f.read()
+    """ New client. Its HTTP session keeps its connections alive between requests. """
+    return Client(*credentials())
+
+
+def close_client(client):
+    """ Close the connections of the HTTP session of a client """
+    client.session.close()
+
+
+class ClientPool:
+    """ Thread-safe pool of at most size clients, created when first needed.
+        A client is used by one thread at a time, as its HTTP session is not thread-safe. """
+    def __init__(self, size=cfg.CLIENT_POOL_SIZE, factory=client):
+        self.size = size
+        self.factory = factory
+        self.idle = LifoQueue()  # the most recently used client has the warmest connection
+        self.created = 0
+        self.lock = threading.Lock()
+        self.closed = False
+
+    def _get(self):
+        try:
+            return self.idle.get_nowait()
+        except Empty:
+            pass
+        with self.lock:
+            if self.closed:
+                raise RuntimeError("The client pool is closed.")
+            create = self.created < self.size
+            if create:
+                self.created += 1
+        if create:
+            try:
+                return self.factory()
+            except Exception:
+                with self.lock:
+                    self.created -= 1
+                raise
+        while True:
+            try:
+                return self.idle.get(timeout=1)
+            except Empty:
+                if self.closed:
+                    raise RuntimeError("The client pool is closed.")
+
+    @contextmanager
+    def acquire(self):
+        """ Borrow a client, waiting for one to be released if size clients are in use """
+        borrowed = self._get()
+        try:
+            yield borrowed
+        finally:
+            if self.closed:
+                close_client(borrowed)
+            else:
+                self.idle.put(borrowed)
+
+    def close(self):
+        """ Close the connections of the idle clients, borrowed ones are closed when released """
+        with self.lock:
+            self.closed = True
+        while True:
+            try:
+                close_client(self.idle.get_nowait())
+            except Empty:
+                return
+
+
+def pool():
+    """ Process-wide client pool, created on first use """
+    global _pool
+    with _lock:
+        if _pool is None:
+            _pool = ClientPool()
+        return _pool
+
 
-    return Client(api_key, api_secret)
+def close_pool():
+    """ Close the process-wide client pool, a new one is created on next use """
+    global _pool
+    with _lock:
+        current, _pool = _pool, None
+    if current is not None:
+        current.close()
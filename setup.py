@@ -15,4 +15,8 @@ setup(
         "PyQt5==5.15.4",
         "finplot==1.6"
     ],
+    extras_require={
+        "fast": ["numba"],
+        "stream": ["websockets"]
+    },
 )
\ No newline at end of file
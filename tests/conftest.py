@@ -1,12 +1,54 @@
 import pytest
 import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+
+DAY = 86400000
+START = 18750 * DAY  # 2021-05-04 00:00 UTC
 
 
 def delete_files():
     for file in os.listdir("tests/coins_data"):
-        os.remove(f"tests/coins_data/{file}")
+        if os.path.isdir(f"tests/coins_data/{file}"):
+            shutil.rmtree(f"tests/coins_data/{file}")
+        else:
+            os.remove(f"tests/coins_data/{file}")
 
 
 @pytest.fixture(scope="session", autouse=True)
 def clean_after_tests(request):
     request.addfinalizer(delete_files)
+
+
+def make_ohlcv(close, start=START, period=DAY, volume=None):
+    """ Candles closing at close, each one opening at the previous close, one per period from start """
+    close = np.asarray(close, dtype=np.float64)
+    open_ = np.append(close[:1], close[:-1])
+    spread = close * 0.01
+    return pd.DataFrame({
+        "time": start + np.arange(len(close), dtype=np.float64) * period,
+        "open": open_,
+        "high": np.maximum(open_, close) + spread,
+        "low": np.minimum(open_, close) - spread,
+        "close": close,
+        "volume": np.ones(len(close)) if volume is None else volume,
+    })
+
+
+@pytest.fixture
+def ohlcv():
+    """ ohlcv(close, start=START, period=DAY): candles with the given closes """
+    return make_ohlcv
+
+
+@pytest.fixture
+def candles():
+    """ candles(n=300, seed=0, start=START, period=DAY): random walk candles """
+    def random_walk(n=300, seed=0, start=START, period=DAY):
+        generator = np.random.default_rng(seed)
+        close = 100 * np.exp(np.cumsum(generator.normal(0, 0.01, n)))
+        return make_ohlcv(close, start, period, volume=generator.uniform(1, 100, n))
+    return random_walk
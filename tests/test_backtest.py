@@ -0,0 +1,90 @@
+from trading.backtest import (
+    Strategy,
+    backtest,
+    backtest_rules,
+    backtest_signals,
+    backtest_strategy,
+    max_drawdown,
+    positions_from_signals
+)
+
+import math
+import numpy as np
+import pandas as pd
+import pytest
+
+
+df = pd.DataFrame({
+    "time": np.arange(6) * 86400000.,
+    "open": [10., 11., 12., 11., 13., 14.],
+    "close": [11., 12., 11., 13., 14., 12.],
+})
+
+
+class BuyThenStop(Strategy):
+    """ Buy on the first candle, sell when the close falls below the entry price """
+    def next(self, index):
+        if index == 0:
+            return True
+        if self.in_position and self.data["close"][index] < self.entry_price:
+            return False
+        return None
+
+
+def test_that_signals_are_filled_at_next_open():
+    result = backtest_signals(df, [True, False, False, False, False, False], [False, False, True, False, False, False],
+                              fee=0, slippage=0)
+
+    # bought at the open of candle 1 (11), sold at the open of candle 3 (11)
+    assert result.trades.to_dict("records") == [
+        {"entry_time": 86400000., "entry_price": 11., "exit_time": 3 * 86400000., "exit_price": 11., "return": 0.}
+    ]
+    assert np.allclose(result.equity, [1, 12 / 11, 1, 1, 1, 1])
+    assert result.pnl == pytest.approx(0)
+    assert result.max_drawdown == pytest.approx(1 / 12)
+
+
+def test_that_fees_and_slippage_are_paid():
+    result = backtest_signals(df, [True] + [False] * 5, [False] * 6, fee=0.01, slippage=0.001)
+
+    entry_price = 11 * 1.001
+    assert result.trades["entry_price"].tolist() == [pytest.approx(entry_price)]
+    assert math.isnan(result.trades["exit_time"][0])
+    assert result.equity[-1] == pytest.approx(0.99 * 12 / entry_price)
+    assert result.total_return == pytest.approx(0.99 * 12 / entry_price - 1)
+
+
+def test_that_event_loop_matches_signals():
+    expected = backtest_signals(df, [True] + [False] * 5, [False, False, True, False, False, False])
+    result = backtest_strategy(df, BuyThenStop())
+
+    assert np.allclose(result.equity, expected.equity)
+    assert result.trades.equals(expected.trades)
+    assert result.sharpe == pytest.approx(expected.sharpe)
+
+
+@pytest.mark.parametrize("entries, exits, positions", [
+    ([1, 0, 0, 0], [0, 0, 1, 0], [1, 1, 0, 0]),
+    ([0, 1, 1, 0], [0, 0, 0, 0], [0, 1, 1, 1]),
+    ([1, 0, 1, 0], [1, 0, 0, 1], [0, 0, 1, 0]),
+])
+def test_that_positions_follow_signals(entries, exits, positions):
+    assert positions_from_signals(entries, exits).tolist() == [bool(p) for p in positions]
+
+
+def test_that_drawdown_is_measured():
+    assert max_drawdown(np.array([1., 2., 1.5, 3., 1.])) == pytest.approx(2 / 3)
+    assert max_drawdown(np.array([])) == 0
+
+
+def test_that_rules_are_backtested(mocker):
+    rising = df.assign(up=[1., 1., 0., 1., 1., 0.])
+    without_exit = backtest_rules(rising, "up > 0", fee=0, slippage=0)
+    with_exit = backtest_rules(rising, "up > 0", "close < open", fee=0, slippage=0)
+
+    assert len(without_exit.trades) == 2
+    assert len(with_exit.trades) == 2
+    assert with_exit.trades["exit_time"].tolist()[:1] == [3 * 86400000.]
+
+    mocker.patch("trading.backtest.get_candle_data", return_value=pd.DataFrame())
+    assert backtest("ETHUSDT", "RSI14 < 30").trades.empty
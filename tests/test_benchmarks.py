@@ -0,0 +1,46 @@
+from benchmarks.run import compare, main, run, synthetic_ohlcv
+import benchmarks.run
+
+import json
+
+
+def test_that_synthetic_candles_are_consistent():
+    df = synthetic_ohlcv(1000)
+
+    assert len(df) == 1000
+    assert (df["high"] >= df[["open", "close"]].max(axis=1)).all()
+    assert (df["low"] <= df[["open", "close"]].min(axis=1)).all()
+    assert df["time"].is_monotonic_increasing
+
+
+def test_that_benchmarks_are_saved_and_compared(tmp_path, capsys):
+    output = tmp_path / "results.json"
+
+    assert main(["--sizes", "300", "--repeat", "1", "--output", str(output)]) == 0
+
+    with open(output, "r") as fp:
+        results = json.load(fp)
+    names = {result["name"] for result in results["results"]}
+    assert {"rsi", "ichimoku", "compute", "get_candle_data_cached", "get_candle_data_download"} <= names
+    assert all(result["rows"] == 300 and result["rows_per_second"] > 0 for result in results["results"])
+
+    faster = {"results": [dict(result, seconds=result["seconds"] / 10) for result in results["results"]]}
+    assert len(compare(results, faster)) == len(results["results"])
+    assert compare(results, results) == []
+
+
+def test_that_benchmarks_can_be_selected():
+    results = run([200], names=["rsi"], repeat=1, log=lambda line: None)
+
+    assert [result["name"] for result in results["results"]] == ["rsi"]
+
+
+def test_that_cache_benchmarks_run_without_the_kline_store(monkeypatch):
+    # trees older than the kline store cache the klines in json files
+    monkeypatch.setattr(benchmarks.run, "KlineStore", None)
+    names = ["get_candle_data_cached", "get_candle_data_download", "get_candle_data_json_migration"]
+
+    results = run([200], names=names, repeat=1, log=lambda line: None)
+
+    assert [result["name"] for result in results["results"]] == names[:2]
+    assert all(result["rows_per_second"] > 0 for result in results["results"])
@@ -0,0 +1,119 @@
+import numpy as np
+import pytest
+
+from trading.indicators.cache import IndicatorCache, indicator_params
+from trading.indicators.indicators import compute, compute_columns
+
+
+INDICATORS = [
+    ("mma", {"nb": 20}),
+    ("mme", {"nb": 12}),
+    "macd",
+    "bollinger",
+    "stochastic",
+    "rsi",
+    "directional_movement",
+    "parabolic_sar",
+    "ichimoku",
+]
+
+
+def assert_same_columns(expected, result):
+    assert set(expected) == set(result)
+    for column in expected:
+        np.testing.assert_allclose(result[column], expected[column], rtol=1e-12, atol=1e-12, err_msg=column)
+
+
+def test_that_params_are_filled_with_defaults():
+    assert indicator_params("rsi") == {"nb": 14}
+    assert indicator_params("macd", {"signal": 5}) == {"mme_short": 12, "mme_long": 26, "signal": 5}
+    with pytest.raises(TypeError):
+        indicator_params("rsi", {"unknown": 1})
+
+
+@pytest.mark.parametrize("indicator", INDICATORS)
+def test_that_cached_columns_match_compute(indicator, candles):
+    df = candles(300)
+    cache = IndicatorCache(folder=None)
+    expected = compute_columns(df, [indicator])
+
+    assert_same_columns(expected, cache.compute_columns("ETHUSDT", "1d", df, [indicator]))
+    assert_same_columns(expected, cache.compute_columns("ETHUSDT", "1d", df, [indicator]))
+    assert (cache.misses, cache.hits) == (1, 1)
+
+
+@pytest.mark.parametrize("indicator", INDICATORS)
+def test_that_appended_candles_only_extend_the_columns(indicator, candles):
+    df = candles(400)
+    cache = IndicatorCache(folder=None)
+    cache.compute_columns("ETHUSDT", "1d", df[:250].reset_index(drop=True), [indicator])
+
+    # the last cached candle was still open: its values change when it closes
+    df.loc[249, ["high", "close"]] += 1
+    for end in (300, 301, 330, 400):
+        assert_same_columns(compute_columns(df[:end], [indicator]),
+                            cache.compute_columns("ETHUSDT", "1d", df[:end], [indicator]))
+    assert (cache.misses, cache.extensions) == (1, 4)
+
+
+def test_that_other_candles_are_computed_again(candles):
+    cache = IndicatorCache(folder=None)
+    cache.columns("ETHUSDT", "1d", candles(100), "rsi")
+    cache.columns("ETHUSDT", "1d", candles(100, seed=1).assign(time=lambda df: df["time"] + 1), "rsi")
+    cache.columns("ETHUSDT", "1d", candles(50), "rsi")
+    cache.columns("ETHUSDT", "4h", candles(100), "rsi")
+    cache.columns("ETHUSDT", "1d", candles(100), "rsi", {"nb": 10})
+    assert cache.misses == 5
+
+
+def test_that_memory_is_bounded(candles):
+    df = candles(1000)
+    entry_bytes = 1000 * 8
+    cache = IndicatorCache(max_bytes=2 * entry_bytes, folder=None)
+    for symbol in ("A", "B", "C"):
+        cache.columns(symbol, "1d", df, "rsi")
+    assert cache.nbytes == 2 * entry_bytes
+    assert [key[0] for key in cache.entries] == ["B", "C"]
+
+    cache.columns("B", "1d", df, "rsi")  # B becomes the most recently used
+    cache.columns("A", "1d", df, "rsi")
+    assert [key[0] for key in cache.entries] == ["B", "A"]
+    assert cache.misses == 4
+
+
+def test_disk_tier(tmp_path, candles):
+    df = candles(200)
+    cache = IndicatorCache(max_bytes=0, folder=str(tmp_path))
+    cache.compute_columns("ETHUSDT", "1d", df[:150], ["rsi", "ichimoku"])
+    assert not cache.entries
+    assert len(list(tmp_path.glob("*.npz"))) == 2
+
+    other = IndicatorCache(folder=str(tmp_path))
+    columns = other.compute_columns("ETHUSDT", "1d", df, ["rsi", "ichimoku"])
+    assert other.extensions == 2
+    assert_same_columns(compute_columns(df, ["rsi", "ichimoku"]), columns)
+
+
+def test_that_indicators_of_indicators_are_computed(candles):
+    df = candles(100)
+    cache = IndicatorCache(folder=None)
+    indicators = ["rsi", ("mma", {"nb": 3, "c_input": "RSI14"}), ("mme", {"nb": 5, "c_input": "RSI14"})]
+
+    for _ in range(2):
+        assert_same_columns(compute_columns(df, indicators), cache.compute_columns("ETHUSDT", "1d", df, indicators))
+    assert (cache.misses, cache.hits) == (1, 1)
+    with pytest.raises(ValueError):
+        cache.columns("ETHUSDT", "1d", df, "mma", {"nb": 3, "c_input": "RSI14"})
+
+
+def test_compute_with_cache(candles):
+    df = candles(100)
+    cache = IndicatorCache(folder=None)
+    expected = compute(df, ["rsi", "macd"])
+    result = cache.compute("ETHUSDT", "1d", df, ["rsi", "macd"])
+    assert list(result.columns) == list(expected.columns)
+    np.testing.assert_allclose(result["MACD(12,26)"], expected["MACD(12,26)"])
+
+    # returned columns are copies
+    result["RSI14"] = 0
+    assert_same_columns(compute_columns(df, ["rsi"]), cache.columns("ETHUSDT", "1d", df, "rsi"))
@@ -0,0 +1,89 @@
+from client import ClientPool, authent, close_pool
+
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
+
+import pytest
+
+
+class FakeSession:
+    def __init__(self):
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class FakeClient:
+    """ Client of python-binance 0.7.10, which has a session but no close_connection() """
+    def __init__(self, *credentials):
+        self.session = FakeSession()
+
+
+def test_that_clients_are_reused():
+    clients = []
+    test_pool = ClientPool(size=2, factory=lambda: clients.append(FakeClient()) or clients[-1])
+
+    for _ in range(5):
+        with test_pool.acquire() as first:
+            with test_pool.acquire() as second:
+                assert first is not second
+
+    assert len(clients) == 2
+
+
+def test_that_pool_size_is_never_exceeded():
+    in_use = []
+    max_in_use = []
+    lock = threading.Lock()
+    test_pool = ClientPool(size=3, factory=FakeClient)
+
+    def use(_):
+        with test_pool.acquire() as borrowed:
+            with lock:
+                assert borrowed not in in_use
+                in_use.append(borrowed)
+                max_in_use.append(len(in_use))
+            time.sleep(0.01)
+            with lock:
+                in_use.remove(borrowed)
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(use, range(30)))
+
+    assert max(max_in_use) == 3
+    assert test_pool.created == 3
+
+
+def test_that_close_closes_clients():
+    test_pool = ClientPool(size=2, factory=FakeClient)
+    with test_pool.acquire() as borrowed:
+        with test_pool.acquire() as idle:
+            pass
+        test_pool.close()
+        assert idle.session.closed and not borrowed.session.closed
+    assert borrowed.session.closed
+
+    with pytest.raises(RuntimeError):
+        with test_pool.acquire():
+            pass
+
+
+def test_that_authent_borrows_from_pool(mocker):
+    mocker.patch("client.credentials", return_value=("key", "secret"))
+    mocker.patch("client.Client", side_effect=FakeClient)
+    close_pool()
+
+    @authent
+    def get_client(client=None):
+        return client
+
+    first = get_client()
+    assert get_client() is first
+    assert get_client(client="given") == "given"
+
+    close_pool()
+    assert first.session.closed
+    assert get_client() is not first
+    close_pool()
@@ -0,0 +1,327 @@
+import json
+import sys
+import types
+
+import pandas as pd
+import pytest
+
+import trading.display.config as cfg
+from trading.indicators.cache import IndicatorCache
+
+
+class Signal:
+    def __init__(self, *types):
+        self.slots = []
+
+    def connect(self, slot):
+        self.slots.append(slot)
+
+    def emit(self, *args):
+        for slot in self.slots:
+            slot(*args)
+
+
+class Anything:
+    """ Stands for the Qt objects and methods the tests do not look at """
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def __call__(self, *args, **kwargs):
+        return Anything()
+
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        return Anything()
+
+
+class Widget(Anything):
+    """ Fake of the Qt widgets, layouts and tab widgets, with the state the tests check """
+    def __init__(self, *args, **kwargs):
+        self.parent = next((arg for arg in args if isinstance(arg, Widget)), None)
+        self.content = next((arg for arg in args if isinstance(arg, str)), "")
+        self.enabled = True
+        self.visible = True
+        self.widgets = []
+        self.pages = []
+        self.index = 0
+        self.currentChanged = Signal()
+
+    def window(self):
+        return self.parent.window() if self.parent is not None else self
+
+    def setEnabled(self, enabled):
+        self.enabled = enabled
+
+    def isEnabled(self):
+        return self.enabled
+
+    def setText(self, text):
+        self.content = text
+
+    def text(self):
+        return self.content
+
+    def show(self):
+        self.visible = True
+
+    def hide(self):
+        self.visible = False
+
+    def addWidget(self, widget, *args, **kwargs):
+        self.widgets.append(widget)
+
+    def removeWidget(self, widget):
+        if widget in self.widgets:
+            self.widgets.remove(widget)
+
+    def addTab(self, tab, text):
+        self.pages.append(tab)
+
+    def currentIndex(self):
+        return self.index
+
+    def currentWidget(self):
+        return self.pages[self.index]
+
+    def setCurrentIndex(self, index):
+        self.index = index
+        self.currentChanged.emit(index)
+
+
+class ViewBox:
+    def __init__(self):
+        self.sigRangeChanged = Signal()
+        self.x_range = (0, 0)
+
+    def viewRange(self):
+        return [list(self.x_range), [0, 1]]
+
+    def setXRange(self, begin, end, padding=None):
+        self.x_range = (begin, end)
+
+
+class Ax:
+    def __init__(self):
+        self.ax_widget = Widget()
+        self.vb = ViewBox()
+        self.items = []
+
+    def overlay(self):
+        return Ax()
+
+
+class Item:
+    def __init__(self, data, ax, **kwargs):
+        self.data = data
+        self.ax = ax
+        self.kwargs = kwargs
+        ax.items.append(self)
+
+    def update_data(self, data):
+        self.data = data
+
+
+def fake_finplot():
+    fplt = types.ModuleType("finplot")
+    fplt.create_plot_widget = lambda window, rows=1: [Ax() for _ in range(rows)]
+    fplt.candlestick_ochl = lambda frame, ax: Item(frame, ax)
+    fplt.volume_ocv = lambda frame, ax: Item(frame, ax)
+    fplt.plot = lambda x, y, ax, **kwargs: Item(pd.DataFrame({"time": list(x), "value": list(y)}), ax, **kwargs)
+    fplt.__getattr__ = lambda name: Anything()
+    return fplt
+
+
+def fake_module(name, **attributes):
+    """ Module of which any other attribute is a class of widgets. The display subclasses skip the
+        __init__ of their Qt class, so each name is its own subclass of Widget. """
+    module = types.ModuleType(name)
+    module.__dict__.update(attributes)
+
+    def widget_class(attribute):
+        setattr(module, attribute, type(attribute, (Widget,), {}))
+        return getattr(module, attribute)
+    module.__getattr__ = widget_class
+    return module
+
+
+DISPLAY_MODULES = ["trading.display.plot", "trading.display.menu", "trading.display.loader", "trading.display.main"]
+
+
+@pytest.fixture
+def display(monkeypatch, tmp_path):
+    """ trading.display modules imported with fakes of PyQt5 and finplot, in a folder with a config.json """
+    fakes = {
+        "PyQt5": fake_module("PyQt5"),
+        "PyQt5.QtWidgets": fake_module("PyQt5.QtWidgets"),
+        "PyQt5.QtGui": fake_module("PyQt5.QtGui"),
+        "PyQt5.QtCore": fake_module("PyQt5.QtCore", Qt=Anything(), pyqtSignal=Signal),
+        "finplot": fake_finplot(),
+        "pyqtgraph": fake_module("pyqtgraph"),
+    }
+    for name, module in fakes.items():
+        monkeypatch.setitem(sys.modules, name, module)
+    for name in DISPLAY_MODULES:
+        monkeypatch.delitem(sys.modules, name, raising=False)
+    import trading.display.main as main
+    import trading.display.menu as menu
+    import trading.display.plot as plot
+    (tmp_path / "trading" / "display").mkdir(parents=True)
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(menu, "indicator_cache", IndicatorCache(folder=None))
+    monkeypatch.setattr(main, "DataLoader", FakeLoader)
+    yield types.SimpleNamespace(main=main, menu=menu, plot=plot)
+    for name in DISPLAY_MODULES:
+        sys.modules.pop(name, None)
+
+
+class FakeLoader:
+    """ Records the loads, the tests finish them with loaded.emit() """
+    def __init__(self, parent=None):
+        self.loaded = Signal()
+        self.failed = Signal()
+        self.loads = []
+
+    def load(self, currency, indicators=()):
+        self.loads.append(currency)
+
+
+def tabs_widget(display, config):
+    with open("trading/display/config.json", "w") as fp:
+        json.dump({"config": config}, fp)
+    state = display.main.State()
+    window = Widget()
+    toolbar = display.menu.IndicatorsToolBar(window, state)
+    return display.main.TabsWidget(window, toolbar, state)
+
+
+def test_that_tabs_are_loaded_when_viewed(display, candles, monkeypatch):
+    monkeypatch.setattr(cfg, "MAX_LOADED_TABS", 2)
+    tabs = tabs_widget(display, {"ETHUSDT": ["rsi"], "BTCUSDT": [], "XRPUSDT": []})
+
+    assert tabs.loader.loads == ["ETHUSDT"]
+    assert not tabs.ind_toolbar.isEnabled()
+    tabs.loader.loaded.emit("ETHUSDT", candles())
+    assert tabs.ind_toolbar.isEnabled()
+    assert tabs.state.currency == "ETHUSDT"
+    assert not tabs.tabs["ETHUSDT"].status.visible
+    assert tabs.candles["ETHUSDT"]["ax_index"] == 2  # the RSI took the second ax
+
+    # the toolbar points to no tab while the one shown is loading
+    tabs.setCurrentIndex(1)
+    assert tabs.loader.loads == ["ETHUSDT", "BTCUSDT"]
+    assert not tabs.ind_toolbar.isEnabled()
+    assert tabs.state.currency is None
+
+    # a tab loaded in the background leaves the toolbar to the tab shown
+    tabs.setCurrentIndex(2)
+    assert "ETHUSDT" not in tabs.recent and "ETHUSDT" not in tabs.candles
+    tabs.loader.loaded.emit("BTCUSDT", candles())
+    assert not tabs.ind_toolbar.isEnabled()
+    assert tabs.state.currency is None
+    tabs.loader.loaded.emit("XRPUSDT", candles())
+    assert tabs.ind_toolbar.isEnabled()
+    assert tabs.state.currency == "XRPUSDT"
+
+    tabs.setCurrentIndex(1)
+    assert tabs.ind_toolbar.isEnabled()
+    assert tabs.state.currency == "BTCUSDT"
+    assert tabs.loader.loads == ["ETHUSDT", "BTCUSDT", "XRPUSDT"]
+
+
+def test_that_a_tab_evicted_while_loading_is_loaded_once(display, candles, monkeypatch):
+    monkeypatch.setattr(cfg, "MAX_LOADED_TABS", 1)
+    tabs = tabs_widget(display, {"ETHUSDT": [], "BTCUSDT": []})
+
+    tabs.setCurrentIndex(1)
+    assert "ETHUSDT" not in tabs.recent
+    tabs.setCurrentIndex(0)
+    assert tabs.loader.loads == ["ETHUSDT", "BTCUSDT"]
+
+    # the first load of ETHUSDT is the one plotted, BTCUSDT was evicted and is dropped
+    tabs.loader.loaded.emit("ETHUSDT", candles())
+    tabs.loader.loaded.emit("BTCUSDT", candles())
+    assert list(tabs.candles) == ["ETHUSDT"]
+    assert tabs.ind_toolbar.isEnabled()
+    assert tabs.state.currency == "ETHUSDT"
+
+    # once loaded, viewing it again starts a new load
+    tabs.setCurrentIndex(1)
+    assert tabs.loader.loads == ["ETHUSDT", "BTCUSDT", "BTCUSDT"]
+    assert not tabs.ind_toolbar.isEnabled()
+
+
+def test_that_a_failed_load_is_started_again(display, monkeypatch):
+    tabs = tabs_widget(display, {"ETHUSDT": []})
+
+    tabs.loader.failed.emit("ETHUSDT", "error")
+    assert tabs.tabs["ETHUSDT"].status.text() == "Could not load ETHUSDT"
+    assert not tabs.ind_toolbar.isEnabled()
+    tabs.activate("ETHUSDT")
+    assert tabs.loader.loads == ["ETHUSDT", "ETHUSDT"]
+
+
+def test_that_lod_plot_follows_the_view(display, candles):
+    ax = Ax()
+    lod = display.plot.LODPlot(candles(5000), ax, volume_ax=ax.overlay())
+    line = display.plot.plot_line(lod, None, candles(5000)["close"], ax=ax, legend="close")
+    assert (lod.level, lod.first, lod.last) == (1, 0, 1250)
+    assert len(lod.candles_item.data) == len(line.data) == 1250
+
+    begin, end = lod.pyramid.times(1)[[100, 200]]
+    ax.vb.setXRange(100, 200)
+    ax.vb.sigRangeChanged.emit()
+
+    times = lod.pyramid.times(0)[lod.first:lod.last]
+    assert lod.level == 0
+    assert len(lod.candles_item.data) == len(lod.volumes_item.data) == len(line.data) == len(times) < 2000
+    assert list(times[list(ax.vb.x_range)]) == [begin, end]
+
+
+def test_that_lod_plot_has_no_candles_to_show(display, candles):
+    ax = Ax()
+    lod = display.plot.LODPlot(candles(0), ax)
+    display.plot.plot_line(lod, None, [], ax=ax)
+
+    assert lod.visible_times() is None
+    ax.vb.sigRangeChanged.emit()
+    assert len(lod.candles_item.data) == 0
+
+
+def test_that_a_currency_without_candles_is_not_plotted(display):
+    tabs = tabs_widget(display, {"ETHUSDT": []})
+
+    tabs.loader.loaded.emit("ETHUSDT", pd.DataFrame())
+    assert tabs.tabs["ETHUSDT"].status.text() == "No candles for ETHUSDT"
+    assert "ETHUSDT" not in tabs.recent and "ETHUSDT" not in tabs.candles
+    assert not tabs.ind_toolbar.isEnabled()
+
+
+@pytest.mark.parametrize("order", [["XRPUSDT", "ETHUSDT"], ["ETHUSDT", "XRPUSDT"]])
+def test_that_tabs_keep_their_own_mma_after_reloads(display, candles, monkeypatch, order):
+    monkeypatch.setattr(cfg, "MAX_LOADED_TABS", 2)
+    tabs = tabs_widget(display, {"ETHUSDT": ["mma-50"], "BTCUSDT": ["mma-10"], "XRPUSDT": []})
+    saved = display.main.saved_indicators
+
+    # ETHUSDT finishes while BTCUSDT is shown
+    tabs.setCurrentIndex(1)
+    tabs.loader.loaded.emit("ETHUSDT", candles())
+    tabs.loader.loaded.emit("BTCUSDT", candles())
+    tabs.ind_toolbar.number_changed_mma("30")
+    tabs.ind_toolbar.show_mma(False)
+    assert saved("ETHUSDT") == ["mma-50"]
+    assert saved("BTCUSDT") == ["mma-10", "mma-30"]
+
+    # ETHUSDT then BTCUSDT are evicted and loaded again, XRPUSDT finishes in the background
+    tabs.setCurrentIndex(2)
+    tabs.setCurrentIndex(0)
+    for currency in order:
+        tabs.loader.loaded.emit(currency, candles())
+    tabs.setCurrentIndex(1)
+    tabs.loader.loaded.emit("BTCUSDT", candles())
+
+    assert tabs.tab_indicators == {"ETHUSDT": ["mma-50"], "BTCUSDT": ["mma-10", "mma-30"], "XRPUSDT": []}
+    assert set(tabs.candles["ETHUSDT"]["lod"].lines) == {"MMA50"}
+    assert set(tabs.candles["BTCUSDT"]["lod"].lines) == {"MMA10", "MMA30"}
+    assert saved("ETHUSDT") == ["mma-50"] and saved("BTCUSDT") == ["mma-10", "mma-30"] and saved("XRPUSDT") == []
+    assert tabs.state.currency == "BTCUSDT" and tabs.ind_toolbar.isEnabled()
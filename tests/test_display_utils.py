@@ -0,0 +1,41 @@
+from trading.display.utils import save, saved_indicators
+
+import pytest
+
+
+class FakeState:
+    def __init__(self, currency):
+        self.currency = currency
+        self.numbers = {"MMA": 20}
+
+
+class FakeToolBar:
+    def __init__(self, currency):
+        self.state = FakeState(currency)
+        self.shown = []
+
+    @save
+    def show_mma(self, number=None):
+        self.shown.append(("mma", number))
+
+    @save
+    def show_rsi(self):
+        self.shown.append(("rsi", None))
+
+
+@pytest.fixture(autouse=True)
+def folder(tmp_path, monkeypatch):
+    (tmp_path / "trading" / "display").mkdir(parents=True)
+    monkeypatch.chdir(tmp_path)
+
+
+def test_that_indicators_are_saved_with_their_number():
+    toolbar = FakeToolBar("ETHUSDT")
+    toolbar.show_mma(number=50)
+    toolbar.show_mma(False)  # triggered by the toolbar, with the number of the toolbar
+    toolbar.show_rsi(False)
+    toolbar.show_mma(number=50)
+
+    assert toolbar.shown == [("mma", 50), ("mma", 20), ("rsi", None)]
+    assert saved_indicators("ETHUSDT") == ["mma-50", "mma-20", "rsi"]
+    assert saved_indicators("BTCUSDT") == []
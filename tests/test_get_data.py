@@ -4,8 +4,10 @@ import pandas as pd
 import numpy as np
 from datetime import datetime
 import math
+import os
 
-from trading.get_data import get_candle_data
+from trading.get_data import get_candle_data, get_candle_data_many
+from trading.store import FIELDS, KlineStore
 import trading.config as cfg
 from trading.utils import date_to_milliseconds
 
@@ -39,7 +41,7 @@ raw_data = {
     }
 }
 
-def mock_get_data_from_api(currency, gran, start_date, end_date):
+def mock_get_data_from_api(currency, gran, start_date, end_date, client=None):
     start_ms = date_to_milliseconds(start_date)
     end_ms = date_to_milliseconds(end_date)
 
@@ -138,6 +140,89 @@ def test_get_data(start, end, gran, content, mocker):
         for j, elt in enumerate(line):
             assert math.isclose(float(elt), float(content["klines"][i][j]))
     if "begin" in content:
-        with open(f"tests/coins_data/ETHUSDT_{gran}_data.json", "r") as fp:
-            data = json.load(fp)["data"]
-        assert data == content
+        store = KlineStore("tests/coins_data", "ETHUSDT", gran)
+        meta = store.meta
+        assert meta["intervals"] == [[content["begin"], content["end"]]]
+        assert store.columns()["time"].tolist() == [kline[0] for kline in content["klines"]]
+        for i, field in enumerate(FIELDS):
+            assert np.allclose(store.column(field), [float(kline[i]) for kline in content["klines"]])
+
+
+def test_that_json_cache_is_migrated(mocker):
+    mocker.patch("trading.get_data.get_data_from_binance", mock_get_data_from_api)
+    klines = raw_data["ETHUSDT"]["4h"]
+    with open("tests/coins_data/BTCUSDT_4h_data.json", "w") as fp:
+        json.dump({"data": {"klines": klines, "begin": klines[0][0], "end": klines[-1][0]}}, fp)
+
+    df = get_candle_data("BTCUSDT", "2021-05-04 02:00:00", "2021-05-05 02:00:00", "4h", folder="tests/coins_data")
+
+    assert not os.path.exists("tests/coins_data/BTCUSDT_4h_data.json")
+    assert len(KlineStore("tests/coins_data", "BTCUSDT", "4h")) == len(klines)
+    assert df["time"].tolist() == [kline[0] for kline in klines]
+
+
+def test_that_only_missing_intervals_are_fetched(mocker):
+    fetch = mocker.patch("trading.get_data.get_data_from_binance", side_effect=mock_get_data_from_api)
+    folder = "tests/coins_data"
+
+    get_candle_data("XRPUSDT", "2021-05-05 00:00:00", "2021-05-05 00:35:00", "15m", folder=folder)
+    get_candle_data("XRPUSDT", "2021-05-05 01:00:00", "2021-05-05 01:35:00", "15m", folder=folder)
+    df = get_candle_data("XRPUSDT", "2021-05-05 00:00:00", "2021-05-05 01:35:00", "15m", folder=folder)
+
+    assert len(df) == 7
+    assert fetch.call_count == 3
+    # only the hole between the two first ranges is requested the third time
+    assert fetch.call_args[0][2:] == (1620167400000, date_to_milliseconds("2021-05-05 01:00:00"))
+
+
+def test_that_empty_intervals_are_not_fetched_again(mocker):
+    fetch = mocker.patch("trading.get_data.get_data_from_binance", side_effect=mock_get_data_from_api)
+
+    for _ in range(2):
+        df = get_candle_data("XLMUSDT", "2021-06-01 00:00:00", "2021-06-05 00:00:00", "1d", folder="tests/coins_data")
+
+    assert df.empty
+    assert fetch.call_count == 1
+
+
+def test_that_refreshing_until_now_appends(mocker, tmp_path):
+    period = 60000
+
+    def mock_exchange(currency, gran, start_date, end_date, client=None):
+        first = math.ceil(date_to_milliseconds(start_date) / period)
+        last = math.floor(date_to_milliseconds(end_date) / period)
+        return [[t * period, "1.0", "2.0", "0.5", "1.5", "10.0"] for t in range(first, last + 1)]
+    fetch = mocker.patch("trading.get_data.get_data_from_binance", side_effect=mock_exchange)
+    begin = date_to_milliseconds("now") - 100 * period
+
+    get_candle_data("ETHUSDT", begin, "now", "1m", folder=str(tmp_path))
+    store_write = mocker.spy(KlineStore, "write")
+    store_append = mocker.spy(KlineStore, "_append")
+    df = get_candle_data("ETHUSDT", begin, "now", "1m", folder=str(tmp_path))
+
+    assert fetch.call_count == 2
+    # the last cached kline is fetched again, the klines are appended rather than rewritten
+    assert fetch.call_args[0][2] % period == 0
+    store_write.assert_not_called()
+    assert store_append.call_count == 1
+    assert np.all(np.diff(df["time"]) == period)
+
+
+def test_that_several_currencies_are_downloaded(mocker):
+    def mock_exchange(currency, gran, start_date, end_date, client=None):
+        assert client == "shared client"
+        if currency == "DELISTED":
+            raise ValueError("Invalid symbol.")
+        return mock_get_data_from_api(currency, gran, start_date, end_date)
+    fetch = mocker.patch("trading.get_data.get_data_from_binance", side_effect=mock_exchange)
+
+    results, errors = get_candle_data_many(
+        ["ADAUSDT", "DOTUSDT", "DELISTED", "ADAUSDT"], "2021-05-04 00:00:00", "2021-05-04 15:00:00", "4h",
+        folder="tests/coins_data", workers=4, retries=2, backoff=0, client="shared client"
+    )
+
+    assert set(results) == {"ADAUSDT", "DOTUSDT"}
+    assert all(len(df) == 4 for df in results.values())
+    assert list(errors) == ["DELISTED"]
+    assert isinstance(errors["DELISTED"], ValueError)
+    assert fetch.call_count == 2 + 3
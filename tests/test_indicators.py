@@ -1,5 +1,6 @@
 from trading.indicators.indicators import (
     bollinger,
+    compute,
     directional_movement,
     macd,
     mma,
@@ -198,3 +199,28 @@ def test_parabolic_sar(values, sar):
 
     for i in range(len(sar)):
         assert math.isclose(sar[i], df["Parabolic_SAR"][i], rel_tol=0.01)
+
+
+def test_that_rsi_handles_flat_prices():
+    df = pd.DataFrame([10.0] * 20, columns=["close"])
+    df = rsi(df)
+
+    assert df["RSI14"].isnull().all()
+
+
+def test_that_compute_matches_indicator_functions():
+    with open("tests/data_adx.json", "r") as fd:
+        data = json.load(fd)["data"]
+    df = pd.DataFrame({"high": data["high"], "low": data["low"], "close": data["close"]})
+
+    result = compute(df, [
+        "parabolic_sar", "directional_movement", "rsi", "rsi", "stochastic", "macd",
+        ("bollinger", {"nb": 20}), ("mma", {"nb": 3, "c_input": "RSI14", "c_output": "RSI14_MMA3"})
+    ])
+    expected = bollinger(macd(stochastic(rsi(directional_movement(parabolic_sar(df.copy()))))))
+
+    assert list(df.columns) == ["high", "low", "close"]
+    assert set(result.columns) == set(expected.columns) | {"RSI14_MMA3"}
+    for column in expected.columns:
+        assert result[column].equals(expected[column])
+    assert math.isclose(result["RSI14_MMA3"].iloc[-1], expected["RSI14"].iloc[-3:].mean())
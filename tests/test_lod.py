@@ -0,0 +1,72 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from trading.display.lod import Pyramid, aggregate_candles, decimate_line
+
+
+def test_that_aggregated_candles_keep_the_extremes(candles):
+    df = candles(10)
+    arrays = aggregate_candles(df, 4)
+
+    np.testing.assert_array_equal(arrays["time"], df["time"][[0, 4, 8]])
+    np.testing.assert_array_equal(arrays["open"], df["open"][[0, 4, 8]])
+    np.testing.assert_array_equal(arrays["close"], df["close"][[3, 7, 9]])
+    np.testing.assert_allclose(arrays["high"], [df["high"][:4].max(), df["high"][4:8].max(), df["high"][8:].max()])
+    np.testing.assert_allclose(arrays["low"], [df["low"][:4].min(), df["low"][4:8].min(), df["low"][8:].min()])
+    np.testing.assert_allclose(arrays["volume"], [df["volume"][:4].sum(), df["volume"][4:8].sum(), df["volume"][8:].sum()])
+
+
+def test_that_decimated_lines_keep_extremes_in_order():
+    values = [np.nan, np.nan, 3, 1, 5, 2, 0, 4, 7, 6]
+    # buckets of 2 points, pairs of buckets: [nan nan 3 1] [5 2 0 4] [7 6]
+    np.testing.assert_array_equal(decimate_line(values, 2), [3, 1, 5, 0, 6])
+    np.testing.assert_array_equal(decimate_line(values, 1), values)
+    np.testing.assert_array_equal(decimate_line([np.nan] * 4, 2), [np.nan, np.nan])
+    assert len(decimate_line(np.arange(1001.), 4)) == 251
+
+
+@pytest.mark.parametrize("n", [100, 5000, 100000])
+def test_pyramid_levels(n, candles):
+    df = candles(n)
+    pyramid = Pyramid(df, factor=4, min_points=500)
+    pyramid.add_line("close", df["close"])
+
+    assert len(pyramid.times(len(pyramid) - 1)) <= 500
+    for level in range(len(pyramid)):
+        assert len(pyramid.lines["close"][level]) == len(pyramid.times(level))
+        assert pyramid.candles[level]["high"].max() == df["high"].max()
+        assert pyramid.lines["close"][level].max() == df["close"].max()
+    with pytest.raises(ValueError):
+        pyramid.add_line("short", df["close"][:-1])
+
+
+def test_that_windows_fit_the_view(candles):
+    df = candles(100000)
+    pyramid = Pyramid(df, factor=4, min_points=500)
+    times = df["time"].to_numpy()
+
+    # whole history: coarse level, zoomed in: candles themselves
+    level, first, last = pyramid.window(times[0], times[-1], max_points=2000, margin=0)
+    assert level == 3 and (first, last) == (0, len(pyramid.times(3)))
+    level, first, last = pyramid.window(times[1000], times[1999], max_points=2000, margin=0.5)
+    assert level == 0 and (first, last) == (500, 2500)
+    assert pyramid.level_for(times[0], times[7999], max_points=2000) == 1
+
+    frame = pyramid.candles_frame(level, first, last)
+    assert list(frame.columns) == ["time", "open", "high", "low", "close", "volume"]
+    pyramid.add_line("close", df["close"])
+    pd.testing.assert_series_equal(pyramid.line_frame("close", level, first, last)["time"], frame["time"])
+
+
+def test_derived_lines(candles):
+    df = candles(20000)
+    pyramid = Pyramid(df, factor=4, min_points=500)
+    pyramid.add_line("high", df["high"])
+    pyramid.add_line("low", df["low"])
+    pyramid.derive_line("lower", np.minimum, "high", "low")
+
+    for level in range(len(pyramid)):
+        np.testing.assert_array_equal(
+            pyramid.lines["lower"][level], np.minimum(pyramid.lines["high"][level], pyramid.lines["low"][level])
+        )
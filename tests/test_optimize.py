@@ -0,0 +1,76 @@
+from trading.backtest import backtest_rules
+from trading.indicators.indicators import compute
+from trading.indicators.plan import ComputePlan
+from trading.optimize import Param, RuleObjective, grid, grid_search, random_search, sample
+
+import numpy as np
+import pytest
+
+
+def distance(plan, a, b):
+    return -abs(a - 3) - abs(b - 0.5)
+
+
+def test_that_grid_covers_space():
+    assert list(grid({"a": [1, 2], "b": ["x", "y"]})) == [
+        {"a": 1, "b": "x"}, {"a": 1, "b": "y"}, {"a": 2, "b": "x"}, {"a": 2, "b": "y"}
+    ]
+
+
+def test_that_samples_are_in_space():
+    combinations = list(sample({"a": (2, 5), "b": (0., 1.), "c": ["x", "y"]}, 50, seed=1))
+
+    assert combinations == list(sample({"a": (2, 5), "b": (0., 1.), "c": ["x", "y"]}, 50, seed=1))
+    assert all(isinstance(params["a"], int) and 2 <= params["a"] <= 5 for params in combinations)
+    assert all(0 <= params["b"] <= 1 for params in combinations)
+    assert {params["c"] for params in combinations} == {"x", "y"}
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_that_best_combination_comes_first(workers, candles):
+    results = grid_search(candles(10), distance, {"a": [1, 2, 3, 4], "b": [0., 0.5]}, workers=workers)
+
+    assert results.columns.tolist() == ["a", "b", "score"]
+    assert len(results) == 8
+    assert results.iloc[0].to_dict() == {"a": 3, "b": 0.5, "score": 0}
+    assert results["score"].is_monotonic_decreasing
+
+
+def test_that_rule_objective_matches_backtest(candles):
+    df = candles()
+    objective = RuleObjective(
+        [("rsi", {"nb": Param("rsi")}), ("parabolic_sar", {"maximum": Param("maximum")})],
+        "RSI{rsi} < 40 and Parabolic_SAR < low", "RSI{rsi} > 60", metric="total_return"
+    )
+    plan = ComputePlan(df)
+
+    for rsi, maximum in [(10, 0.2), (14, 0.1), (10, 0.1)]:
+        expected = backtest_rules(
+            compute(df, [("rsi", {"nb": rsi}), ("parabolic_sar", {"maximum": maximum})]),
+            f"RSI{rsi} < 40 and Parabolic_SAR < low", f"RSI{rsi} > 60"
+        )
+        assert objective(plan, rsi=rsi, maximum=maximum) == pytest.approx(expected.total_return)
+    # price differences are computed once for all the combinations
+    assert ("diff", "close") in plan.results
+
+
+def test_that_plan_drops_periodic_intermediates_beyond_max_bytes(candles):
+    df = candles()
+    plan = ComputePlan(df, max_bytes=2 * len(df) * 8)
+    plan.diff("close")
+    for nb in range(2, 10):
+        plan.mma("close", nb)
+        plan.rolling_max("high", nb)
+
+    assert list(plan.periodic) == [("mma", "close", 9), ("rolling_max", "high", 9)]
+    assert plan.nbytes == 2 * len(df) * 8
+    assert ("diff", "close") in plan.results and ("column", "close") in plan.results
+    np.testing.assert_allclose(plan.mma("close", 3), df["close"].rolling(3).mean())
+
+
+def test_that_random_search_runs_in_processes(candles):
+    objective = RuleObjective([("rsi", {"nb": Param("rsi")})], "RSI{rsi} < 30", "RSI{rsi} > 70")
+    in_process = random_search(candles(), objective, {"rsi": (5, 30)}, n=20, seed=3, workers=1)
+    in_pool = random_search(candles(), objective, {"rsi": (5, 30)}, n=20, seed=3, workers=2)
+
+    assert in_process.equals(in_pool)
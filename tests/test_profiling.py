@@ -0,0 +1,119 @@
+import json
+import threading
+
+import pytest
+
+import trading.get_data as get_data
+import trading.profiling as profiling
+from trading.indicators.indicators import compute
+from tests.test_get_data import mock_get_data_from_api
+
+
+@pytest.fixture
+def profile():
+    profiling.reset()
+    profiling.enable()
+    yield profiling
+    profiling.disable()
+    profiling.reset()
+
+
+def test_disabled_records_nothing():
+    profiling.disable()
+    profiling.reset()
+
+    @profiling.profiled("f")
+    def f(x):
+        return x + 1
+
+    with profiling.span("block"):
+        assert f(1) == 2
+    profiling.count("calls")
+
+    assert profiling.summary().empty
+    assert profiling.counters() == {}
+    assert profiling.chrome_trace()["traceEvents"] == []
+
+
+def test_span_and_profiled(profile):
+    @profile.profiled()
+    def work():
+        return sum(range(1000))
+
+    with profile.span("outer", "test", size=3):
+        for _ in range(3):
+            work()
+    profile.count("items", 2)
+    profile.count("items", 3)
+
+    table = profile.summary().set_index("name")
+    assert table.loc["outer", "calls"] == 1
+    assert table.loc["outer", "category"] == "test"
+    assert table.loc["test_span_and_profiled.<locals>.work", "calls"] == 3
+    assert table.loc["outer", "total_ms"] >= table.loc["test_span_and_profiled.<locals>.work", "total_ms"]
+    assert profile.counters() == {"items": 5}
+
+
+def test_profiled_keeps_exceptions_and_metadata(profile):
+    @profile.profiled("failing")
+    def failing():
+        """ doc """
+        raise ValueError("no")
+
+    with pytest.raises(ValueError):
+        failing()
+    assert failing.__name__ == "failing"
+    assert failing.__doc__ == " doc "
+    assert profile.summary().set_index("name").loc["failing", "calls"] == 1
+
+
+def test_chrome_trace(profile, tmpdir):
+    with profile.span("parent", rows=10):
+        with profile.span("child"):
+            pass
+
+    def in_thread():
+        with profile.span("thread"):
+            pass
+
+    thread = threading.Thread(target=in_thread)
+    thread.start()
+    thread.join()
+    profile.count("klines", 4)
+
+    filename = tmpdir.join("trace.json")
+    profile.export_chrome_trace(str(filename))
+    with open(filename) as fp:
+        events = json.load(fp)["traceEvents"]
+
+    spans = {event["name"]: event for event in events if event["ph"] == "X"}
+    assert set(spans) == {"parent", "child", "thread"}
+    assert spans["parent"]["args"] == {"rows": 10}
+    assert spans["parent"]["ts"] <= spans["child"]["ts"]
+    assert spans["child"]["ts"] + spans["child"]["dur"] <= spans["parent"]["ts"] + spans["parent"]["dur"]
+    assert spans["thread"]["tid"] != spans["parent"]["tid"]
+    assert [event["args"] for event in events if event["ph"] == "C"] == [{"klines": 4}]
+
+
+def test_pipeline_hooks(profile, mocker, tmpdir):
+    mocker.patch("trading.get_data.get_data_from_binance", side_effect=mock_get_data_from_api)
+    mocker.patch.object(get_data.rate_limiter, "acquire", return_value=0)
+    folder = str(tmpdir)
+
+    df = get_data.get_candle_data("ETHUSDT", "2021-05-01 00:00:00", "2021-05-04 23:59:00", "1d", folder)
+    get_data.get_candle_data("ETHUSDT", "2021-05-01 00:00:00", "2021-05-04 23:59:00", "1d", folder)
+    compute(df, ["rsi", "macd"])
+
+    names = set(profile.summary()["name"])
+    assert {"get_candle_data", "cache.migrate_json", "cache.write", "cache.read", "cache.parse_klines",
+            "indicators.rsi", "indicators.macd"} <= names
+    assert profile.summary().set_index("name").loc["get_candle_data", "calls"] == 2
+    assert profile.counters() == {"cache_misses": 1, "cache_reads": 2}
+
+
+def test_summary_columns(profile):
+    with profile.span("a"):
+        pass
+    table = profile.summary()
+    assert list(table.columns) == ["name", "category", "calls", "total_ms", "mean_ms", "max_ms", "percent"]
+    assert 0 <= table["percent"].iloc[0] <= 100
@@ -0,0 +1,28 @@
+from trading.ratelimit import TokenBucket
+
+from concurrent.futures import ThreadPoolExecutor
+import time
+
+
+def test_that_burst_is_not_delayed():
+    bucket = TokenBucket(rate=1, capacity=10)
+
+    assert sum(bucket.acquire(2) for _ in range(5)) == 0
+
+
+def test_that_requests_are_spread_at_rate():
+    bucket = TokenBucket(rate=100, capacity=5)
+    start = time.monotonic()
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        list(executor.map(lambda _: bucket.acquire(1), range(25)))
+
+    # 5 tokens available at once, the next 20 arrive at 100 per second
+    assert 0.18 <= time.monotonic() - start < 0.5
+
+
+def test_that_heavy_request_waits_for_full_bucket():
+    bucket = TokenBucket(rate=100, capacity=5)
+    bucket.acquire(5)
+
+    assert bucket.acquire(8) >= 0.04
+    assert bucket.tokens < 0
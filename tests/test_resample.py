@@ -0,0 +1,112 @@
+from trading.resample import base_granularity, get_resampled_data, resample_arrays
+from trading.store import FIELDS, KlineStore
+
+import numpy as np
+import pandas as pd
+import pytest
+
+
+QUARTER = 15 * 60 * 1000
+HOURS_4 = 16 * QUARTER
+DAY = 96 * QUARTER
+START = 18750 * DAY  # 2021-05-04 00:00 UTC
+
+
+def quarters(n, start=START, seed=0):
+    """ 15m klines with a missing one every 37 klines """
+    generator = np.random.default_rng(seed)
+    close = 100 + generator.normal(0, 1, n).cumsum()
+    arrays = {
+        "time": start + np.arange(n) * QUARTER,
+        "open": close + generator.normal(0, 0.1, n),
+        "high": close + 1,
+        "low": close - 1,
+        "close": close,
+        "volume": generator.uniform(1, 2, n),
+    }
+    keep = np.arange(n) % 37 != 5
+    return {field: values[keep] for field, values in arrays.items()}
+
+
+def test_that_klines_are_aggregated():
+    arrays = quarters(300)
+    df = pd.DataFrame(arrays, index=pd.to_datetime(arrays["time"], unit="ms"))
+    expected = df.resample("4h").agg({
+        "open": "first", "high": "max", "low": "min", "close": "last", "volume": "sum"
+    }).dropna()
+
+    result = resample_arrays(arrays, HOURS_4)
+
+    assert result["time"].tolist() == expected.index.as_unit("ms").astype("int64").tolist()
+    for field in ["open", "high", "low", "close", "volume"]:
+        assert np.allclose(result[field], expected[field])
+    assert all(result[field].dtype == dtype for field, dtype in FIELDS.items())
+
+
+@pytest.fixture
+def folder(tmp_path, mocker):
+    mocker.patch("trading.resample.now_ms", return_value=START + 3 * DAY + 5 * QUARTER)
+    store = KlineStore(tmp_path, "ETHUSDT", "15m")
+    # base klines requested up to now
+    store.merge(quarters(3 * 96 + 5), START, START + 3 * DAY + 5 * QUARTER)
+    return tmp_path
+
+
+def test_that_a_cache_of_the_whole_range_is_used(folder):
+    KlineStore(folder, "ETHUSDT", "1m").write({field: [] for field in FIELDS}, [[START - DAY, START + 4 * DAY]])
+
+    assert base_granularity("ETHUSDT", "1d", START, START + 2 * DAY, folder) == "15m"
+    assert base_granularity("ETHUSDT", "15m", START, START + 2 * DAY, folder) == "1m"
+    assert base_granularity("ETHUSDT", "1m", START, START + 2 * DAY, folder) is None
+    assert base_granularity("BTCUSDT", "1d", START, START + 2 * DAY, folder) is None
+    # the 15m cache ends during the last day, whose candle is still open
+    assert base_granularity("ETHUSDT", "1d", START, START + 3 * DAY, folder) == "15m"
+    # but it ends before the last 4h candle
+    assert base_granularity("ETHUSDT", "4h", START, START + 3 * DAY + HOURS_4, folder) == "1m"
+
+
+def test_that_a_cache_of_part_of_the_range_is_not_used(folder, mocker):
+    download = mocker.patch("trading.resample.get_candle_data", return_value=pd.DataFrame())
+
+    assert base_granularity("ETHUSDT", "1d", START - 30 * DAY, START + 2 * DAY, folder) is None
+    get_resampled_data("ETHUSDT", START - 30 * DAY, START + 2 * DAY, "1d", folder=folder)
+
+    download.assert_called_once_with("ETHUSDT", START - 30 * DAY, START + 2 * DAY, "1d", folder)
+
+
+def test_that_candles_are_derived_and_cached(folder, mocker):
+    fetch = mocker.patch("trading.get_data.get_data_from_binance")
+    expected = resample_arrays(quarters(3 * 96 + 5), DAY)
+
+    df = get_resampled_data("ETHUSDT", START, START + 3 * DAY + 5 * QUARTER, "1d", folder=folder)
+
+    assert not fetch.called
+    # 3 closed candles, and the one of the 4th day, still open
+    assert df["time"].tolist() == [START, START + DAY, START + 2 * DAY, START + 3 * DAY]
+    for field in FIELDS:
+        assert np.allclose(df[field], expected[field])
+    assert len(KlineStore(f"{folder}/resampled", "ETHUSDT", "1d")) == 3
+
+    spy = mocker.spy(KlineStore, "merge")
+    again = get_resampled_data("ETHUSDT", START + 1, START + 3 * DAY, "1d", folder=folder)
+    assert not spy.called
+    assert again["time"].tolist() == [START + DAY, START + 2 * DAY, START + 3 * DAY]
+
+
+def test_that_new_closed_candles_extend_cache(folder, mocker):
+    get_resampled_data("ETHUSDT", START, START + DAY, "4h", folder=folder)
+    assert KlineStore(f"{folder}/resampled", "ETHUSDT", "4h").intervals == [[START, START + DAY + 1]]
+
+    df = get_resampled_data("ETHUSDT", START, START + 3 * DAY, "4h", folder=folder)
+
+    assert len(df) == 18 + 1
+    # the candle opened at START + 3 * DAY is still open
+    assert KlineStore(f"{folder}/resampled", "ETHUSDT", "4h").intervals == [[START, START + 3 * DAY - HOURS_4 + 1]]
+
+
+def test_that_candles_are_downloaded_without_finer_cache(tmp_path, mocker):
+    download = mocker.patch("trading.resample.get_candle_data", return_value=pd.DataFrame())
+
+    get_resampled_data("ETHUSDT", START, START + DAY, "15m", folder=tmp_path)
+
+    download.assert_called_once_with("ETHUSDT", START, START + DAY, "15m", tmp_path)
@@ -0,0 +1,55 @@
+from trading.indicators.rolling import (
+    rolling_deviation,
+    rolling_max,
+    rolling_mean,
+    rolling_min,
+    weighted_mean
+)
+
+import math
+import numpy as np
+import pytest
+
+
+values = [3.0, 1.0, 4.0, 1.0, 5.0, 9.0, 2.0, 6.0]
+
+
+@pytest.mark.parametrize("function, nb, expected", [
+    (rolling_min, 1, values),
+    (rolling_min, 3, [None, None, 1.0, 1.0, 1.0, 1.0, 2.0, 2.0]),
+    (rolling_max, 3, [None, None, 4.0, 4.0, 5.0, 9.0, 9.0, 9.0]),
+    (rolling_max, 8, [None] * 7 + [9.0]),
+    (rolling_max, 9, [None] * 8),
+    (rolling_mean, 2, [None, 2.0, 2.5, 2.5, 3.0, 7.0, 5.5, 4.0]),
+])
+def test_that_rolling_window_is_computed(function, nb, expected):
+    result = function(values, nb)
+
+    assert len(result) == len(expected)
+    for i in range(len(expected)):
+        if expected[i] is None:
+            assert result[i] != result[i]  # method to check for NaN values
+        else:
+            assert math.isclose(expected[i], result[i])
+
+
+def test_that_weighted_mean_uses_last_weight_for_last_point():
+    result = weighted_mean([1.0, 2.0, 4.0], np.array([0.0, 1.0, 3.0]))
+
+    assert result[1] != result[1]
+    assert math.isclose(result[2], (2.0 + 3 * 4.0) / 4)
+
+
+def test_that_nan_only_spreads_to_its_windows():
+    result = rolling_max([1.0, np.nan, 2.0, 3.0, 4.0], 2)
+
+    assert np.isnan(result[:3]).all()
+    assert list(result[3:]) == [3.0, 4.0]
+
+
+def test_that_rolling_deviation_is_computed():
+    means = rolling_mean(values, 4)
+    result = rolling_deviation(values, means, 4)
+
+    assert math.isclose(result[3], np.std(values[:4]))
+    assert math.isclose(result[-1], np.std(values[-4:]))
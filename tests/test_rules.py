@@ -0,0 +1,76 @@
+from trading.rules import Rule, latest_values, screen
+
+import numpy as np
+import pandas as pd
+import pickle
+import pytest
+
+
+df = pd.DataFrame({
+    "low": [1., 2., 3., 4.],
+    "close": [2., 2., 5., 3.],
+    "DI+14": [np.nan, 20., 30., 10.],
+    "DI-14": [np.nan, 10., 20., 30.],
+    "RSI14": [np.nan, 35., 50., 65.],
+    "MACD(12,26)": [0., -1., 1., 2.],
+})
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("DI+14 > DI-14", [False, True, True, False]),
+    ("DI+14 > DI-14 and RSI14 < 40", [False, True, False, False]),
+    ("DI+14 > DI-14 or RSI14 > 60", [False, True, True, True]),
+    ("not close > low", [False, True, False, True]),
+    ("40 < RSI14 <= 65", [False, False, True, True]),
+    ("close - low >= 1", [True, False, True, False]),
+    ("(close - low) / low * 100 > 50", [True, False, True, False]),
+    ("close == -(-2)", [True, True, False, False]),
+    ("`MACD(12,26)` > 0 and DI-14 != 20", [False, False, False, True]),
+    ("not (DI+14 > DI-14 or DI+14 < DI-14)", [False, False, False, False]),
+    # comparisons with NaN values are neither true nor false
+    ("RSI14 != 40", [False, True, True, True]),
+    ("not RSI14 < 40", [False, False, True, True]),
+    ("not (RSI14 < 40 or close > 4)", [False, False, False, True]),
+    ("not (RSI14 < 40 and close > 4)", [True, True, True, True]),
+    ("not 40 < RSI14 <= 65", [False, True, False, False]),
+    ("not not RSI14 != 35", [False, False, True, True]),
+    ("RSI14 < 40 or close == 2", [True, True, False, False]),
+])
+def test_that_rule_is_evaluated_on_history(text, expected):
+    assert Rule(text).evaluate(df).tolist() == expected
+
+
+@pytest.mark.parametrize("text", [
+    "RSI14",
+    "RSI14 <",
+    "RSI14 < 40 and low",
+    "(RSI14 < 40",
+    "RSI14 < 40)",
+    "RSI14 $ 40",
+    "(RSI14 < 40) + 1 > 0",
+])
+def test_that_invalid_rule_is_rejected(text):
+    with pytest.raises(ValueError):
+        Rule(text)
+
+
+def test_that_rules_screen_last_values():
+    frames = [df, df.iloc[:2], pd.DataFrame(), df.drop(columns=["RSI14"])]
+    columns = ["DI+14", "DI-14", "RSI14"]
+    rules = [Rule("DI+14 > DI-14"), Rule("RSI14 > 60")]
+
+    matrix = latest_values(frames, columns)
+    result = screen(matrix, columns, rules)
+
+    assert matrix.shape == (4, 3)
+    assert result.tolist() == [[False, True], [True, False], [False, False], [False, False]]
+
+
+def test_that_rule_checks_last_row():
+    rule = pickle.loads(pickle.dumps(Rule("DI+14 < DI-14 and RSI14 > 60", name="bearish")))
+
+    assert rule.name == "bearish"
+    assert rule(df)
+    assert not rule(df.iloc[:3])
+    assert not rule(df.drop(columns=["RSI14"]))
+    assert not rule(pd.DataFrame())
@@ -0,0 +1,70 @@
+from trading.scanner import SCAN_INDICATORS, load_skip_list, save_skip_list, scan
+
+import numpy as np
+import pandas as pd
+import pytest
+
+
+@pytest.fixture
+def candles(ohlcv):
+    """ Mock of get_candle_data() """
+    def get_candle_data(symbol, begin, end, granularity, folder):
+        if symbol == "EMPTY":
+            return pd.DataFrame()
+        if symbol == "BROKEN":
+            raise ValueError("Invalid symbol.")
+        return ohlcv(np.linspace(1, 2, 50) if symbol == "UP" else np.linspace(2, 1, 50))
+    return get_candle_data
+
+
+def rising(df):
+    return df["close"].iloc[-1] > df["close"].iloc[0]
+
+
+def strong_rsi(df):
+    return df["RSI14"].iloc[-1] > 50
+
+
+def test_that_currencies_are_scanned(mocker, tmp_path, candles):
+    mocker.patch("trading.scanner.get_candle_data", side_effect=candles)
+    skip_file = tmp_path / "empty.json"
+    save_skip_list(["SKIPPED"], skip_file)
+
+    results = {
+        result.symbol: result
+        for result in scan(
+            ["UP", "DOWN", "EMPTY", "BROKEN", "SKIPPED", "UP"], [rising, strong_rsi],
+            skip_file=skip_file, workers=2
+        )
+    }
+
+    assert set(results) == {"UP", "DOWN", "BROKEN"}
+    assert results["UP"].matches == ["rising", "strong_rsi"]
+    assert results["DOWN"].matches == []
+    assert len(results["UP"].tail) == 5
+    assert all(column in results["UP"].tail for column in ["Parabolic_SAR", "ADX14", "RSI14", "Stochastic14"])
+    assert isinstance(results["BROKEN"].error, ValueError)
+    assert load_skip_list(skip_file) == ["EMPTY", "SKIPPED"]
+
+
+def test_that_indicators_and_rule_names_can_be_given(mocker, tmp_path, candles):
+    mocker.patch("trading.scanner.get_candle_data", side_effect=candles)
+
+    results = list(scan(["UP"], {"up": rising}, indicators=[("mma", {"nb": 5})], skip_file=tmp_path / "empty.json", workers=1))
+
+    assert results[0].matches == ["up"]
+    assert "MMA5" in results[0].tail and "RSI14" not in results[0].tail
+    assert "rsi" in SCAN_INDICATORS
+    assert load_skip_list(tmp_path / "empty.json") == []
+
+
+def test_that_indicators_are_cached_between_scans(mocker, tmp_path, candles):
+    mocker.patch("trading.scanner.get_candle_data", side_effect=candles)
+    cache_folder = tmp_path / "indicators"
+
+    first = list(scan(["UP"], [strong_rsi], skip_file=tmp_path / "empty.json", workers=1, cache_folder=str(cache_folder)))
+    second = list(scan(["UP"], [strong_rsi], skip_file=tmp_path / "empty.json", workers=1, cache_folder=str(cache_folder)))
+
+    assert len(list(cache_folder.glob("UP_1d_*.npz"))) == len(SCAN_INDICATORS)
+    assert first[0].matches == second[0].matches == ["strong_rsi"]
+    pd.testing.assert_frame_equal(first[0].tail, second[0].tail)
@@ -0,0 +1,52 @@
+from trading.indicators.indicators import compute
+from trading.scanner import scan
+from trading.shared import SharedFrame, compute_shared
+
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import os
+
+
+def shared_blocks():
+    return {name for name in os.listdir("/dev/shm") if name.startswith("psm_")} if os.path.isdir("/dev/shm") else set()
+
+
+def test_that_frame_is_shared(candles):
+    df = candles()
+    with SharedFrame.create(df, columns=["close", "high"], outputs=["result"]) as frame:
+        attached = SharedFrame.attach(frame.info)
+        attached.column("result")[:] = 1
+        attached_close = attached.to_frame()["close"].to_numpy()
+
+        assert np.array_equal(attached_close, df["close"])
+        assert attached.to_frame().columns.tolist() == ["close", "high"]
+        assert np.all(frame.column("result") == 1)
+        del attached_close
+        attached.close()
+
+
+def test_that_workers_write_indicators(candles):
+    df = candles()
+    blocks = shared_blocks()
+    indicators = ["rsi", "parabolic_sar", ("mma", {"nb": 5})]
+    with SharedFrame.create(df, outputs=["RSI14", "Parabolic_SAR", "MMA5"]) as frame:
+        with ProcessPoolExecutor(max_workers=2) as executor:
+            written = executor.submit(compute_shared, frame.info, indicators).result()
+        result = frame.to_frame(frame.outputs).copy()
+
+    expected = compute(df, indicators)
+    assert written == ["RSI14", "Parabolic_SAR", "MMA5"]
+    for column in written:
+        assert np.allclose(result[column], expected[column], equal_nan=True)
+    assert shared_blocks() == blocks
+
+
+def test_that_early_stop_of_scan_removes_blocks(mocker, tmp_path, candles):
+    mocker.patch("trading.scanner.get_candle_data", side_effect=lambda *args: candles())
+    blocks = shared_blocks()
+
+    results = scan([f"COIN{i}" for i in range(10)], [], skip_file=tmp_path / "empty.json", workers=2)
+    assert next(results).error is None
+    results.close()
+
+    assert shared_blocks() == blocks
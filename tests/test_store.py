@@ -0,0 +1,113 @@
+from trading.store import (
+    FIELDS,
+    KlineStore,
+    klines_to_arrays,
+    merge_intervals,
+    missing_intervals
+)
+
+import numpy as np
+import pytest
+
+
+klines = [
+    [1620086400000, '3431.04000000', '3450.00000000', '3180.61000000', '3232.25000000', '369216.38049000'],
+    [1620100800000, '3232.40000000', '3403.99000000', '3219.10000000', '3313.63000000', '182970.94680000'],
+    [1620115200000, '3314.00000000', '3487.00000000', '3276.70000000', '3480.01000000', '247097.93596000'],
+    [1620129600000, '3480.01000000', '3527.00000000', '3213.35000000', '3228.49000000', '503040.13484000'],
+]
+
+
+def test_that_klines_are_stored_by_column(tmp_path):
+    store = KlineStore(tmp_path, "ETHUSDT", "4h")
+    store.merge(klines_to_arrays(klines[1:3]), 1620100800000, 1620115200000)
+    store.merge(klines_to_arrays(klines[3:]), 1620115200000, 1620129600000)
+    store.merge(klines_to_arrays(klines[:1]), 1620086400000, 1620100800000)
+
+    assert len(store) == 4
+    assert store.meta == {"length": 4, "intervals": [[1620086400000, 1620129600000]]}
+    assert store.column("time").dtype == np.int64
+    df = store.to_frame()
+    assert list(df.columns) == list(FIELDS)
+    assert np.array_equal(df.values, np.array(klines, dtype=np.float64))
+
+
+def test_that_append_ignores_bytes_after_last_kline(tmp_path):
+    store = KlineStore(tmp_path, "ETHUSDT", "4h")
+    store.write(klines_to_arrays(klines[:2]), [[0, 1]])
+    with open(f"{store.path}/close.bin", "ab") as fp:  # interrupted append
+        fp.write(np.array([1.0]).tobytes())
+
+    store.merge(klines_to_arrays(klines[2:]), 1, 2)
+
+    assert store.column("close").tolist() == [float(kline[4]) for kline in klines]
+
+
+def test_that_mapped_columns_survive_rewrite(tmp_path):
+    store = KlineStore(tmp_path, "ETHUSDT", "4h")
+    store.write(klines_to_arrays(klines[2:]), [[0, 1]])
+    df = store.to_frame()
+
+    store.merge(klines_to_arrays(klines[:2]), 0, 1)
+
+    assert df["close"].tolist() == [float(kline[4]) for kline in klines[2:]]
+    assert len(store.to_frame()) == 4
+
+
+def test_that_range_is_found_with_gaps(tmp_path):
+    store = KlineStore(tmp_path, "ETHUSDT", "4h")
+    store.write(klines_to_arrays([klines[0], klines[1], klines[3]]), [[0, 1]])  # klines[2] is missing
+
+    assert store.find(1620100800000, 1620129600000) == (1, 3)
+    assert store.find(1620100800001, 1620129599999) == (2, 2)
+    assert store.find(0, 1620086400000) == (0, 1)
+    assert store.find(1620129600001, 1720000000000) == (3, 3)
+
+
+def test_that_overlapping_klines_are_replaced(tmp_path):
+    store = KlineStore(tmp_path, "ETHUSDT", "4h")
+    store.write(klines_to_arrays(klines[1:3]), [[0, 1]])
+    updated = klines[2][:4] + ['3500.00000000', '300000.00000000']
+
+    store.merge(klines_to_arrays([updated] + klines[3:]), 1, 2)
+    store.merge(klines_to_arrays(klines[:2]), 2, 3)
+
+    assert store.column("time").tolist() == [kline[0] for kline in klines]
+    assert store.column("close")[2] == 3500.0
+
+
+def test_that_refreshed_last_kline_is_replaced_by_appending(tmp_path, mocker):
+    store = KlineStore(tmp_path, "ETHUSDT", "4h")
+    store.write(klines_to_arrays(klines[:2]), [[0, 1]])
+    df = store.to_frame()
+    write = mocker.spy(store, "write")
+    updated = klines[1][:4] + ['3300.00000000', '200000.00000000']
+
+    store.merge(klines_to_arrays([updated] + klines[2:]), 1, 2)
+
+    write.assert_not_called()
+    assert store.column("time").tolist() == [kline[0] for kline in klines]
+    assert store.column("close")[1] == 3300.0
+    # frames read before keep their values
+    assert df["close"].tolist() == [float(kline[4]) for kline in klines[:2]]
+    assert len(df) == 2
+
+
+@pytest.mark.parametrize("intervals, merged", [
+    ([], []),
+    ([[5, 6], [1, 2]], [[1, 2], [5, 6]]),
+    ([[1, 3], [2, 4], [4, 5], [7, 8]], [[1, 5], [7, 8]]),
+])
+def test_that_intervals_are_merged(intervals, merged):
+    assert merge_intervals(intervals) == merged
+
+
+@pytest.mark.parametrize("begin, end, missing", [
+    (0, 10, [[0, 2], [4, 6], [8, 10]]),
+    (2, 4, []),
+    (3, 7, [[4, 6]]),
+    (5, 6, [[5, 6]]),
+    (9, 12, [[9, 12]]),
+])
+def test_that_missing_intervals_are_found(begin, end, missing):
+    assert missing_intervals(begin, end, [[2, 4], [6, 8]]) == missing
@@ -0,0 +1,100 @@
+from trading.indicators.indicators import compute
+from trading.indicators.streaming import ADXState, RSIState
+from trading.rules import Rule
+from trading.store import KlineStore
+from trading.stream import LatencyStats, StreamIngestor, connect, ingest, kline_messages, replay, serve_replay
+
+import asyncio
+import numpy as np
+import pandas as pd
+import pytest
+
+
+DAY = 86400000
+
+
+@pytest.fixture
+def candles(ohlcv):
+    """ candles(n=60): candles going up and down, so that RSI14 goes above 60 """
+    return lambda n=60: ohlcv(100 + np.sin(np.arange(n) / 3) * 10 + np.arange(n) * 0.1)
+
+
+def ingestor(folder, signals):
+    return StreamIngestor(
+        "ETHUSDT", "1d",
+        indicators={"RSI14": (RSIState(14), ["close"]), ("ADX14", "DI+14", "DI-14"): (ADXState(14), ["high", "low", "close"])},
+        rules=[Rule("RSI14 > 60", name="overbought")],
+        on_signal=lambda ingestor, rule, kline: signals.append((rule.name, kline["time"])),
+        folder=folder
+    )
+
+
+def test_that_replayed_klines_are_ingested(tmp_path, candles):
+    df = candles()
+    signals = []
+    consumer = ingestor(tmp_path, signals)
+    consumer.warm_up(df.iloc[:30])
+
+    asyncio.run(ingest(replay(df.iloc[30:], "ETHUSDT", "1d", updates_per_kline=2), consumer))
+
+    expected = compute(df, ["rsi", "directional_movement"])
+    assert consumer.values["RSI14"] == pytest.approx(expected["RSI14"].iloc[-1])
+    assert consumer.values["ADX14"] == pytest.approx(expected["ADX14"].iloc[-1])
+    assert signals == [("overbought", int(t)) for t in df["time"][30:][expected["RSI14"][30:] > 60]]
+    assert consumer.updates == 2 * 30
+    assert consumer.latency.summary()["count"] == 30
+    store = KlineStore(tmp_path, "ETHUSDT", "1d")
+    assert len(store) == 30
+    assert store.intervals == [[int(df["time"][30]), int(df["time"].iloc[-1]) + DAY]]
+
+
+def test_that_warm_up_without_candles_leaves_the_states_empty(tmp_path, candles):
+    df = candles()
+    signals = []
+    consumer = ingestor(tmp_path, signals)
+    consumer.warm_up(df.iloc[:0])
+    consumer.warm_up(pd.DataFrame())
+
+    assert consumer.values == {} and consumer.last_time is None
+    asyncio.run(ingest(replay(df, "ETHUSDT", "1d"), consumer))
+    assert consumer.values["RSI14"] == pytest.approx(compute(df, ["rsi"])["RSI14"].iloc[-1])
+
+
+def test_that_old_and_other_klines_are_ignored(tmp_path, candles):
+    consumer = StreamIngestor("ETHUSDT", "1d", store=False)
+    messages = list(kline_messages(candles(3), "ETHUSDT", "1d"))
+
+    assert consumer.on_message(messages[1]) == []
+    assert consumer.last_time == int(candles()["time"][1])
+    consumer.on_message(messages[0])
+    consumer.on_message({**messages[2], "s": "BTCUSDT"})
+    assert consumer.last_time == int(candles()["time"][1])
+
+
+def test_that_replay_is_served_over_websocket(tmp_path, candles):
+    pytest.importorskip("websockets")
+    df = candles(20)
+    consumer = StreamIngestor("ETHUSDT", "1d", folder=tmp_path)
+
+    async def run():
+        server = await serve_replay(df, "ETHUSDT", "1d", port=0, speed=1000)
+        port = list(server.sockets)[0].getsockname()[1]
+        try:
+            await ingest(connect("ETHUSDT", "1d", url=f"ws://localhost:{port}"), consumer, max_klines=20)
+        finally:
+            server.close()
+            await server.wait_closed()
+
+    asyncio.run(run())
+
+    assert len(KlineStore(tmp_path, "ETHUSDT", "1d")) == 20
+    assert consumer.latency.summary()["p99"] < 1000
+
+
+def test_that_latency_is_summarized():
+    stats = LatencyStats(size=3)
+    assert stats.summary() == {"count": 0}
+    for latency in [5, 1, 2, 3]:
+        stats.add(latency)
+
+    assert stats.summary() == {"count": 4, "mean": 2, "p50": 2, "p95": pytest.approx(2.9), "p99": pytest.approx(2.98), "max": 3}
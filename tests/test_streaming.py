@@ -0,0 +1,119 @@
+from trading.indicators.indicators import (
+    directional_movement,
+    mma,
+    mme,
+    parabolic_sar,
+    rsi
+)
+from trading.indicators.rolling import rolling_max
+from trading.indicators.streaming import (
+    ADXState,
+    EMAState,
+    IndicatorState,
+    RollingWindowState,
+    RSIState,
+    SARState
+)
+
+import json
+import numpy as np
+import pandas as pd
+import pytest
+
+
+def candles():
+    with open("tests/data_adx.json", "r") as fd:
+        data = json.load(fd)["data"]
+    return pd.DataFrame({"high": data["high"], "low": data["low"], "close": data["close"]})
+
+
+def assert_same_values(expected, result):
+    expected, result = np.asarray(expected), np.asarray(result)
+    assert np.array_equal(np.isnan(expected), np.isnan(result))
+    assert np.allclose(expected[~np.isnan(expected)], result[~np.isnan(result)])
+
+
+@pytest.mark.parametrize("state, function, columns, inputs", [
+    (RSIState(), rsi, ["RSI14"], ["close"]),
+    (SARState(), parabolic_sar, ["Parabolic_SAR"], ["high", "low"]),
+    (EMAState(12), lambda df: mme(df, 12), ["MME12-0.15"], ["high"]),
+    (RollingWindowState(20), lambda df: mma(df, 20), ["MMA20"], ["high"]),
+    (ADXState(), directional_movement, ["ADX14", "DI+14", "DI-14"], ["high", "low", "close"]),
+])
+def test_that_state_matches_batch_indicator(state, function, columns, inputs):
+    df = candles()
+    expected = function(df.copy())
+    values = state.update_many(*[df[column] for column in inputs])
+    if len(columns) == 1:
+        values = (values,)
+
+    for column, result in zip(columns, values):
+        assert_same_values(expected[column], result)
+
+
+def test_that_rolling_window_state_tracks_extrema():
+    df = candles()
+    state = RollingWindowState(9)
+    highs = []
+    for value in df["high"]:
+        state.update(value)
+        highs.append(state.max)
+
+    assert_same_values(rolling_max(df["high"], 9), highs)
+
+
+def test_that_ema_state_does_not_drift():
+    # large values then small ones, with weights close to 1 the running sum loses their precision
+    generator = np.random.default_rng(0)
+    values = np.concatenate([generator.normal(0, 1e10, 100000), generator.normal(1, 0.1, 10)])
+    values[500] = np.nan
+    state = EMAState(10, alpha=1e-6)
+    state.update_many(values)
+
+    weights = (1 - 1e-6) ** np.arange(9, -1, -1)
+    assert state.value == pytest.approx(weights @ values[-10:] / weights.sum(), rel=1e-12)
+    resumed = IndicatorState.from_dict(json.loads(json.dumps(state.to_dict())))
+    assert resumed.update(1e6) == state.update(1e6)
+
+
+@pytest.mark.parametrize("state, inputs", [
+    (RSIState(), ["close"]),
+    (ADXState(), ["high", "low", "close"]),
+    (SARState(), ["high", "low"]),
+    (EMAState(9), ["high"]),
+    (RollingWindowState(5), ["low"]),
+])
+def test_that_state_resumes_from_snapshot(state, inputs, tmp_path):
+    df = candles()
+    reference = IndicatorState.from_dict(state.to_dict())
+    expected = reference.update_many(*[df[column] for column in inputs])
+
+    state.update_many(*[df[column][:40] for column in inputs])
+    state.save(tmp_path / "state.json")
+    resumed = IndicatorState.load(tmp_path / "state.json")
+    result = resumed.update_many(*[df[column][40:] for column in inputs])
+
+    assert type(resumed) is type(state)
+    if isinstance(expected, tuple):
+        expected, result = np.array(expected).T, np.array(result).T
+    assert_same_values(np.asarray(expected)[40:], result)
+
+
+@pytest.mark.parametrize("state, inputs", [
+    (RSIState(), ["close"]),
+    (ADXState(), ["high", "low", "close"]),
+    (SARState(), ["high", "low"]),
+])
+def test_that_kernel_filled_state_matches_updates(state, inputs):
+    df = candles()
+    stepped = IndicatorState.from_dict(state.to_dict())
+    expected = [stepped.update(*row) for row in zip(*[df[column] for column in inputs])]
+
+    # a new state is filled by the batch kernel, then goes on one candle at a time
+    values = state.update_many(*[df[column][:60] for column in inputs])
+    values = np.array(values).T if isinstance(values, tuple) else values
+    resumed = [state.update(*row) for row in zip(*[df[column][60:] for column in inputs])]
+
+    assert_same_values(np.array(expected[:60]), values)
+    assert_same_values(np.array(expected[60:]), np.array(resumed))
+    assert state.to_dict() == stepped.to_dict()
@@ -0,0 +1,170 @@
+""" Replay of cached candles to measure how a strategy would have performed.
+    Strategies are long only and all-in: they either hold the currency with the whole equity or not.
+    A decision taken on the close of a candle is filled at the open of the next one, paying the fee
+    and the slippage on the way in and on the way out.
+
+    Signal strategies (entries and exits known in advance for each candle, e.g. from rules) run on
+    the vectorized path backtest_signals(). Stateful strategies (stops, sizing on past trades...)
+    are subclasses of Strategy run by the event loop backtest_strategy(). """
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+import trading.config as cfg
+from trading.get_data import get_candle_data
+from trading.indicators.indicators import compute
+from trading.indicators.kernels import as_array
+from trading.rules import Rule
+from trading.scanner import SCAN_INDICATORS
+
+
+BacktestResult = namedtuple("BacktestResult", ["equity", "trades", "pnl", "total_return", "max_drawdown", "sharpe"])
+BacktestResult.__doc__ = """ equity is the value of the account at each close, trades a dataframe with one trade per row,
+    pnl the final equity minus the initial one, max_drawdown the largest fall from a previous
+    equity high (0.25 for -25%), sharpe the annualized Sharpe ratio of the returns per candle. """
+
+YEAR_MS = 365 * 24 * 60 * 60 * 1000
+
+
+class Strategy:
+    """ Base class of the stateful strategies run by backtest_strategy().
+        start() receives the columns of the candles as float64 arrays, then next() is called with
+        the index of each candle once it is closed. next() returns True to hold the currency from the
+        next open, False not to hold it, or None to keep the previous decision.
+        in_position, entry_index and entry_price describe the position filled so far. """
+    in_position = False
+    entry_index = None
+    entry_price = None
+
+    def start(self, data):
+        self.data = data
+
+    def next(self, index):
+        raise NotImplementedError
+
+
+def positions_from_signals(entries, exits):
+    """ Whether the currency is wanted after each close, from entry and exit signals.
+        An exit signal wins over an entry signal on the same candle. """
+    target = np.full(len(entries), np.nan)
+    target[np.asarray(entries, dtype=bool)] = 1
+    target[np.asarray(exits, dtype=bool)] = 0
+    return pd.Series(target).ffill().fillna(0).to_numpy(dtype=bool)
+
+
+def max_drawdown(equity):
+    if not len(equity):
+        return 0.
+    return float(np.max(1 - equity / np.maximum.accumulate(equity)))
+
+
+def sharpe_ratio(returns, periods_per_year):
+    if not len(returns) or np.std(returns) == 0:
+        return np.nan
+    return float(np.mean(returns) / np.std(returns) * np.sqrt(periods_per_year))
+
+
+def _periods_per_year(df):
+    if "time" in df and len(df) > 1:
+        return YEAR_MS / np.median(np.diff(as_array(df["time"])))
+    return 365
+
+
+def _simulate(df, target, fee, slippage, initial):
+    """ Equity and trades when holding the currency after each close where target is True """
+    open_, close = as_array(df["open"]), as_array(df["close"])
+    n = len(close)
+    held = np.zeros(n, dtype=bool)  # held during candle i, filled at its open
+    held[1:] = target[:-1]
+    previous = np.zeros(n, dtype=bool)
+    previous[1:] = held[:-1]
+    previous_close = np.full(n, np.nan)
+    previous_close[1:] = close[:-1]
+
+    entries = held & ~previous
+    exits = previous & ~held
+    kept = held & previous
+    entry_prices = open_ * (1 + slippage)
+    exit_prices = open_ * (1 - slippage)
+
+    factors = np.ones(n)
+    factors[kept] = close[kept] / previous_close[kept]
+    factors[entries] = (1 - fee) * close[entries] / entry_prices[entries]
+    factors[exits] = (1 - fee) * exit_prices[exits] / previous_close[exits]
+    equity = initial * np.cumprod(factors)
+
+    times = as_array(df["time"]) if "time" in df else np.arange(n, dtype=np.float64)
+    entry_indexes = np.flatnonzero(entries)
+    exit_indexes = np.flatnonzero(exits)
+    exit_times = times[exit_indexes]
+    trade_exit_prices = exit_prices[exit_indexes]
+    trade_returns = (1 - fee) ** 2 * trade_exit_prices / entry_prices[entry_indexes[:len(exit_indexes)]] - 1
+    if len(entry_indexes) > len(exit_indexes):  # position still open, valued at the last close
+        exit_times = np.append(exit_times, np.nan)
+        trade_exit_prices = np.append(trade_exit_prices, close[-1])
+        trade_returns = np.append(trade_returns, (1 - fee) * close[-1] / entry_prices[entry_indexes[-1]] - 1)
+    trades = pd.DataFrame({
+        "entry_time": times[entry_indexes],
+        "entry_price": entry_prices[entry_indexes],
+        "exit_time": exit_times,
+        "exit_price": trade_exit_prices,
+        "return": trade_returns,
+    })
+
+    return BacktestResult(
+        equity=equity,
+        trades=trades,
+        pnl=float(equity[-1] - initial) if n else 0.,
+        total_return=float(equity[-1] / initial - 1) if n else 0.,
+        max_drawdown=max_drawdown(equity),
+        sharpe=sharpe_ratio(factors - 1, _periods_per_year(df)),
+    )
+
+
+def backtest_signals(df, entries, exits, fee=cfg.FEES, slippage=cfg.SLIPPAGE, initial=1.):
+    """ Vectorized backtest of boolean entry and exit signals computed on the closes of df """
+    return _simulate(df, positions_from_signals(entries, exits), fee, slippage, initial)
+
+
+def backtest_strategy(df, strategy, fee=cfg.FEES, slippage=cfg.SLIPPAGE, initial=1.):
+    """ Event loop backtest of a Strategy, called once per candle """
+    data = {column: as_array(df[column]) for column in df}
+    open_ = data["open"]
+    target = np.zeros(len(df), dtype=bool)
+    strategy.in_position = False
+    strategy.entry_index = strategy.entry_price = None
+    strategy.start(data)
+    wanted = False
+    for index in range(len(df)):
+        if wanted != strategy.in_position:  # fill the decision taken on the previous close
+            strategy.in_position = wanted
+            strategy.entry_index = index if wanted else None
+            strategy.entry_price = open_[index] * (1 + slippage) if wanted else None
+        decision = strategy.next(index)
+        if decision is not None:
+            wanted = bool(decision)
+        target[index] = wanted
+    return _simulate(df, target, fee, slippage, initial)
+
+
+def backtest_rules(df, entry, exit=None, fee=cfg.FEES, slippage=cfg.SLIPPAGE, initial=1.):
+    """ Backtest of rules (Rule or text) on the columns of df.
+        Without exit rule, the currency is held while the entry rule matches. """
+    entry = entry if isinstance(entry, Rule) else Rule(entry)
+    entries = entry.evaluate(df)
+    if exit is None:
+        return _simulate(df, entries, fee, slippage, initial)
+    exit = exit if isinstance(exit, Rule) else Rule(exit)
+    return backtest_signals(df, entries, exit.evaluate(df), fee, slippage, initial)
+
+
+def backtest(currency, entry, exit=None, begin="2020-01-01 00:00:00", end="now", granularity="1d",
+             indicators=SCAN_INDICATORS,
+             folder=cfg.COINS_FOLDER, fee=cfg.FEES, slippage=cfg.SLIPPAGE, initial=1.):
+    """ Backtest rules on the candles of a currency, computing the indicators they need first """
+    df = get_candle_data(currency, begin, end, granularity, folder)
+    if df.empty:
+        return _simulate(pd.DataFrame({"open": [], "close": []}), np.zeros(0, dtype=bool), fee, slippage, initial)
+    df = compute(df, indicators, inplace=True)
+    return backtest_rules(df, entry, exit, fee, slippage, initial)
@@ -12,4 +12,29 @@ FONT = "Arial"
 FONT_SIZE = 11
 
 # Paths settings
-COINS_FOLDER = "coins_data"
\ No newline at end of file
+COINS_FOLDER = "coins_data"
+SKIP_FILE = "empty_coins.json"  # currencies without candles, skipped by the scanner
+
+# Binance settings
+REQUEST_WEIGHT_PER_MINUTE = 1200
+REQUEST_WEIGHT_BURST = 60
+KLINES_REQUEST_WEIGHT = 2  # weight of one request of up to 1000 klines
+KLINES_PER_REQUEST = 1000
+DOWNLOAD_WORKERS = 8
+DOWNLOAD_RETRIES = 3
+CLIENT_POOL_SIZE = 8  # clients kept connected to Binance, shared by all threads
+
+# Backtest settings
+FEES = 0.001  # fraction of the traded amount paid on each order
+SLIPPAGE = 0.0005  # fraction of the price lost between the decision and the fill
+
+# Indicator cache settings
+INDICATOR_CACHE_BYTES = 256 * 2**20  # indicator columns kept in memory, the least recently used are dropped beyond
+INDICATOR_CACHE_FOLDER = None  # folder where indicator columns are also written, e.g. "coins_data/indicators"
+
+# Optimization settings
+OPTIMIZE_PLAN_BYTES = 256 * 2**20  # moving averages and rolling extrema kept by each process, the least recently used are dropped beyond
+
+# Profiling settings
+PROFILE = False  # also switched on by the TRADING_PROFILE=1 environment variable
+PROFILE_MAX_EVENTS = 1000000  # older timed events are dropped, the summary keeps counting them
@@ -6,7 +6,14 @@ WINDOW_HEIGHT = 1080
 START_DATE = "2020-03-01 00:00:00"
 END_DATE = "now"
 GRANULARITY = "1d"
+LOAD_WORKERS = 8  # threads loading the candles of the tabs
+MAX_LOADED_TABS = 5  # candles and plots of the tabs viewed least recently are released beyond
 
 # UI settings
 FONT = "Arial"
-FONT_SIZE = 11
\ No newline at end of file
+FONT_SIZE = 11
+
+# Plot settings
+LOD_MAX_POINTS = 2000  # candles given to finplot at most, coarser levels of detail are shown beyond
+LOD_FACTOR = 4  # candles aggregated in each candle of the next level of detail
+LOD_MARGIN = 0.5  # points given beyond each side of the view, as a fraction of the view
@@ -0,0 +1,92 @@
+""" Candles of the tabs loaded by a pool of threads, so that downloads, cache reads and indicator
+    computations do not block the GUI thread. Results are sent back to the GUI thread by Qt signals,
+    where the tabs are plotted. """
+import traceback
+
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+
+from trading.indicators.cache import indicator_cache
+from trading.resample import get_resampled_data
+import trading.display.config as cfg
+
+
+# names of the indicators in config.json and in the show_ methods of the toolbar -> compute() names
+DISPLAY_INDICATORS = {
+    "parabolic": "parabolic_sar",
+    "mma": "mma",
+    "rsi": "rsi",
+    "adx": "directional_movement",
+    "ichimoku": "ichimoku",
+}
+
+
+def parse_indicator(indicator):
+    """ Name and number of an indicator of config.json, e.g. "mma-50" -> ("mma", 50) """
+    params = indicator.split("-")
+    number = int(params[1]) if len(params) > 1 and params[1].isnumeric() else None
+    return params[0], number
+
+
+def indicator_specs(indicators, mma_number=20):
+    """ compute() arguments for the indicators of a tab """
+    specs = []
+    for indicator in indicators:
+        name, number = parse_indicator(indicator)
+        if name == "mma":
+            specs.append(("mma", {"nb": number or mma_number}))
+        elif name in DISPLAY_INDICATORS:
+            specs.append(DISPLAY_INDICATORS[name])
+    return specs
+
+
+def load_candles(currency, indicators=(), begin=cfg.START_DATE, end=cfg.END_DATE, granularity=cfg.GRANULARITY):
+    """ Candles of a currency with the columns of the indicators of its tab """
+    candles = get_resampled_data(currency, begin=begin, end=end, granularity=granularity)
+    specs = indicator_specs(indicators)
+    if specs and not candles.empty:
+        # when a tab is loaded again, only the indicator values of the new candles are computed
+        candles = indicator_cache.compute(currency, granularity, candles, specs, inplace=True)
+    return candles
+
+
+class LoaderSignals(QObject):
+    loaded = pyqtSignal(str, object)
+    failed = pyqtSignal(str, str)
+
+
+class LoadTask(QRunnable):
+    def __init__(self, currency, indicators, signals):
+        super().__init__()
+        self.currency = currency
+        self.indicators = indicators
+        self.signals = signals
+
+    def run(self):
+        try:
+            candles = load_candles(self.currency, self.indicators, granularity=cfg.GRANULARITY)
+        except Exception:
+            self.signals.failed.emit(self.currency, traceback.format_exc())
+        else:
+            self.signals.loaded.emit(self.currency, candles)
+
+
+class DataLoader(QObject):
+    """ Loads the candles of currencies in a pool of threads. loaded(currency, candles) and
+        failed(currency, error) are emitted in the GUI thread. """
+    loaded = pyqtSignal(str, object)
+    failed = pyqtSignal(str, str)
+
+    def __init__(self, parent=None, workers=cfg.LOAD_WORKERS):
+        super().__init__(parent)
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(workers)
+        # created in the GUI thread, so that signals emitted by the workers are queued to it
+        self.signals = LoaderSignals(self)
+        self.signals.loaded.connect(self.loaded)
+        self.signals.failed.connect(self.failed)
+
+    def load(self, currency, indicators=()):
+        self.pool.start(LoadTask(currency, list(indicators), self.signals))
+
+    def wait(self, msecs=-1):
+        return self.pool.waitForDone(msecs)
@@ -0,0 +1,114 @@
+""" Levels of detail of long candle and indicator series, so that plots only get as many points as
+    can be seen at the current zoom.
+    Level k aggregates the candles by buckets of factor**k candles, keeping the first open, the
+    highest high, the lowest low, the last close and the total volume. Lines are decimated so that
+    their extremes stay visible: each pair of buckets keeps the lowest and the highest value, in the
+    order they occur, at the times of the two buckets. Every series of a level thus has the same
+    times, which plots sharing an x axis need. """
+import numpy as np
+import pandas as pd
+
+import trading.display.config as cfg
+
+
+def bucket_starts(n, size):
+    return np.arange(0, n, size)
+
+
+def aggregate_candles(candles, size):
+    """ Candles aggregated by buckets of size candles, as a dict of arrays """
+    starts = bucket_starts(len(candles["time"]), size)
+    ends = np.append(starts[1:], len(candles["time"])) - 1
+    return {
+        "time": np.asarray(candles["time"])[starts],
+        "open": np.asarray(candles["open"], dtype=np.float64)[starts],
+        "high": np.fmax.reduceat(np.asarray(candles["high"], dtype=np.float64), starts),
+        "low": np.fmin.reduceat(np.asarray(candles["low"], dtype=np.float64), starts),
+        "close": np.asarray(candles["close"], dtype=np.float64)[ends],
+        "volume": np.add.reduceat(np.asarray(candles["volume"], dtype=np.float64), starts),
+    }
+
+
+def decimate_line(values, size):
+    """ One value per bucket of size points, the lowest and highest of each pair of buckets
+        in the order they occur. A last bucket without a pair keeps the latest of the two. """
+    values = np.asarray(values, dtype=np.float64)
+    if size == 1:
+        return values
+    n = len(values)
+    nb_buckets = len(bucket_starts(n, size))
+    pairs = -(-nb_buckets // 2)
+    padded = np.full(pairs * 2 * size, np.nan)
+    padded[:n] = values
+    windows = padded.reshape(pairs, 2 * size)
+    empty = np.isnan(windows).all(axis=1)
+    lowest = np.where(np.isnan(windows), np.inf, windows).argmin(axis=1)
+    highest = np.where(np.isnan(windows), -np.inf, windows).argmax(axis=1)
+    rows = np.arange(pairs)
+    first = np.where(lowest <= highest, windows[rows, lowest], windows[rows, highest])
+    second = np.where(lowest <= highest, windows[rows, highest], windows[rows, lowest])
+    first[empty] = second[empty] = np.nan
+    out = np.empty(pairs * 2)
+    out[0::2] = first
+    out[1::2] = second
+    if nb_buckets % 2:
+        out[nb_buckets - 1] = out[nb_buckets]
+    return out[:nb_buckets]
+
+
+class Pyramid:
+    """ Levels of detail of candles, and of the lines added with add_line(). Level 0 is the
+        series itself, the coarsest level has at most min_points candles. """
+    def __init__(self, candles, factor=cfg.LOD_FACTOR, min_points=cfg.LOD_MAX_POINTS // 4):
+        candles = {field: np.asarray(candles[field]) for field in ("time", "open", "high", "low", "close", "volume")}
+        self.factor = factor
+        self.sizes = [1]
+        while len(candles["time"]) / self.sizes[-1] > min_points:
+            self.sizes.append(self.sizes[-1] * factor)
+        self.candles = [candles] + [aggregate_candles(candles, size) for size in self.sizes[1:]]
+        self.lines = {}
+
+    def __len__(self):
+        return len(self.sizes)
+
+    def add_line(self, name, values):
+        values = np.asarray(values, dtype=np.float64)
+        if len(values) != len(self.candles[0]["time"]):
+            raise ValueError(f"{name} has {len(values)} values for {len(self.candles[0]['time'])} candles")
+        self.lines[name] = [decimate_line(values, size) for size in self.sizes]
+
+    def derive_line(self, name, function, *names):
+        """ Line computed at each level by function from the points of other lines of the level """
+        self.lines[name] = [function(*(self.lines[other][level] for other in names)) for level in range(len(self))]
+
+    def times(self, level):
+        return self.candles[level]["time"]
+
+    def indices(self, level, begin, end):
+        """ First and last + 1 indexes of the candles of a level between the times begin and end """
+        times = self.times(level)
+        first = max(np.searchsorted(times, begin, side="right") - 1, 0)
+        return first, int(np.searchsorted(times, end, side="right"))
+
+    def level_for(self, begin, end, max_points=cfg.LOD_MAX_POINTS):
+        """ Finest level showing the candles between the times begin and end with at most max_points candles """
+        for level in range(len(self)):
+            first, last = self.indices(level, begin, end)
+            if last - first <= max_points:
+                return level
+        return len(self) - 1
+
+    def window(self, begin, end, max_points=cfg.LOD_MAX_POINTS, margin=cfg.LOD_MARGIN):
+        """ (level, first index, last index + 1) of the points to plot to show the candles between
+            the times begin and end. The window extends by margin times its length on each side,
+            so that small pans keep the same points. """
+        level = self.level_for(begin, end, max_points)
+        first, last = self.indices(level, begin, end)
+        extra = int((last - first) * margin)
+        return level, max(first - extra, 0), min(last + extra, len(self.times(level)))
+
+    def candles_frame(self, level, first=0, last=None):
+        return pd.DataFrame({field: values[first:last] for field, values in self.candles[level].items()})
+
+    def line_frame(self, name, level, first=0, last=None):
+        return pd.DataFrame({"time": self.times(level)[first:last], name: self.lines[name][level][first:last]})
@@ -20,8 +20,10 @@ from trading.display.menu import Menu, IndicatorsToolBar
 import finplot as fplt
 import pyqtgraph as pg
 import json
+from collections import OrderedDict
 
-from trading.get_data import get_candle_data
+from client import close_pool
+from trading.display.loader import DataLoader, parse_indicator
 from trading.display.plot import (
     create_fplt_widgets,
     plot_main_window,
@@ -29,6 +31,7 @@ from trading.display.plot import (
 )
 import trading.display.config as cfg
 from trading.display.state import State
+from trading.display.utils import saved_indicators
 
 
 # Creating the main window
@@ -61,30 +64,37 @@ class TabsWidget(QTabWidget):
         self.state = state
         self.layout = QVBoxLayout(self)
         self.candles = {}
+        self.tabs = {}
+        self.tab_indicators = {}
+        self.reloaded = set()  # tabs evicted once, their indicators are already saved
+        # currencies of the tabs loaded or loading, from the least recently viewed
+        self.recent = OrderedDict()
+        # currencies whose candles are being loaded, even if their tab was evicted since
+        self.loading = set()
         self.ind_toolbar = ind_toolbar
         self.nb_tabs = 0
 
+        # candles are loaded in background threads, tabs show a placeholder until they arrive
+        self.loader = DataLoader(self)
+        self.loader.loaded.connect(self.on_loaded)
+        self.loader.failed.connect(self.on_failed)
+
         with open("trading/display/config.json", "r") as fp:
             self.config = json.load(fp)["config"]
 
-        first = True
         for currency, indicators in self.config.items():
-            tab = self.create_or_update_tab(f"{currency}", indicators)
-            if first:
-                active_currency = (currency, tab)
-                first = False
+            self.create_or_update_tab(f"{currency}", indicators)
 
         # Tab "+" to add new currency at runtime
         self.create_add_tab()
 
-        self.state.set_graph_infos(
-                currency=active_currency[0],
-                candles=self.candles[active_currency[0]]["candles"],
-                axs=self.candles[active_currency[0]]["axs"],
-                graph_widget=active_currency[1]
-            )
         self.setLayout(self.layout)
         self.currentChanged.connect(self.onChange)
+        # the toolbar is enabled once the tab shown is loaded
+        self.ind_toolbar.setEnabled(False)
+        # tabs are only loaded when they are viewed
+        if self.config:
+            self.activate(self.currentWidget().label.text())
 
     def create_add_tab(self):
         tab = QWidget()
@@ -94,56 +104,135 @@ class TabsWidget(QTabWidget):
         self.nb_tabs += 1
 
     def create_or_update_tab(self, currency, indicators, from_tab=None):
+        """ Add the tab of a currency with a placeholder, its candles are loaded once it is viewed """
         if not from_tab:
             tab = QWidget()
         else:
             tab = from_tab
         tab.layout = QVBoxLayout(self)
         tab.label = QLabel(currency)
-        fplt_widgets = create_fplt_widgets(self.window())
-        self.candles.setdefault(
-            currency, {
-                "candles": get_candle_data( 
-                    currency,
-                    begin=cfg.START_DATE,
-                    end=cfg.END_DATE,
-                    granularity=cfg.GRANULARITY
-                    )
-                }
-            )
+        tab.status = QLabel(f"Loading {currency}...")
         tab.layout.addWidget(tab.label)
-        tab.layout.addWidget(fplt_widgets[0].ax_widget, stretch=3)
-        self.window().axs = fplt_widgets
-        self.candles[currency]["axs"] = self.window().axs
-        plot_main_window(self.candles[currency])
+        tab.layout.addWidget(tab.status, stretch=3)
         tab.setLayout(tab.layout)
         if not from_tab:
             self.addTab(tab, currency)
             self.nb_tabs += 1
+        self.tabs[currency] = tab
+        self.tab_indicators[currency] = indicators
+        return tab
+
+    def activate(self, currency):
+        """ Load the tab of a currency if needed, and release the least recently viewed ones """
+        if currency in self.recent:
+            self.recent.move_to_end(currency)
+        else:
+            self.recent[currency] = None
+            self.tabs[currency].status.setText(f"Loading {currency}...")
+            self.tabs[currency].status.show()
+            # a tab evicted while loading waits for the load in progress, two loads of the same
+            # currency would write to the same kline cache at once
+            if currency not in self.loading:
+                self.loading.add(currency)
+                self.loader.load(currency, self.tab_indicators[currency])
+        while len(self.recent) > cfg.MAX_LOADED_TABS:
+            self.evict(next(iter(self.recent)))
+
+    def evict(self, currency):
+        """ Release the candles and the plot widgets of a tab, it is loaded again when viewed """
+        del self.recent[currency]
+        entry = self.candles.pop(currency, None)
+        tab = self.tabs[currency]
+        tab.status.setText(f"{currency} is loaded again when selected")
+        tab.status.show()
+        if entry is None:
+            return  # still loading, on_loaded() drops the candles unless the tab is viewed again by then
+        # the indicators shown on the tab with their numbers, including the ones added from the toolbar
+        self.tab_indicators[currency] = saved_indicators(currency)
+        self.reloaded.add(currency)
+        for ax in entry["axs"]:
+            tab.layout.removeWidget(ax.ax_widget)
+            ax.ax_widget.setParent(None)
+            ax.ax_widget.deleteLater()
+
+    def on_loaded(self, currency, candles):
+        """ Plot the candles of a tab, in the GUI thread """
+        self.loading.discard(currency)
+        tab = self.tabs.get(currency)
+        if tab is None or currency not in self.recent or currency in self.candles:
+            return  # evicted while loading
+        if candles.empty:
+            # nothing to plot, the tab is loaded again when viewed, e.g. once the currency is listed
+            tab.status.setText(f"No candles for {currency}")
+            self.recent.pop(currency)
+            return
+        tab.status.hide()
+        fplt_widgets = create_fplt_widgets(self.window())
+        self.candles[currency] = {"candles": candles}
+        tab.layout.addWidget(fplt_widgets[0].ax_widget, stretch=3)
+        self.window().axs = fplt_widgets
+        self.candles[currency]["axs"] = self.window().axs
+        plot_main_window(self.candles[currency])
+        self.state.ax_index = 1
         self.state.set_graph_infos(
             currency=currency,
             candles=self.candles[currency]["candles"],
             axs=self.candles[currency]["axs"],
-            graph_widget=tab
+            graph_widget=tab,
+            lod=self.candles[currency]["lod"]
+        )
+        for indicator in self.tab_indicators[currency]:
+            ind, number = parse_indicator(indicator)
+            # the number of the tab, e.g. the period of "mma-50", not the one of the toolbar
+            kwargs = {"number": number} if number else {}
+            show = getattr(self.ind_toolbar, f"show_{ind}")
+            if currency in self.reloaded:
+                show.__wrapped__(self.ind_toolbar, **kwargs)  # already saved, save() would skip it
+            else:
+                show(**kwargs)
+        self.candles[currency]["ax_index"] = self.state.ax_index
+        # the toolbar acts on the tab shown, which may not be the one just loaded
+        if self.currentIndex() == self.nb_tabs - 1:
+            self.set_state(None)
+        elif self.currentWidget() is not tab:
+            self.set_state(self.currentWidget().label.text())
+        else:
+            self.ind_toolbar.setEnabled(True)
+
+    def on_failed(self, currency, error):
+        self.loading.discard(currency)
+        tab = self.tabs.get(currency)
+        if tab is not None:
+            tab.status.setText(f"Could not load {currency}")
+        self.recent.pop(currency, None)
+        print(error)
+
+    def set_state(self, currency):
+        """ Point the toolbar to the tab of a currency. While the tab is loading, the toolbar is
+            disabled and points to no tab, so that it cannot plot on another one. """
+        if self.state.currency in self.candles:
+            self.candles[self.state.currency]["ax_index"] = self.state.ax_index
+        if currency not in self.candles:
+            # the tab is set up when its candles arrive
+            self.state.clear_graph_infos()
+            self.ind_toolbar.setEnabled(False)
+            return
+        self.ind_toolbar.setEnabled(True)
+        self.state.ax_index = self.candles[currency]["ax_index"]
+        self.state.set_graph_infos(
+            currency=currency,
+            candles=self.candles[currency]["candles"],
+            axs=self.candles[currency]["axs"],
+            graph_widget=self.tabs[currency],
+            lod=self.candles[currency]["lod"]
         )
-        for indicator in indicators:
-            params = indicator.split("-")
-            ind = params[0]
-            if len(params) > 1 and params[1].isnumeric():
-                self.ind_toolbar.numbers[ind] = int(params[1])
-            getattr(self.ind_toolbar, f"show_{ind}")()
-        return tab
 
     def onChange(self, tab_index):
         if tab_index != self.nb_tabs - 1:
             currency = self.currentWidget().label.text()
             print("currency: ", currency)
-            self.state.set_graph_infos(
-                currency=currency,
-                candles=self.candles[currency]["candles"],
-                axs=self.candles[currency]["axs"],
-                graph_widget=self.currentWidget()
-            )
+            self.activate(currency)
+            self.set_state(currency)
         else:
             currency, ok = QInputDialog.getText(self, "currency input dialog", "Enter currency")
             if ok:
@@ -151,6 +240,8 @@ class TabsWidget(QTabWidget):
                 self.create_add_tab()
                 self.create_or_update_tab(f"{currency}", indicators=[], from_tab=self.currentWidget())
                 self.setTabText(tab_index, currency)
+                self.activate(currency)
+                self.set_state(currency)
 
 if __name__ == '__main__':
     if os.path.exists("trading/display/tmp_config.json"):
@@ -158,4 +249,5 @@ if __name__ == '__main__':
     set_plot_colors()
     app = QApplication(sys.argv)
     ex = App()
+    app.aboutToQuit.connect(close_pool)
     sys.exit(app.exec_())
@@ -12,22 +12,27 @@ from PyQt5.QtGui import (
 )
 from PyQt5.QtCore import Qt
 
-from trading.indicators.indicators import (
-    directional_movement,
-    ichimoku,
-    mma,
-    parabolic_sar,
-    rsi
-)
+from trading.indicators.cache import indicator_cache
 import finplot as fplt
 import pyqtgraph as pg
 import json
 from json import JSONDecodeError
 from trading.get_data import get_candle_data
+from trading.display.plot import plot_cloud, plot_line
 from trading.display.utils import save
+from trading.profiling import profiled
 import trading.display.config as cfg
 
 
+def with_indicator(state, name, columns, **params):
+    """ Candles of the tab shown with the columns of an indicator. Columns already computed by the
+        loader are kept, the other ones come from the indicator cache. """
+    df = state.candles
+    if all(column in df for column in columns):
+        return df
+    return indicator_cache.compute(state.currency, cfg.GRANULARITY, df, [(name, params)], inplace=True)
+
+
 class Menu(QMenuBar):
     def __init__(self, parent, state):
         super(QMenuBar, self).__init__(parent)
@@ -101,88 +106,54 @@ class IndicatorsToolBar(QToolBar):
         print(self.state.numbers["MMA"])
 
     @save
+    @profiled("plot.parabolic", "plot")
     def show_parabolic(self):
-        df = parabolic_sar(self.state.candles)
-        fplt.plot(df["time"], df["Parabolic_SAR"], ax=self.state.axs[0], legend=f"parabolic_sar", style="o", color="#43a7e3")
+        df = with_indicator(self.state, "parabolic_sar", ["Parabolic_SAR"])
+        plot_line(self.state.lod, df["time"], df["Parabolic_SAR"], ax=self.state.axs[0], legend=f"parabolic_sar", style="o", color="#43a7e3")
         fplt.show(qt_exec=False)
 
     @save
-    def show_mma(self):
-        df = mma(self.state.candles, self.state.numbers["MMA"])
-        fplt.plot(df["time"], df[f"MMA{self.state.numbers['MMA']}"], ax=self.state.axs[0], legend=f"MMA{self.state.numbers['MMA']}")
+    @profiled("plot.mma", "plot")
+    def show_mma(self, number=None):
+        number = number or self.state.numbers["MMA"]
+        df = with_indicator(self.state, "mma", [f"MMA{number}"], nb=number)
+        plot_line(self.state.lod, df["time"], df[f"MMA{number}"], ax=self.state.axs[0], legend=f"MMA{number}")
         fplt.show(qt_exec=False)
 
     @save
+    @profiled("plot.rsi", "plot")
     def show_rsi(self):
-        df = rsi(self.state.candles)
+        df = with_indicator(self.state, "rsi", ["RSI14"])
         self.state.graph_widget.layout.addWidget(self.state.axs[self.state.ax_index].ax_widget, stretch=1)
-        fplt.plot(df["time"], df["RSI14"], ax=self.state.axs[self.state.ax_index], legend=f"RSI")
+        plot_line(self.state.lod, df["time"], df["RSI14"], ax=self.state.axs[self.state.ax_index], legend=f"RSI")
         fplt.add_band(30, 70, color="#211739", ax=self.state.axs[self.state.ax_index])
         fplt.show(qt_exec=False)
         self.state.ax_index += 1
     
     @save
+    @profiled("plot.adx", "plot")
     def show_adx(self):
-        df = directional_movement(self.state.candles)
+        df = with_indicator(self.state, "directional_movement", ["ADX14", "DI+14", "DI-14"])
         self.state.graph_widget.layout.addWidget(self.state.axs[self.state.ax_index].ax_widget, stretch=1)
-        fplt.plot(df["time"], df["ADX14"], ax=self.state.axs[self.state.ax_index], color="#304aea", legend=f"ADX")
-        fplt.plot(df["time"], df["DI+14"], ax=self.state.axs[self.state.ax_index], color="#26A69A", legend=f"DI+")
-        fplt.plot(df["time"], df["DI-14"], ax=self.state.axs[self.state.ax_index], color="#EF5350", legend=f"DI-")
+        plot_line(self.state.lod, df["time"], df["ADX14"], ax=self.state.axs[self.state.ax_index], color="#304aea", legend=f"ADX")
+        plot_line(self.state.lod, df["time"], df["DI+14"], ax=self.state.axs[self.state.ax_index], color="#26A69A", legend=f"DI+")
+        plot_line(self.state.lod, df["time"], df["DI-14"], ax=self.state.axs[self.state.ax_index], color="#EF5350", legend=f"DI-")
         fplt.show(qt_exec=False)
         self.state.ax_index += 1
     
     @save
+    @profiled("plot.ichimoku", "plot")
     def show_ichimoku(self):
-        df = ichimoku(self.state.candles)
-
-        # we need to separate lsa and lsb columns into several plots to be able to fill between them
-        # with different colors (green if lsa > lsb and red otherwise)
-        fill_green = "#192727"
-        fill_red = "#2B1D27"
-        first_index = df["Ichimoku_LeadingSpanA"].first_valid_index()
-        columns = {
-            "time": [df["time"][first_index]],
-            "lsa": [df["Ichimoku_LeadingSpanA"][first_index]],
-            "lsb": [df["Ichimoku_LeadingSpanB"][first_index]],
-        }
-        green = df["Ichimoku_LeadingSpanA"][first_index] > df["Ichimoku_LeadingSpanB"][first_index]
-        for i in range(first_index + 1, len(df)):
-            columns["lsa"].append(df["Ichimoku_LeadingSpanA"][i])
-            columns["lsb"].append(df["Ichimoku_LeadingSpanB"][i])
-            columns["time"].append(df["time"][i])
-            if df["Ichimoku_LeadingSpanA"][i] > df["Ichimoku_LeadingSpanB"][i]:
-                if not green:
-                    plot_a = fplt.plot(columns["time"], columns["lsa"], ax=self.state.axs[0], color="#4BAB4F")
-                    plot_b = fplt.plot(columns["time"], columns["lsb"], ax=self.state.axs[0], color="#F25952")
-                    fplt.fill_between(plot_a, plot_b, color=fill_red)
-                    columns = {
-                        "time": [df["time"][i]],
-                        "lsa": [df["Ichimoku_LeadingSpanA"][i]],
-                        "lsb": [df["Ichimoku_LeadingSpanB"][i]],
-                    }
-            elif green:
-                    plot_a = fplt.plot(columns["time"], columns["lsa"], ax=self.state.axs[0], color="#4BAB4F")
-                    plot_b = fplt.plot(columns["time"], columns["lsb"], ax=self.state.axs[0], color="#F25952")
-                    fplt.fill_between(plot_a, plot_b, color=fill_green)
-                    columns = {
-                        "time": [df["time"][i]],
-                        "lsa": [df["Ichimoku_LeadingSpanA"][i]],
-                        "lsb": [df["Ichimoku_LeadingSpanB"][i]],
-                    }
-
-            green = df["Ichimoku_LeadingSpanA"][i] > df["Ichimoku_LeadingSpanB"][i]
-
-        # last plot for lsa and lsb
-        plot_a = fplt.plot(columns["time"], columns["lsa"], ax=self.state.axs[0], color="#4BAB4F", legend=f"Leading Span A (Senku Span A)")
-        plot_b = fplt.plot(columns["time"], columns["lsb"], ax=self.state.axs[0], color="#F25952", legend=f"Leading Span B (Senku Span B)")
-        if green:
-            fplt.fill_between(plot_a, plot_b, color=fill_green)
-        else:
-            fplt.fill_between(plot_a, plot_b, color=fill_red)
+        df = with_indicator(self.state, "ichimoku", [
+            "Ichimoku_LeadingSpanA", "Ichimoku_LeadingSpanB", "Ichimoku_LaggingSpan",
+            "Ichimoku_BaseLine", "Ichimoku_ConversionLine"
+        ])
+
+        plot_cloud(self.state.lod, df["time"], df["Ichimoku_LeadingSpanA"], df["Ichimoku_LeadingSpanB"], ax=self.state.axs[0])
 
         # plot the other ichimoku columns
-        fplt.plot(df["time"], df["Ichimoku_LaggingSpan"], ax=self.state.axs[0], color="#459915", legend=f"Lagging Span (Chikou Span)")
-        fplt.plot(df["time"], df["Ichimoku_BaseLine"], ax=self.state.axs[0], color="#991515", legend=f"Base Line (Kijun-sen)")
-        fplt.plot(df["time"], df["Ichimoku_ConversionLine"], ax=self.state.axs[0], color="#0495FD", legend=f"Conversion Line (Tenkan-sen)")
+        plot_line(self.state.lod, df["time"], df["Ichimoku_LaggingSpan"], ax=self.state.axs[0], color="#459915", legend=f"Lagging Span (Chikou Span)")
+        plot_line(self.state.lod, df["time"], df["Ichimoku_BaseLine"], ax=self.state.axs[0], color="#991515", legend=f"Base Line (Kijun-sen)")
+        plot_line(self.state.lod, df["time"], df["Ichimoku_ConversionLine"], ax=self.state.axs[0], color="#0495FD", legend=f"Conversion Line (Tenkan-sen)")
 
         fplt.show(qt_exec=False)
@@ -1,4 +1,13 @@
 import finplot as fplt
+import numpy as np
+
+from trading.display.lod import Pyramid
+from trading.profiling import profiled
+
+
+CLOUD_GREEN = "#192727"
+CLOUD_RED = "#2B1D27"
+CLOUD_LOWER_COLOR = "#00000000"  # transparent, the lower span is always under span A or span B
 
 
 def set_plot_colors():
@@ -15,6 +24,7 @@ def set_plot_colors():
     fplt.cross_hair_color = '#d9d9d9'
 
 
+@profiled("plot.create_fplt_widgets", "plot")
 def create_fplt_widgets(window, rows=10):
     widgets = fplt.create_plot_widget(window, rows=rows)
     for widget in widgets:
@@ -26,10 +36,108 @@ def create_fplt_widgets(window, rows=10):
 
     return widgets
 
+class LODPlot:
+    """ Candles, volumes and lines of a tab plotted from their levels of detail (see lod.py).
+        Items are given the points of the finest level that shows the visible candles with at most
+        LOD_MAX_POINTS candles, and get other points when a zoom or a pan needs them.
+        Lines must go through plot() to stay aligned with the candles. """
+    def __init__(self, candles, ax, volume_ax=None):
+        self.pyramid = Pyramid(candles)
+        self.ax = ax
+        self.lines = {}  # name -> plot item
+        times = self.pyramid.times(0)
+        self.level, self.first, self.last = self.pyramid.window(times[0], times[-1]) if len(times) else (0, 0, 0)
+        frame = self.pyramid.candles_frame(self.level, self.first, self.last)
+        self.candles_item = fplt.candlestick_ochl(frame[["time", "open", "close", "high", "low"]], ax=ax)
+        self.volumes_item = None
+        if volume_ax is not None:
+            self.volumes_item = fplt.volume_ocv(frame[["time", "open", "close", "volume"]], ax=volume_ax)
+        self._updating = False
+        ax.vb.sigRangeChanged.connect(self.on_range_changed)
+
+    @profiled("plot.line", "plot")
+    def plot(self, times, values, ax, **kwargs):
+        """ Same as fplt.plot() for a line of one value per candle """
+        name = kwargs.get("legend") or f"line{len(self.lines)}"
+        self.pyramid.add_line(name, values)
+        frame = self.pyramid.line_frame(name, self.level, self.first, self.last)
+        self.lines[name] = fplt.plot(frame["time"], frame[name], ax=ax, **kwargs)
+        return self.lines[name]
+
+    def plot_derived(self, name, function, names, ax, **kwargs):
+        """ Plot a line computed by function from the lines names, at each level of detail """
+        self.pyramid.derive_line(name, function, *names)
+        frame = self.pyramid.line_frame(name, self.level, self.first, self.last)
+        self.lines[name] = fplt.plot(frame["time"], frame[name], ax=ax, **kwargs)
+        return self.lines[name]
+
+    def visible_times(self):
+        """ Times of the first and last candles in view, None without candles """
+        times = self.pyramid.times(self.level)[self.first:self.last]
+        if not len(times):
+            return None
+        x_begin, x_end = self.ax.vb.viewRange()[0]
+        begin = times[int(np.clip(np.floor(x_begin), 0, len(times) - 1))]
+        end = times[int(np.clip(np.ceil(x_end), 0, len(times) - 1))]
+        return begin, end
+
+    def on_range_changed(self, *args):
+        if self._updating:
+            return
+        visible = self.visible_times()
+        if visible is None:
+            return  # no candles to show at other levels
+        begin, end = visible
+        level = self.pyramid.level_for(begin, end)
+        first, last = self.pyramid.indices(level, begin, end)
+        if level == self.level and self.first <= first and last <= self.last:
+            return  # the points given cover the view
+        self.show(*self.pyramid.window(begin, end), begin, end)
+
+    @profiled("plot.lod_update", "plot")
+    def show(self, level, first, last, begin, end):
+        """ Give the items the points of a window of a level, keeping the times begin to end in view """
+        self._updating = True
+        try:
+            self.level, self.first, self.last = level, first, last
+            frame = self.pyramid.candles_frame(level, first, last)
+            self.candles_item.update_data(frame[["time", "open", "close", "high", "low"]])
+            if self.volumes_item is not None:
+                self.volumes_item.update_data(frame[["time", "open", "close", "volume"]])
+            for name, item in self.lines.items():
+                item.update_data(self.pyramid.line_frame(name, level, first, last))
+            times = self.pyramid.times(level)[first:last]
+            self.ax.vb.setXRange(np.searchsorted(times, begin), np.searchsorted(times, end), padding=0)
+        finally:
+            self._updating = False
+
+
+def plot_line(lod, times, values, **kwargs):
+    """ Plot a line of one value per candle, through the levels of detail of the tab if it has some """
+    if lod is None:
+        return fplt.plot(times, values, **kwargs)
+    return lod.plot(times, values, **kwargs)
+
+
+@profiled("plot.cloud", "plot")
+def plot_cloud(lod, times, span_a, span_b, ax):
+    """ Ichimoku cloud between the leading spans, green where span A is above span B and red elsewhere.
+        Both colors are fills down to the lower span, which are empty where the other color is shown,
+        so the cloud takes five plot items whatever the number of crossings. """
+    legend_a, legend_b = "Leading Span A (Senku Span A)", "Leading Span B (Senku Span B)"
+    plot_a = plot_line(lod, times, span_a, ax=ax, color="#4BAB4F", legend=legend_a)
+    plot_b = plot_line(lod, times, span_b, ax=ax, color="#F25952", legend=legend_b)
+    if lod is None:
+        lower = fplt.plot(times, np.minimum(span_a, span_b), ax=ax, color=CLOUD_LOWER_COLOR)
+    else:
+        lower = lod.plot_derived("cloud_lower", np.minimum, [legend_a, legend_b], ax=ax, color=CLOUD_LOWER_COLOR)
+    fplt.fill_between(plot_a, lower, color=CLOUD_GREEN)
+    fplt.fill_between(plot_b, lower, color=CLOUD_RED)
+    return plot_a, plot_b
+
+
+@profiled("plot.main_window", "plot")
 def plot_main_window(data):
-    """plot candles + volumes"""
-    candles = data["candles"][['time','open','close','high','low']]
-    fplt.candlestick_ochl(candles)
-    volumes = data["candles"][['time','open','close','volume']]
-    fplt.volume_ocv(volumes, ax=data["axs"][0].overlay())
+    """plot candles + volumes, through their levels of detail"""
+    data["lod"] = LODPlot(data["candles"], data["axs"][0], volume_ax=data["axs"][0].overlay())
     fplt.show(qt_exec=False)
@@ -2,9 +2,20 @@ class State:
     def __init__(self):
         self.ax_index = 1
         self.numbers = {}
+        # set once the candles of a tab are loaded
+        self.currency = None
+        self.candles = None
+        self.axs = None
+        self.graph_widget = None
+        self.lod = None
 
-    def set_graph_infos(self, currency, candles, axs, graph_widget):
+    def set_graph_infos(self, currency, candles, axs, graph_widget, lod=None):
         self.currency = currency
         self.candles = candles
         self.axs = axs
         self.graph_widget = graph_widget
+        self.lod = lod
+
+    def clear_graph_infos(self):
+        """ No tab to act on, while the one shown is loading """
+        self.set_graph_infos(currency=None, candles=None, axs=None, graph_widget=None)
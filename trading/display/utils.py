@@ -1,11 +1,29 @@
+import functools
 import json
 from json import JSONDecodeError
 
 
+def saved_indicators(currency):
+    """ Indicators shown on the tab of a currency, as saved by save() """
+    try:
+        with open("trading/display/tmp_config.json", "r") as fp:
+            return json.load(fp)["config"].get(currency, [])
+    except (IOError, JSONDecodeError):
+        return []
+
+
 def save(show_func):
+    """ Record the indicator shown on the tab of the current currency, it is not shown twice.
+        An indicator set by a number of the toolbar is recorded with it, e.g. "mma-50", and the
+        number is passed to show_func, unless given as the number keyword argument. """
+    @functools.wraps(show_func)
     def wrapper(*args, **kwargs):
+        name = show_func.__name__.split('_')[1]
+        number = kwargs.get("number") or args[0].state.numbers.get(name.upper())
+        if number:
+            kwargs["number"] = number
+        ind = f"{name}-{number}" if number else name
         try:
-            ind = show_func.__name__.split('_')[1]
             with open("trading/display/tmp_config.json", "r") as fp:
                 config = json.load(fp)["config"]
             if args[0].state.currency not in config:
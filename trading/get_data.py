@@ -1,15 +1,15 @@
 from client import authent
-from binance.client import Client
 
 import pandas as pd
-import numpy as np
-import json
-from datetime import datetime, timedelta
-import dateparser
-import pytz
-import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+import math
+import time
 
 import trading.config as cfg
+from trading.profiling import count, profiled, span
+from trading.ratelimit import TokenBucket
+from trading.store import KlineStore, klines_to_arrays
 from trading.utils import date_to_milliseconds
 
 
@@ -20,7 +20,21 @@ g_mapping = {  # periods in ms
     "1m": 6e4
 }
 
+# shared by every thread of the process, to stay under the request weight limit of Binance
+rate_limiter = TokenBucket(
+    rate=cfg.REQUEST_WEIGHT_PER_MINUTE / 60,
+    capacity=cfg.REQUEST_WEIGHT_BURST
+)
 
+
+def request_weight(start_ms, end_ms, granularity):
+    """ Estimated Binance request weight of downloading the klines between two dates """
+    period = g_mapping.get(granularity)
+    nb_klines = (end_ms - start_ms) / period + 1 if period else cfg.KLINES_PER_REQUEST
+    return max(1, math.ceil(nb_klines / cfg.KLINES_PER_REQUEST)) * cfg.KLINES_REQUEST_WEIGHT
+
+
+@profiled("get_data_from_binance", "network")
 @authent
 def get_data_from_binance(currency, granularity, start_date, end_date, client=None):
     start_date = date_to_milliseconds(start_date)
@@ -36,105 +50,79 @@ def get_data_from_binance(currency, granularity, start_date, end_date, client=No
     clean_klines = [
         kline[:6] for kline in klines
     ]
+    count("klines_downloaded", len(clean_klines))
     return clean_klines
 
 
-def get_candle_data(currency, begin="2020-01-01 00:00:00", end="now", granularity="1d", folder=cfg.COINS_FOLDER):
-    filename = f"{folder}/{currency}_{granularity}_data.json"
+@profiled("get_candle_data", "cache")
+def get_candle_data(currency, begin="2020-01-01 00:00:00", end="now", granularity="1d", folder=cfg.COINS_FOLDER, client=None):
+    store = KlineStore(folder, currency, granularity)
     begin_ms = date_to_milliseconds(begin)
     end_ms = date_to_milliseconds(end)
-    nb_periods_float = (end_ms - begin_ms) / g_mapping[granularity]
-    if not nb_periods_float.is_integer():
-        nb_periods = int(nb_periods_float) + 1
-    else:
-        nb_periods = int(nb_periods_float)
-    try:
-        # Get existing data from file
-        with open(filename, "r") as fp:
-            data = json.load(fp)["data"]
-            klines = data["klines"]
-            first_date_ms = int(klines[0][0])
-            last_date_ms = int(klines[-1][0])
-
-        begin_first = False
-        end_last = False
-        # Retrieve missing data from beginning
-        if begin_ms < data["begin"]:
-            starting_klines = get_data_from_binance(
-                currency,
-                granularity,
-                begin_ms,
-                first_date_ms
-            )
-            with open(filename, "w") as fp:
-                klines = starting_klines[:-1] + klines
-                json.dump({"data": {
-                    "klines": klines,
-                    "begin": begin_ms,
-                    "end": last_date_ms
-                    }}, fp)
-            begin_first = True
-            first_date_ms = begin_ms
-        # Retrieve recent missing data
-        if end_ms > data["end"]:
-            ending_klines = get_data_from_binance(
-                currency,
-                granularity,
-                last_date_ms,
-                end_ms
-            )
-            with open(filename, "w") as fp:
-                klines = klines + ending_klines[1:]
-                json.dump({"data": {
-                    "klines": klines,
-                    "begin": first_date_ms,
-                    "end": end_ms
-                    }}, fp)
-            end_last = True
-        nb_periods_file = len(klines)
-        if nb_periods == nb_periods_file or begin_first:  # begin is the time of the first kline of the file
-            index_begin, index_end = 0, nb_periods
-        elif end_last:  # end is the time of the last kline of the file
-            index_begin, index_end = nb_periods_file - nb_periods, nb_periods_file
-        else:  # begin and end are in the middle of the file
-            index_set = False
-            for i, kline in enumerate(klines[::-1]):
-                if end_ms <= int(kline[0]):
-                    index_end = len(klines) - (i + 1)
-                    index_begin = index_end - nb_periods
-                    index_set = True
-            if not index_set:
-                index_begin, index_end = 0, nb_periods_file
-    except (FileNotFoundError, json.JSONDecodeError):
-        # Create file with all data
-        with open(filename, "w") as fp:
-            klines = get_data_from_binance(
-                currency,
-                granularity,
-                begin,
-                end
-            )
-            if klines:
-                json.dump({
-                    "data": {
-                        "klines": klines,
-                        "begin": begin_ms,
-                        "end": end_ms
-                        }
-                    }, fp)
-        index_begin, index_end = 0, nb_periods
-    
-    if not klines:
-        os.remove(filename)
-        return pd.DataFrame()
-    # import pdb; pdb.set_trace()
-    try:
-        df = pd.DataFrame(np.array(klines[index_begin:index_end])[:,:6], columns=["time", "open", "high", "low", "close", "volume"])
-        df = df.astype(np.float64)
-        return df
-    except Exception as e:
-        print(currency, e)
-        return pd.DataFrame()
+
+    if not store.exists():
+        with span("cache.migrate_json", "cache", currency=currency, granularity=granularity):
+            store.migrate_json()
+    # Retrieve the parts of the range that were never requested
+    covered_ends = [covered_end for _, covered_end in store.intervals]
+    period = g_mapping.get(granularity)
+    for missing_begin, missing_end in store.missing(begin_ms, end_ms):
+        count("cache_misses")
+        fetch_begin = missing_begin
+        if missing_begin in covered_ends and period:
+            # the last kline before the gap may have been cached while it was still open
+            fetch_begin = int(missing_begin // period * period)
+        with span("rate_limiter.acquire", "network"):
+            rate_limiter.acquire(request_weight(fetch_begin, missing_end, granularity))
+        klines = get_data_from_binance(
+            currency,
+            granularity,
+            fetch_begin,
+            missing_end,
+            client=client
+        )
+        with span("cache.parse_klines", "cache", rows=len(klines)):
+            arrays = klines_to_arrays(klines)
+        with span("cache.write", "cache", currency=currency, granularity=granularity):
+            store.merge(arrays, missing_begin, missing_end)
+
+    with span("cache.read", "cache", currency=currency, granularity=granularity):
+        index_begin, index_end = store.find(begin_ms, end_ms)
+        count("cache_reads")
+        if index_begin == index_end:
+            return pd.DataFrame()
+        return store.to_frame(index_begin, index_end)
+
+
+def get_candle_data_many(currencies, begin="2020-01-01 00:00:00", end="now", granularity="1d",
+                         folder=cfg.COINS_FOLDER, workers=cfg.DOWNLOAD_WORKERS,
+                         retries=cfg.DOWNLOAD_RETRIES, backoff=1, client=None):
+    """ Get the candles of several currencies, downloading them concurrently.
+        Threads borrow their clients from the shared pool unless a client is given,
+        and their requests go through the same rate limiter.
+        Each currency is tried up to retries + 1 times, waiting backoff * 2**attempt seconds between tries.
+        Returns a dict currency -> dataframe for the successful ones, and a dict
+        currency -> last exception for the others. """
+    def download(currency):
+        for attempt in range(retries + 1):
+            try:
+                return get_candle_data(currency, begin, end, granularity, folder, client=client)
+            except Exception:
+                if attempt == retries:
+                    raise
+                time.sleep(backoff * 2 ** attempt)
+
+    results = {}
+    errors = {}
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(download, currency): currency for currency in dict.fromkeys(currencies)}
+        for future in as_completed(futures):
+            currency = futures[future]
+            try:
+                results[currency] = future.result()
+            except Exception as e:
+                errors[currency] = e
+    return results, errors
 
 
 if __name__ == '__main__':
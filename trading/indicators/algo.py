@@ -1,13 +1,8 @@
-from trading.get_data import get_candle_data
-from trading.indicators.indicators import (
-    directional_movement,
-    parabolic_sar,
-    rsi,
-    stochastic,
-)
+import trading.config as cfg
+from trading.rules import Rule
+from trading.scanner import scan
 
 from client import authent
-import json
 from klotan import criteria
 
 # OAXBTC, KMDETH
@@ -20,45 +15,19 @@ def get_coins_list(client=None):
     print(f"Retrieved {len(coins)} coins.")
     return coins
 
-def interesting_coin(df):
-    if "RSI14" in df and "ADX14" in df and "Parabolic_SAR" in df:
-        # if df["RSI14"].iloc[-1] < 40:
-        if df["DI+14"].iloc[-1] > df["DI-14"].iloc[-1]:
-                # if df["ADX14"].iloc[-1] > 30:
-            if df["Parabolic_SAR"].iloc[-1] < df["low"].iloc[-1]:
-                #         if df["Stochastic14"].iloc[-1] < 40:
-                #             if df["Stochastic14"].iloc[-1] > df["Stochastic14_Signal3"].iloc[-1]:
-                return True
-
-    return False
+# other conditions tried: RSI14 < 40, ADX14 > 30, Stochastic14 < 40, Stochastic14 > Stochastic14_Signal3
+interesting_coin = Rule("DI+14 > DI-14 and Parabolic_SAR < low", name="interesting_coin")
 
 
 if __name__ == '__main__':
-    coins = get_coins_list()
-    try:
-        with open("empty_coins.json", "r") as fp:
-            empty_coins = json.load(fp)["empty"]
-    except Exception:
-        empty_coins = []
-    coins = [coin for coin in coins if coin not in empty_coins]
-    for coin in coins:
-        df = get_candle_data(coin, begin="2021-01-01 00:00:00", end="now", granularity="1d")
-        if df.empty or df is None:
-            empty_coins.append(coin)
-            with open("empty_coins.json", "w") as fp:
-                json.dump({"empty": empty_coins}, fp)
-            continue
-        df = parabolic_sar(df)
-        df = directional_movement(df)
-        df = rsi(df)
-        df = stochastic(df)
-
-        if interesting_coin(df):
-            if 'ETH' not in coin:
-                print("Interesting coin: ", coin)
-                print(df.tail(), '\n')
-
-        # print(df.tail())
+    # indicators of the previous runs are kept on disk, only the new candles are computed
+    for result in scan(get_coins_list(), [interesting_coin], begin="2021-01-01 00:00:00", end="now", granularity="1d",
+                       cache_folder=f"{cfg.COINS_FOLDER}/indicators"):
+        if result.error is not None:
+            print(f"Could not scan {result.symbol}: {result.error}")
+        elif result.matches and 'ETH' not in result.symbol:
+            print("Interesting coin: ", result.symbol)
+            print(result.tail, '\n')
 
 
 # if __name__ == '__main__':
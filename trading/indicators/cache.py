@@ -0,0 +1,267 @@
+""" Memoized indicator columns, keyed by currency, granularity, indicator and parameters.
+    An entry remembers the candles it was computed from by their number, the open times of the
+    first and last ones and the values of the last one. Given the same candles again, the columns
+    are returned as they are. Given more candles, or a new value of the last one (still open when
+    it was cached), only the values of the new candles are computed:
+    - indicators over windows of candles are computed again on the new candles and the windows
+      before them,
+    - recursive indicators (rsi, directional_movement, parabolic_sar) resume from the incremental
+      state kept with the entry, see trading.indicators.streaming.
+    Entries stay in memory up to a number of bytes, the least recently used ones being dropped.
+    With a folder, entries are also written to disk and read back from it once dropped.
+    Only indicators of the candle fields are cached: an indicator of another column, e.g. the mma of
+    RSI14, is computed again at each call. """
+import copy
+import hashlib
+import inspect
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+import trading.config as cfg
+from trading.indicators.indicators import INDICATORS, _add_columns
+from trading.indicators.plan import ComputePlan
+from trading.indicators.streaming import ADXState, IndicatorState, RSIState, SARState
+
+
+CANDLE_FIELDS = ["time", "open", "high", "low", "close", "volume"]
+
+# indicator -> function of its parameters giving the number of candles before a point and after
+# it that its values depend on
+WINDOWS = {
+    "mma": lambda nb, **params: (nb - 1, 0),
+    "mme": lambda nb, **params: (nb - 1, 0),
+    "macd": lambda mme_short, mme_long, signal: (max(mme_short, mme_long) + signal - 2, 0),
+    "bollinger": lambda nb, **params: (nb - 1, 0),
+    "stochastic": lambda nb, nb_signal: (nb + nb_signal - 2, 0),
+    # the lagging span is the close nb_ahead candles later
+    "ichimoku": lambda nb_lsb, nb_cl, nb_bl, nb_ahead: (max(nb_lsb, nb_cl, nb_bl) - 1 + nb_ahead, nb_ahead),
+}
+
+# recursive indicator -> function of its parameters giving a new incremental state,
+# the candle fields it takes and the columns of its values
+STATES = {
+    "rsi": lambda nb: (RSIState(nb), ["close"], [f"RSI{nb}"]),
+    "directional_movement": lambda nb: (ADXState(nb), ["high", "low", "close"], [f"ADX{nb}", f"DI+{nb}", f"DI-{nb}"]),
+    "parabolic_sar": lambda starting_af, maximum: (SARState(starting_af, maximum), ["high", "low"], ["Parabolic_SAR"]),
+}
+
+
+def indicator_params(name, params=None):
+    """ Parameters of an indicator with their default values filled in """
+    signature = inspect.signature(INDICATORS[name])
+    bound = signature.bind(None, **(params or {}))
+    bound.apply_defaults()
+    return {key: value for key, value in list(bound.arguments.items())[1:]}
+
+
+class CacheEntry:
+    def __init__(self, columns, length, first_time, last_time, last_row, state=None):
+        self.columns = columns
+        self.length = length
+        self.first_time = first_time
+        self.last_time = last_time
+        self.last_row = last_row
+        self.state = state  # incremental state after all the candles but the last one
+
+    @property
+    def nbytes(self):
+        return sum(values.nbytes for values in self.columns.values())
+
+    def valid_length(self, candles):
+        """ Number of candles at the start of candles that the entry was computed from, None if
+            the entry was computed from other candles """
+        times = candles["time"]
+        if len(times) < self.length or times[0] != self.first_time or times[self.length - 1] != self.last_time:
+            return None
+        last_row = [float(candles[field][self.length - 1]) for field in candles if field != "time"]
+        return self.length if last_row == self.last_row else self.length - 1
+
+    def save(self, filename):
+        meta = {
+            "length": self.length, "first_time": self.first_time, "last_time": self.last_time,
+            "last_row": self.last_row, "state": self.state.to_dict() if self.state is not None else None,
+        }
+        tmp_file = f"{filename}.tmp.npz"
+        np.savez(tmp_file, __meta__=np.array(json.dumps(meta)), **self.columns)
+        os.replace(tmp_file, filename)
+
+    @classmethod
+    def load(cls, filename):
+        with np.load(filename) as data:
+            meta = json.loads(str(data["__meta__"]))
+            columns = {column: data[column] for column in data.files if column != "__meta__"}
+        state = IndicatorState.from_dict(meta["state"]) if meta["state"] is not None else None
+        return cls(columns, meta["length"], meta["first_time"], meta["last_time"], meta["last_row"], state)
+
+
+def _on_candles(params):
+    """ Whether the input column of an indicator, if it has one, is a candle field """
+    return params.get("c_input", "close") in CANDLE_FIELDS
+
+
+def _candles(df):
+    return {field: df[field].to_numpy(dtype=np.float64) for field in CANDLE_FIELDS if field in df}
+
+
+def _compute(name, params, candles):
+    # only the candle fields are given, so that an indicator gives the same columns whatever the
+    # other columns of the dataframe
+    return INDICATORS[name](ComputePlan(pd.DataFrame(candles, copy=False)), **params)
+
+
+def _new_entry(name, params, candles):
+    n = len(candles["time"])
+    columns = _compute(name, params, candles)
+    state = None
+    if name in STATES and columns:
+        state, fields, _ = STATES[name](**params)
+        state.update_many(*(candles[field][:n - 1] for field in fields))
+    last_row = [float(values[n - 1]) for field, values in candles.items() if field != "time"]
+    return CacheEntry(columns, n, float(candles["time"][0]), float(candles["time"][n - 1]), last_row, state)
+
+
+def _extend_entry(entry, name, params, candles, valid):
+    """ Entry for candles, of which the valid first ones are those of entry. None if the
+        indicator has to be computed on all the candles. """
+    n = len(candles["time"])
+    last_row = [float(values[n - 1]) for field, values in candles.items() if field != "time"]
+    if name in STATES:
+        if entry.state is None:
+            return None
+        # resume from the state before the last cached candle, which may have changed
+        start = entry.length - 1
+        state = copy.deepcopy(entry.state)
+        _, fields, names = STATES[name](**params)
+        values = state.update_many(*(candles[field][start:n - 1] for field in fields))
+        snapshot = copy.deepcopy(state)
+        last = state.update(*(candles[field][n - 1] for field in fields))
+        values = values if isinstance(values, tuple) else (values,)
+        last = last if isinstance(last, tuple) else (last,)
+        tails = {column: np.append(column_values, value) for column, column_values, value in zip(names, values, last)}
+    elif name in WINDOWS:
+        lookback, lookahead = WINDOWS[name](**params)
+        start = max(valid - lookahead, 0)
+        begin = max(start - lookback, 0)
+        columns = _compute(name, params, {field: values[begin:] for field, values in candles.items()})
+        tails = {column: values[start - begin:] for column, values in columns.items()}
+        snapshot = None
+    else:
+        return None
+    if set(tails) != set(entry.columns):
+        return None
+    columns = {column: np.concatenate([entry.columns[column][:start], tails[column]]) for column in tails}
+    return CacheEntry(columns, n, entry.first_time, float(candles["time"][n - 1]), last_row, snapshot)
+
+
+class IndicatorCache:
+    """ Indicator columns of the candles of currencies, see the module docstring.
+        max_bytes bounds the size of the columns kept in memory, folder is the optional disk tier. """
+    def __init__(self, max_bytes=cfg.INDICATOR_CACHE_BYTES, folder=cfg.INDICATOR_CACHE_FOLDER):
+        self.max_bytes = max_bytes
+        self.folder = folder
+        self.entries = OrderedDict()  # from the least recently used
+        self.nbytes = 0
+        self.hits = 0
+        self.extensions = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+
+    def _file(self, key):
+        symbol, granularity, name, params = key
+        digest = hashlib.sha1(repr(params).encode()).hexdigest()[:16]
+        return os.path.join(self.folder, f"{symbol}_{granularity}_{name}_{digest}.npz")
+
+    def _get(self, key):
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+                return entry
+        if self.folder and os.path.exists(self._file(key)):
+            try:
+                return CacheEntry.load(self._file(key))
+            except (OSError, ValueError, KeyError):
+                return None
+        return None
+
+    def _put(self, key, entry, write=True):
+        if write and self.folder:
+            entry.save(self._file(key))
+        with self._lock:
+            previous = self.entries.pop(key, None)
+            if previous is not None:
+                self.nbytes -= previous.nbytes
+            if entry.nbytes > self.max_bytes:
+                return
+            self.entries[key] = entry
+            self.nbytes += entry.nbytes
+            while self.nbytes > self.max_bytes:
+                _, dropped = self.entries.popitem(last=False)
+                self.nbytes -= dropped.nbytes
+
+    def clear(self):
+        """ Forget the entries in memory """
+        with self._lock:
+            self.entries.clear()
+            self.nbytes = 0
+
+    def columns(self, symbol, granularity, df, name, params=None):
+        """ Columns of an indicator on the candles of df, as a dict name -> array, see compute() """
+        params = indicator_params(name, params)
+        if not _on_candles(params):
+            raise ValueError(f"Only indicators of the candle fields are cached, not of {params['c_input']}")
+        candles = _candles(df)
+        if not len(df):
+            return _compute(name, params, candles)
+        key = (symbol, granularity, name, tuple(sorted(params.items())))
+        entry = self._get(key)
+        valid = entry.valid_length(candles) if entry is not None else None
+        if valid == len(df) and valid == entry.length:
+            self.hits += 1
+            self._put(key, entry, write=False)
+        else:
+            extended = _extend_entry(entry, name, params, candles, valid) if valid else None
+            if extended is not None:
+                self.extensions += 1
+                entry = extended
+            else:
+                self.misses += 1
+                entry = _new_entry(name, params, candles)
+            self._put(key, entry)
+        return {column: values.copy() for column, values in entry.columns.items()}
+
+    def compute_columns(self, symbol, granularity, df, indicators):
+        """ Columns of several indicators, see trading.indicators.indicators.compute_columns().
+            Indicators of other columns than the candle fields are computed without the cache, from
+            the columns of df and of the indicators before them. """
+        columns = {}
+        plan = None
+        for indicator in indicators:
+            name, params = (indicator, {}) if isinstance(indicator, str) else indicator
+            if _on_candles(indicator_params(name, params)):
+                columns.update(self.columns(symbol, granularity, df, name, params))
+                continue
+            plan = plan or ComputePlan(df)
+            plan.add_columns(columns)
+            columns.update(INDICATORS[name](plan, **params))
+        return columns
+
+    def compute(self, symbol, granularity, df, indicators, inplace=False):
+        """ Same as trading.indicators.indicators.compute(), with the columns from the cache """
+        columns = self.compute_columns(symbol, granularity, df, indicators)
+        if inplace:
+            return _add_columns(df, columns)
+        return pd.concat([
+            df.drop(columns=[column for column in columns if column in df]),
+            pd.DataFrame(columns, index=df.index)
+        ], axis=1)
+
+
+indicator_cache = IndicatorCache()
@@ -0,0 +1,137 @@
+""" Single-pass kernels for the recursive indicators.
+    Kernels work on contiguous float64 arrays and fill preallocated output buffers.
+    They are compiled with Numba when it is installed, and run as plain Python loops otherwise. """
+import numpy as np
+
+try:
+    from numba import njit
+except ImportError:  # numba is optional
+    def njit(*args, **kwargs):
+        def decorator(func):
+            return func
+        return decorator
+
+
+def as_array(column):
+    """ Return a contiguous float64 array from a dataframe column """
+    return np.ascontiguousarray(column.to_numpy(dtype=np.float64))
+
+
+def true_range(high, low, close):
+    """ True range of each point. The first one is high - low. """
+    tr = high - low
+    tr[1:] = np.maximum(tr[1:], np.maximum(
+        np.abs(high[1:] - close[:-1]),
+        np.abs(low[1:] - close[:-1])
+    ))
+    return tr
+
+
+def directional_moves(high, low):
+    """ DM+ and DM- of each point. The first ones are 0. """
+    up = np.zeros(len(high))
+    down = np.zeros(len(high))
+    up[1:] = high[1:] - high[:-1]
+    down[1:] = low[:-1] - low[1:]
+    dm_plus = np.where(up > down, np.maximum(up, 0), 0)
+    dm_minus = np.where(up > down, 0, np.maximum(down, 0))
+    return dm_plus, dm_minus
+
+
+@njit(cache=True, error_model="numpy")
+def rsi_kernel(diffs, nb, out):
+    """ Fill out with the RSI of each point from the differences between consecutive closes
+        (diffs[i] = close[i] - close[i - 1], diffs[0] is ignored).
+        Returns the last average gain and loss, (0, 0) if there are not enough points. """
+    n = len(diffs)
+    if n < nb + 1:
+        return 0., 0.
+    avg_gain = np.float64(0)
+    avg_loss = np.float64(0)
+    for i in range(1, nb + 1):
+        if diffs[i] > 0:
+            avg_gain += diffs[i]
+        else:
+            avg_loss -= diffs[i]
+    avg_gain /= nb
+    avg_loss /= nb
+    out[nb] = 100 - 100 / (1 + avg_gain / avg_loss)
+    for i in range(nb + 1, n):
+        gain = diffs[i] if diffs[i] > 0 else 0.
+        loss = -diffs[i] if diffs[i] < 0 else 0.
+        avg_gain = (avg_gain * (nb - 1) + gain) / nb
+        avg_loss = (avg_loss * (nb - 1) + loss) / nb
+        out[i] = 100 - 100 / (1 + avg_gain / avg_loss)
+    return avg_gain, avg_loss
+
+
+@njit(cache=True, error_model="numpy")
+def adx_kernel(tr, dm_plus, dm_minus, nb, out_adx, out_di_plus, out_di_minus):
+    """ Fill the ADX, DI+ and DI- buffers from the true ranges and directional moves.
+        DI are defined from point nb, ADX from point 2 * nb - 1.
+        Returns the smoothed true range, DM+ and DM-, the sum of the first DX and the last ADX. """
+    n = len(tr)
+    tr_nb = np.float64(0)
+    dm_plus_nb = np.float64(0)
+    dm_minus_nb = np.float64(0)
+    for i in range(1, nb + 1):
+        if i < n:
+            tr_nb += tr[i]
+            dm_plus_nb += dm_plus[i]
+            dm_minus_nb += dm_minus[i]
+    adx = 0.
+    dx_sum = 0.
+    for current in range(nb, n):
+        if current > nb:
+            tr_nb = tr_nb - tr_nb / nb + tr[current]
+            dm_plus_nb = dm_plus_nb - dm_plus_nb / nb + dm_plus[current]
+            dm_minus_nb = dm_minus_nb - dm_minus_nb / nb + dm_minus[current]
+        di_plus = dm_plus_nb / tr_nb * 100
+        di_minus = dm_minus_nb / tr_nb * 100
+        dx = abs(di_plus - di_minus) / (di_plus + di_minus) * 100
+        out_di_plus[current] = di_plus
+        out_di_minus[current] = di_minus
+        if current < nb * 2 - 1:
+            dx_sum += dx
+        elif current == nb * 2 - 1:
+            adx = (dx_sum + dx) / nb
+            out_adx[current] = adx
+        else:
+            adx = (adx * (nb - 1) + dx) / nb
+            out_adx[current] = adx
+    return tr_nb, dm_plus_nb, dm_minus_nb, dx_sum, adx
+
+
+@njit(cache=True, error_model="numpy")
+def sar_kernel(high, low, starting_af, maximum, out):
+    """ Fill out with the Parabolic SAR of each point. The first trend is rising.
+        Returns the last trend, SAR, extreme point, extreme high and low, and acceleration factor. """
+    rising = True
+    sar = ep_low = low[0]
+    ep = ep_high = high[0]
+    af = 0.
+    for index in range(len(high)):
+        sar = sar + af * (ep - sar)
+        if high[index] > ep_high:
+            ep_high = high[index]
+            if rising:
+                ep = ep_high
+                af = min(maximum, af + starting_af)
+        elif low[index] < ep_low:
+            ep_low = low[index]
+            if not rising:
+                ep = ep_low
+                af = min(maximum, af + starting_af)
+        if rising:
+            if low[index] < sar:
+                rising = False
+                sar = ep_high
+                ep = ep_low = low[index]
+                af = 0.
+        elif high[index] > sar:
+            rising = True
+            sar = ep_low
+            ep = ep_high = high[index]
+            af = 0.
+        out[index] = sar
+    return rising, sar, ep, ep_high, ep_low, af
@@ -0,0 +1,92 @@
+from collections import OrderedDict
+
+import numpy as np
+
+from trading.indicators.kernels import (
+    as_array,
+    directional_moves,
+    true_range
+)
+from trading.indicators.rolling import (
+    rolling_max,
+    rolling_mean,
+    rolling_min,
+    weighted_mean
+)
+
+
+class ComputePlan:
+    """ Intermediate results shared by the indicators computed on the same dataframe.
+        Each intermediate (input column, price differences, true range, moving averages,
+        rolling extrema) is computed the first time it is asked for, then reused.
+        With max_bytes, the intermediates depending on a period (moving averages, rolling extrema)
+        are dropped from the least recently used beyond max_bytes, the other ones are always kept. """
+    def __init__(self, df, max_bytes=None):
+        self.df = df
+        self.max_bytes = max_bytes
+        self.results = {}
+        self.periodic = OrderedDict()  # from the least recently used, when max_bytes is set
+        self.nbytes = 0
+
+    def __contains__(self, column):
+        return column in self.df or ("column", column) in self.results
+
+    def add_columns(self, columns):
+        """ Make computed indicator columns available as inputs of the next indicators """
+        for name, values in columns.items():
+            self.results[("column", name)] = values
+
+    def _get(self, key, compute):
+        if key not in self.results:
+            self.results[key] = compute()
+        return self.results[key]
+
+    def _get_periodic(self, key, compute):
+        if self.max_bytes is None:
+            return self._get(key, compute)
+        values = self.periodic.get(key)
+        if values is not None:
+            self.periodic.move_to_end(key)
+            return values
+        values = self.periodic[key] = compute()
+        self.nbytes += values.nbytes
+        while self.nbytes > self.max_bytes and len(self.periodic) > 1:
+            _, dropped = self.periodic.popitem(last=False)
+            self.nbytes -= dropped.nbytes
+        return values
+
+    def column(self, name):
+        """ Column of the dataframe as a float64 array """
+        return self._get(("column", name), lambda: as_array(self.df[name]))
+
+    def diff(self, name):
+        """ Difference between consecutive values of a column, the first one is 0 """
+        def compute():
+            values = self.column(name)
+            diffs = np.zeros(len(values))
+            diffs[1:] = values[1:] - values[:-1]
+            return diffs
+        return self._get(("diff", name), compute)
+
+    def true_range(self):
+        return self._get(("true_range",), lambda: true_range(
+            self.column("high"), self.column("low"), self.column("close")
+        ))
+
+    def directional_moves(self):
+        return self._get(("directional_moves",), lambda: directional_moves(
+            self.column("high"), self.column("low")
+        ))
+
+    def mma(self, name, nb):
+        return self._get_periodic(("mma", name, nb), lambda: rolling_mean(self.column(name), nb))
+
+    def mme(self, name, nb, alpha):
+        weights = (1 - alpha) ** np.arange(nb - 1, -1, -1)
+        return self._get_periodic(("mme", name, nb, alpha), lambda: weighted_mean(self.column(name), weights))
+
+    def rolling_min(self, name, nb):
+        return self._get_periodic(("rolling_min", name, nb), lambda: rolling_min(self.column(name), nb))
+
+    def rolling_max(self, name, nb):
+        return self._get_periodic(("rolling_max", name, nb), lambda: rolling_max(self.column(name), nb))
@@ -0,0 +1,56 @@
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+def _pad(values, nb):
+    """ Put nb - 1 NaN values in front of an array computed over full windows,
+        so that it is aligned with the input column. """
+    out = np.full(len(values) + nb - 1, np.nan)
+    out[nb - 1:] = values
+    return out
+
+
+def weighted_mean(values, weights):
+    """ Compute the weighted mean of each window of len(weights) points.
+        weights[-1] is applied to the most recent point of the window.
+        The first len(weights) - 1 points are NaN. """
+    values = np.asarray(values, dtype=np.float64)
+    nb = len(weights)
+    if len(values) < nb:
+        return np.full(len(values), np.nan)
+    sums = np.convolve(values, weights[::-1], mode="valid")
+    return _pad(sums / np.sum(weights), nb)
+
+
+def rolling_mean(values, nb):
+    """ Compute the mean of each window of nb points.
+        The first nb - 1 points are NaN. """
+    return weighted_mean(values, np.ones(nb))
+
+
+def rolling_deviation(values, means, nb):
+    """ Compute the standard deviation of each window of nb points around
+        the given means (one mean per point, aligned with values). """
+    values = np.asarray(values, dtype=np.float64)
+    means = np.asarray(means, dtype=np.float64)
+    # mean((x - m)²) = mean(x²) - 2·m·mean(x) + m²
+    variance = rolling_mean(values ** 2, nb) - 2 * means * rolling_mean(values, nb) + means ** 2
+    return np.sqrt(np.maximum(variance, 0))
+
+
+def rolling_min(values, nb):
+    """ Compute the lowest value of each window of nb points.
+        The first nb - 1 points are NaN. """
+    values = np.asarray(values, dtype=np.float64)
+    if len(values) < nb:
+        return np.full(len(values), np.nan)
+    return _pad(sliding_window_view(values, nb).min(axis=1), nb)
+
+
+def rolling_max(values, nb):
+    """ Compute the highest value of each window of nb points.
+        The first nb - 1 points are NaN. """
+    values = np.asarray(values, dtype=np.float64)
+    if len(values) < nb:
+        return np.full(len(values), np.nan)
+    return _pad(sliding_window_view(values, nb).max(axis=1), nb)
@@ -0,0 +1,374 @@
+""" Incremental versions of the indicators, updated one candle at a time.
+    A state fed with the candles of a dataframe gives the same values as the matching function
+    of trading.indicators.indicators, and can be saved to disk to resume later. """
+import json
+import math
+from collections import deque
+
+import numpy as np
+
+from trading.indicators.kernels import (
+    adx_kernel,
+    directional_moves,
+    rsi_kernel,
+    sar_kernel,
+    true_range
+)
+
+
+class IndicatorState:
+    """ Base class of the incremental indicators.
+        update() takes the values of one new candle and returns the indicator value for it,
+        update_many() takes arrays of candle values and returns an array of indicator values. """
+    _states = {}
+    fields = ()
+    queues = ()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        IndicatorState._states[cls.__name__] = cls
+
+    def update(self, *values):
+        raise NotImplementedError
+
+    @property
+    def value(self):
+        raise NotImplementedError
+
+    def _restore(self):
+        """ Set the attributes derived from the fields, when the state is created or loaded """
+
+    def update_many(self, *columns):
+        columns = [np.asarray(column, dtype=np.float64) for column in columns]
+        return np.array([self.update(*values) for values in zip(*columns)], dtype=np.float64)
+
+    def to_dict(self):
+        data = {}
+        for field in self.fields:
+            value = getattr(self, field)
+            data[field] = list(value) if isinstance(value, deque) else value
+        return {"type": type(self).__name__, "state": data}
+
+    @classmethod
+    def from_dict(cls, data):
+        state_cls = IndicatorState._states[data["type"]]
+        state = state_cls.__new__(state_cls)
+        for field, value in data["state"].items():
+            setattr(state, field, deque(value) if field in state_cls.queues else value)
+        state._restore()
+        return state
+
+    def save(self, filename):
+        with open(filename, "w") as fp:
+            json.dump(self.to_dict(), fp)
+
+    @classmethod
+    def load(cls, filename):
+        with open(filename, "r") as fp:
+            return cls.from_dict(json.load(fp))
+
+
+class RollingWindowState(IndicatorState):
+    """ Mean, standard deviation, lowest and highest value over the last nb points """
+    fields = ("nb", "window", "lows", "highs", "total", "count", "nan_count")
+    queues = ("window", "lows", "highs")
+
+    def __init__(self, nb):
+        self.nb = nb
+        self.window = deque()
+        self.lows = deque()  # [index, value], increasing values
+        self.highs = deque()  # [index, value], decreasing values
+        self.total = 0.
+        self.count = 0
+        self.nan_count = 0
+
+    def update(self, value):
+        value = float(value)
+        if len(self.window) == self.nb:
+            old = self.window.popleft()
+            if math.isnan(old):
+                self.nan_count -= 1
+            else:
+                self.total -= old
+        self.window.append(value)
+        if math.isnan(value):
+            self.nan_count += 1
+        else:
+            self.total += value
+            while self.lows and self.lows[-1][1] >= value:
+                self.lows.pop()
+            self.lows.append([self.count, value])
+            while self.highs and self.highs[-1][1] <= value:
+                self.highs.pop()
+            self.highs.append([self.count, value])
+        self.count += 1
+        for extrema in (self.lows, self.highs):
+            while extrema and extrema[0][0] <= self.count - 1 - self.nb:
+                extrema.popleft()
+        if self.count % self.nb == 0:  # avoid drift of the running sum
+            self.total = sum(v for v in self.window if not math.isnan(v))
+        return self.value
+
+    @property
+    def full(self):
+        return len(self.window) == self.nb and self.nan_count == 0
+
+    @property
+    def value(self):
+        return self.mean
+
+    @property
+    def mean(self):
+        return self.total / self.nb if self.full else math.nan
+
+    @property
+    def std(self):
+        if not self.full:
+            return math.nan
+        mean = self.mean
+        return math.sqrt(sum((v - mean) ** 2 for v in self.window) / self.nb)
+
+    @property
+    def min(self):
+        return self.lows[0][1] if self.full else math.nan
+
+    @property
+    def max(self):
+        return self.highs[0][1] if self.full else math.nan
+
+
+class EMAState(IndicatorState):
+    """ Exponential moving average over the last nb points, as computed by mme() """
+    fields = ("nb", "alpha", "window", "weighted_sum", "nan_count")
+    queues = ("window",)
+
+    def __init__(self, nb, alpha=None):
+        self.nb = nb
+        self.alpha = 2 / (nb + 1) if alpha is None else alpha
+        self.window = deque()
+        self.weighted_sum = 0.
+        self.nan_count = 0
+        self._restore()
+
+    def _restore(self):
+        self.decay = 1 - self.alpha
+        self.oldest_weight = self.decay ** self.nb
+        self.total_weight = sum(self.decay ** p for p in range(self.nb))
+        self.updates = 0
+
+    def update(self, value):
+        value = float(value)
+        self.weighted_sum *= self.decay
+        if len(self.window) == self.nb:
+            old = self.window.popleft()
+            if math.isnan(old):
+                self.nan_count -= 1
+            else:
+                self.weighted_sum -= self.oldest_weight * old
+        self.window.append(value)
+        if math.isnan(value):
+            self.nan_count += 1
+        else:
+            self.weighted_sum += value
+        self.updates += 1
+        if self.updates % self.nb == 0:  # avoid drift of the running sum
+            last = len(self.window) - 1
+            self.weighted_sum = sum(
+                self.decay ** (last - index) * v for index, v in enumerate(self.window) if not math.isnan(v)
+            )
+        return self.value
+
+    @property
+    def value(self):
+        if len(self.window) < self.nb or self.nan_count:
+            return math.nan
+        return self.weighted_sum / self.total_weight
+
+
+class RSIState(IndicatorState):
+    """ RSI computed from the successive closes, as computed by rsi() """
+    fields = ("nb", "previous_close", "count", "avg_gain", "avg_loss")
+
+    def __init__(self, nb=14):
+        self.nb = nb
+        self.previous_close = None
+        self.count = 0
+        self.avg_gain = 0.
+        self.avg_loss = 0.
+
+    def update(self, close):
+        close = float(close)
+        if self.previous_close is not None:
+            diff = close - self.previous_close
+            gain = diff if diff > 0 else 0.
+            loss = -diff if diff < 0 else 0.
+            if self.count <= self.nb:
+                self.avg_gain += gain
+                self.avg_loss += loss
+                if self.count == self.nb:
+                    self.avg_gain /= self.nb
+                    self.avg_loss /= self.nb
+            else:
+                self.avg_gain = (self.avg_gain * (self.nb - 1) + gain) / self.nb
+                self.avg_loss = (self.avg_loss * (self.nb - 1) + loss) / self.nb
+        self.previous_close = close
+        self.count += 1
+        return self.value
+
+    @property
+    def value(self):
+        if self.count <= self.nb:
+            return math.nan
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return float(100 - 100 / (1 + np.float64(self.avg_gain) / self.avg_loss))
+
+    def update_many(self, close):
+        close = np.ascontiguousarray(close, dtype=np.float64)
+        if self.count or len(close) < self.nb + 1:
+            return super().update_many(close)
+        # a new state is filled by the kernel of rsi() in one pass
+        diffs = np.zeros(len(close))
+        diffs[1:] = close[1:] - close[:-1]
+        out = np.full(len(close), np.nan)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            avg_gain, avg_loss = rsi_kernel(diffs, self.nb, out)
+        self.avg_gain, self.avg_loss = float(avg_gain), float(avg_loss)
+        self.previous_close = float(close[-1])
+        self.count = len(close)
+        return out
+
+
+class ADXState(IndicatorState):
+    """ ADX, DI+ and DI- computed from the successive candles, as computed by directional_movement().
+        value is the tuple (ADX, DI+, DI-). """
+    fields = (
+        "nb", "previous", "count", "tr_nb", "dm_plus_nb", "dm_minus_nb",
+        "dx_sum", "adx", "di_plus", "di_minus"
+    )
+
+    def __init__(self, nb=14):
+        self.nb = nb
+        self.previous = None  # [high, low, close]
+        self.count = 0
+        self.tr_nb = 0.
+        self.dm_plus_nb = 0.
+        self.dm_minus_nb = 0.
+        self.dx_sum = 0.
+        self.adx = math.nan
+        self.di_plus = math.nan
+        self.di_minus = math.nan
+
+    def update(self, high, low, close):
+        high, low, close = float(high), float(low), float(close)
+        nb = self.nb
+        if self.previous is not None:
+            previous_high, previous_low, previous_close = self.previous
+            tr = max(high - low, abs(high - previous_close), abs(low - previous_close))
+            up, down = high - previous_high, previous_low - low
+            dm_plus = max(up, 0) if up > down else 0.
+            dm_minus = 0. if up > down else max(down, 0)
+            if self.count <= nb:
+                self.tr_nb += tr
+                self.dm_plus_nb += dm_plus
+                self.dm_minus_nb += dm_minus
+            else:
+                self.tr_nb = self.tr_nb - self.tr_nb / nb + tr
+                self.dm_plus_nb = self.dm_plus_nb - self.dm_plus_nb / nb + dm_plus
+                self.dm_minus_nb = self.dm_minus_nb - self.dm_minus_nb / nb + dm_minus
+            if self.count >= nb:
+                self._update_indexes()
+        self.previous = [high, low, close]
+        self.count += 1
+        return self.value
+
+    def _update_indexes(self):
+        nb = self.nb
+        with np.errstate(divide="ignore", invalid="ignore"):
+            tr_nb = np.float64(self.tr_nb)
+            self.di_plus = float(self.dm_plus_nb / tr_nb * 100)
+            self.di_minus = float(self.dm_minus_nb / tr_nb * 100)
+            dx = float(abs(self.di_plus - self.di_minus) / np.float64(self.di_plus + self.di_minus) * 100)
+        if self.count < nb * 2 - 1:
+            self.dx_sum += dx
+        elif self.count == nb * 2 - 1:
+            self.adx = (self.dx_sum + dx) / nb
+        else:
+            self.adx = (self.adx * (nb - 1) + dx) / nb
+
+    @property
+    def value(self):
+        return self.adx, self.di_plus, self.di_minus
+
+    def update_many(self, high, low, close):
+        high, low, close = (np.ascontiguousarray(column, dtype=np.float64) for column in (high, low, close))
+        if self.count or len(high) < 2 * self.nb:
+            values = super().update_many(high, low, close)
+            return tuple(values.reshape(-1, 3).T)
+        # a new state is filled by the kernel of directional_movement() in one pass
+        dm_plus, dm_minus = directional_moves(high, low)
+        out_adx, out_di_plus, out_di_minus = (np.full(len(high), np.nan) for _ in range(3))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            state = adx_kernel(true_range(high, low, close), dm_plus, dm_minus, self.nb,
+                               out_adx, out_di_plus, out_di_minus)
+        self.tr_nb, self.dm_plus_nb, self.dm_minus_nb, self.dx_sum, self.adx = (float(value) for value in state)
+        self.di_plus, self.di_minus = float(out_di_plus[-1]), float(out_di_minus[-1])
+        self.previous = [float(high[-1]), float(low[-1]), float(close[-1])]
+        self.count = len(high)
+        return out_adx, out_di_plus, out_di_minus
+
+
+class SARState(IndicatorState):
+    """ Parabolic SAR computed from the successive candles, as computed by parabolic_sar() """
+    fields = ("starting_af", "maximum", "rising", "sar", "ep", "ep_high", "ep_low", "af")
+
+    def __init__(self, starting_af=0.02, maximum=0.2):
+        self.starting_af = starting_af
+        self.maximum = maximum
+        self.rising = True
+        self.sar = None
+        self.ep = self.ep_high = self.ep_low = None
+        self.af = 0.
+
+    def update(self, high, low):
+        high, low = float(high), float(low)
+        if self.sar is None:
+            self.sar = self.ep_low = low
+            self.ep = self.ep_high = high
+        self.sar = self.sar + self.af * (self.ep - self.sar)
+        if high > self.ep_high:
+            self.ep_high = high
+            if self.rising:
+                self.ep = self.ep_high
+                self.af = min(self.maximum, self.af + self.starting_af)
+        elif low < self.ep_low:
+            self.ep_low = low
+            if not self.rising:
+                self.ep = self.ep_low
+                self.af = min(self.maximum, self.af + self.starting_af)
+        if self.rising:
+            if low < self.sar:
+                self.rising = False
+                self.sar = self.ep_high
+                self.ep = self.ep_low = low
+                self.af = 0.
+        elif high > self.sar:
+            self.rising = True
+            self.sar = self.ep_low
+            self.ep = self.ep_high = high
+            self.af = 0.
+        return self.value
+
+    @property
+    def value(self):
+        return math.nan if self.sar is None else self.sar
+
+    def update_many(self, high, low):
+        high, low = np.ascontiguousarray(high, dtype=np.float64), np.ascontiguousarray(low, dtype=np.float64)
+        if self.sar is not None or not len(high):
+            return super().update_many(high, low)
+        # a new state is filled by the kernel of parabolic_sar() in one pass
+        out = np.empty(len(high))
+        rising, sar, ep, ep_high, ep_low, af = sar_kernel(high, low, self.starting_af, self.maximum, out)
+        self.rising = bool(rising)
+        self.sar, self.ep, self.ep_high, self.ep_low, self.af = (float(value) for value in (sar, ep, ep_high, ep_low, af))
+        return out
@@ -0,0 +1,134 @@
+""" Search of the indicator parameters giving the best backtest results.
+    Combinations of parameters are evaluated by a pool of processes. Each process maps the candles
+    from shared memory, and keeps a ComputePlan on them, so that the intermediate results that do not
+    depend on the swept parameters (price differences, true range, moving averages of an unchanged
+    period...) are computed once per process instead of once per combination. The moving averages
+    and rolling extrema of the plan are bounded by OPTIMIZE_PLAN_BYTES, as each swept period adds
+    its own. """
+import itertools
+import random
+from collections import ChainMap
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+import trading.config as cfg
+from trading.backtest import backtest_signals
+from trading.indicators.indicators import INDICATORS
+from trading.indicators.plan import ComputePlan
+from trading.rules import Rule
+from trading.shared import SharedFrame
+
+
+class Param:
+    """ Placeholder for a swept parameter in the indicators of a RuleObjective """
+    def __init__(self, name):
+        self.name = name
+
+    def __repr__(self):
+        return f"Param({self.name!r})"
+
+
+class RuleObjective:
+    """ Score of a backtest of rules, for one combination of parameters.
+        indicators is a list of (name, params) as in compute(), where params may contain Param
+        placeholders. entry and exit are rules in which {name} is replaced by the value of the
+        parameter, e.g. "RSI{rsi} < 30". metric is the field of BacktestResult to maximize. """
+    def __init__(self, indicators, entry, exit=None, metric="sharpe", fee=cfg.FEES, slippage=cfg.SLIPPAGE):
+        self.indicators = indicators
+        self.entry = entry
+        self.exit = exit
+        self.metric = metric
+        self.fee = fee
+        self.slippage = slippage
+
+    def __call__(self, plan, **params):
+        columns = {}
+        for name, indicator_params in self.indicators:
+            indicator_params = {
+                key: params[value.name] if isinstance(value, Param) else value
+                for key, value in indicator_params.items()
+            }
+            columns.update(INDICATORS[name](plan, **indicator_params))
+        # indicator columns are not added to the plan, their names do not always depend on their parameters
+        data = ChainMap(columns, plan.df)
+        entries = Rule(self.entry.format(**params)).evaluate(data)
+        if self.exit is None:
+            exits = ~entries
+        else:
+            exits = Rule(self.exit.format(**params)).evaluate(data)
+        result = backtest_signals(plan.df, entries, exits, self.fee, self.slippage)
+        return getattr(result, self.metric)
+
+
+def grid(space):
+    """ Every combination of the values of space, a dict parameter -> list of values """
+    names = list(space)
+    for values in itertools.product(*(space[name] for name in names)):
+        yield dict(zip(names, values))
+
+
+def sample(space, n, seed=None):
+    """ n random combinations from space, a dict parameter -> list of values or (low, high) range.
+        Ranges of integers give integers, other ranges floats. """
+    generator = random.Random(seed)
+
+    def draw(values):
+        if isinstance(values, tuple):
+            low, high = values
+            if isinstance(low, int) and isinstance(high, int):
+                return generator.randint(low, high)
+            return generator.uniform(low, high)
+        return generator.choice(values)
+
+    for _ in range(n):
+        yield {name: draw(values) for name, values in space.items()}
+
+
+_worker = {}
+
+
+def _init_worker(df, objective):
+    _worker["plan"] = ComputePlan(df, max_bytes=cfg.OPTIMIZE_PLAN_BYTES)
+    _worker["objective"] = objective
+
+
+def _init_shared_worker(info, objective):
+    # the block stays mapped until the process exits
+    _worker["frame"] = SharedFrame.attach(info)
+    _init_worker(_worker["frame"].to_frame(), objective)
+
+
+def _evaluate(params):
+    return _worker["objective"](_worker["plan"], **params)
+
+
+def evaluate(df, objective, combinations, workers=None, chunksize=16):
+    """ Score of each combination of parameters as a dataframe sorted from the best score,
+        with one column per parameter and a score column.
+        objective is called with a ComputePlan on df and the parameters as keyword arguments,
+        it must be defined at module level to be sent to the processes.
+        With workers=1 the combinations are evaluated in the current process. """
+    combinations = list(combinations)
+    if workers == 1:
+        _init_worker(df, objective)
+        scores = [_evaluate(params) for params in combinations]
+    else:
+        with SharedFrame.create(df) as frame:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_shared_worker,
+                                     initargs=(frame.info, objective)) as executor:
+                scores = list(executor.map(_evaluate, combinations, chunksize=chunksize))
+    _worker.clear()
+    results = pd.DataFrame(combinations)
+    results["score"] = scores
+    return results.sort_values("score", ascending=False, na_position="last", kind="stable").reset_index(drop=True)
+
+
+def grid_search(df, objective, space, workers=None):
+    """ Evaluate every combination of space, see evaluate() """
+    return evaluate(df, objective, grid(space), workers)
+
+
+def random_search(df, objective, space, n=100, seed=None, workers=None):
+    """ Evaluate n random combinations of space, see evaluate() """
+    return evaluate(df, objective, sample(space, n, seed), workers)
@@ -0,0 +1,184 @@
+""" Timing and counter hooks of the data and indicator pipeline: downloads, cache reads and writes,
+    indicator computations and plots. They are off by default and then only cost a flag check.
+    Profiling is switched on with the TRADING_PROFILE=1 environment variable, PROFILE in the config,
+    or enable(). When TRADING_PROFILE_TRACE is set, the trace is written to that file at exit and the
+    summary is printed.
+
+        with span("store.merge", "cache", rows=len(klines)):
+            ...
+        export_chrome_trace("trace.json")  # chrome://tracing, https://ui.perfetto.dev or speedscope
+        print_summary()
+
+    Only the events of the current process are recorded. """
+import atexit
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager, nullcontext
+
+import pandas as pd
+
+import trading.config as cfg
+
+
+_enabled = False
+_lock = threading.Lock()
+_events = deque(maxlen=cfg.PROFILE_MAX_EVENTS)  # (name, category, start ns, duration ns, thread id, args)
+_counter_events = deque(maxlen=cfg.PROFILE_MAX_EVENTS)  # (name, time ns, total)
+_stats = {}  # name -> [category, calls, total ns, max ns]
+_counters = {}
+_origin = time.perf_counter_ns()
+_null_span = nullcontext()
+
+
+def enabled():
+    return _enabled
+
+
+def enable():
+    global _enabled
+    _enabled = True
+
+
+def disable():
+    global _enabled
+    _enabled = False
+
+
+def reset():
+    """ Forget the recorded events and counters """
+    global _origin
+    with _lock:
+        _events.clear()
+        _counter_events.clear()
+        _stats.clear()
+        _counters.clear()
+        _origin = time.perf_counter_ns()
+
+
+def _record(name, category, start, duration, args):
+    with _lock:
+        _events.append((name, category, start, duration, threading.get_ident(), args))
+        stats = _stats.get(name)
+        if stats is None:
+            _stats[name] = [category, 1, duration, duration]
+        else:
+            stats[1] += 1
+            stats[2] += duration
+            stats[3] = max(stats[3], duration)
+
+
+@contextmanager
+def _span(name, category, args):
+    start = time.perf_counter_ns()
+    try:
+        yield
+    finally:
+        _record(name, category, start, time.perf_counter_ns() - start, args)
+
+
+def span(name, category="function", **args):
+    """ Context manager timing its block, args are shown with the event in the trace """
+    if not _enabled:
+        return _null_span
+    return _span(name, category, args)
+
+
+def profiled(name=None, category="function"):
+    """ Decorator timing each call of a function, under name (the qualified name of the function by default) """
+    def decorator(function):
+        label = name or function.__qualname__
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return function(*args, **kwargs)
+            start = time.perf_counter_ns()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                _record(label, category, start, time.perf_counter_ns() - start, None)
+        return wrapper
+    return decorator
+
+
+def count(name, n=1):
+    """ Add n to a counter """
+    if not _enabled:
+        return
+    with _lock:
+        total = _counters.get(name, 0) + n
+        _counters[name] = total
+        _counter_events.append((name, time.perf_counter_ns(), total))
+
+
+def counters():
+    with _lock:
+        return dict(_counters)
+
+
+def chrome_trace():
+    """ Recorded events in the Chrome trace event format, as a dict """
+    pid = os.getpid()
+    with _lock:
+        events = list(_events)
+        counter_events = list(_counter_events)
+    trace = [
+        {
+            "name": name, "cat": category, "ph": "X", "pid": pid, "tid": tid,
+            "ts": (start - _origin) / 1000, "dur": duration / 1000,
+            **({"args": args} if args else {})
+        }
+        for name, category, start, duration, tid, args in events
+    ]
+    trace.extend(
+        {"name": name, "ph": "C", "pid": pid, "ts": (timestamp - _origin) / 1000, "args": {name: total}}
+        for name, timestamp, total in counter_events
+    )
+    trace.sort(key=lambda event: event["ts"])
+    return {"traceEvents": trace, "displayTimeUnit": "ms"}
+
+
+def export_chrome_trace(filename):
+    with open(filename, "w") as fp:
+        json.dump(chrome_trace(), fp, default=str)
+
+
+def summary():
+    """ Dataframe of the calls, total, mean and max time in ms of each timed name, sorted from the
+        longest total. percent is the share of the time elapsed since profiling was reset. """
+    with _lock:
+        stats = {name: list(values) for name, values in _stats.items()}
+    elapsed = max(time.perf_counter_ns() - _origin, 1)
+    rows = [
+        {
+            "name": name, "category": category, "calls": calls, "total_ms": total / 1e6,
+            "mean_ms": total / calls / 1e6, "max_ms": maximum / 1e6, "percent": 100 * total / elapsed,
+        }
+        for name, (category, calls, total, maximum) in stats.items()
+    ]
+    columns = ["name", "category", "calls", "total_ms", "mean_ms", "max_ms", "percent"]
+    return pd.DataFrame(rows, columns=columns).sort_values("total_ms", ascending=False, ignore_index=True)
+
+
+def print_summary():
+    table = summary()
+    if not table.empty:
+        print(table.to_string(index=False, float_format="{:.3f}".format))
+    for name, total in sorted(counters().items()):
+        print(f"{name}: {total}")
+
+
+def _at_exit():
+    filename = os.environ.get("TRADING_PROFILE_TRACE")
+    if filename and (_events or _counter_events):
+        export_chrome_trace(filename)
+        print_summary()
+
+
+if cfg.PROFILE or os.environ.get("TRADING_PROFILE", "").lower() in ("1", "true", "yes"):
+    enable()
+atexit.register(_at_exit)
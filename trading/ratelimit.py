@@ -0,0 +1,34 @@
+import threading
+import time
+
+
+class TokenBucket:
+    """ Thread-safe token bucket.
+        Tokens are added at `rate` per second up to `capacity`, and each request takes its weight
+        in tokens, waiting until enough of them are available. A request heavier than the
+        capacity waits for a full bucket and leaves it in debt. """
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, weight=1):
+        """ Take weight tokens, blocking until they are available. Returns the time waited. """
+        waited = 0
+        with self.lock:
+            while True:
+                self._refill()
+                needed = min(weight, self.capacity)
+                if self.tokens >= needed:
+                    self.tokens -= weight
+                    return waited
+                delay = (needed - self.tokens) / self.rate
+                time.sleep(delay)
+                waited += delay
@@ -0,0 +1,104 @@
+""" Candles of a granularity derived from the cached candles of a finer one, instead of downloading
+    each granularity. Derived candles are kept in their own cache in {folder}/resampled, which only
+    holds closed candles and is extended as new base candles arrive. The candle still open is
+    recomputed from the base candles at each call. """
+import math
+import time
+
+import numpy as np
+import pandas as pd
+
+import trading.config as cfg
+from trading.get_data import g_mapping, get_candle_data
+from trading.store import FIELDS, KlineStore
+from trading.utils import date_to_milliseconds
+
+
+def now_ms():
+    return time.time() * 1000
+
+
+def resample_arrays(arrays, period):
+    """ Aggregate klines sorted by open time into klines of period ms: first open, highest high,
+        lowest low, last close and total volume. Like on Binance, periods start at multiples of
+        period since the epoch (midnight UTC for days). """
+    times = np.asarray(arrays["time"]).astype(np.int64)
+    if not len(times):
+        return {field: np.empty(0, dtype=dtype) for field, dtype in FIELDS.items()}
+    buckets = times // period * period
+    starts = np.flatnonzero(np.concatenate([[True], buckets[1:] != buckets[:-1]]))
+    ends = np.append(starts[1:], len(times)) - 1
+    return {
+        "time": buckets[starts],
+        "open": np.asarray(arrays["open"], dtype=np.float64)[starts],
+        "high": np.maximum.reduceat(np.asarray(arrays["high"], dtype=np.float64), starts),
+        "low": np.minimum.reduceat(np.asarray(arrays["low"], dtype=np.float64), starts),
+        "close": np.asarray(arrays["close"], dtype=np.float64)[ends],
+        "volume": np.add.reduceat(np.asarray(arrays["volume"], dtype=np.float64), starts),
+    }
+
+
+def covers(store, first, last):
+    """ Whether the klines of the store were requested for the candles opened from first to last,
+        but maybe the last one, which is then only partly downloaded in the base granularity """
+    missing = store.missing(first, last + 1)
+    return not missing or (len(missing) == 1 and missing[0][0] >= last)
+
+
+def base_granularity(currency, granularity, first, last, folder=cfg.COINS_FOLDER):
+    """ Coarsest granularity from which the candles of granularity opened from first to last can be
+        derived, among those already cached for the whole range. None if there is none: deriving
+        the candles from a cache of a small part of the range would download far more klines. """
+    period = g_mapping[granularity]
+    candidates = [
+        base for base, base_period in g_mapping.items()
+        if base_period < period and period % base_period == 0
+        and covers(KlineStore(folder, currency, base), first, last)
+    ]
+    return max(candidates, key=g_mapping.get, default=None)
+
+
+def _resampled(currency, begin, end, base, period, folder):
+    """ Klines of period opened between begin and end, from the base klines """
+    # base klines are not requested in the future, their cache would consider them as requested
+    base_end = min(end + period - int(g_mapping[base]), int(now_ms()))
+    df = get_candle_data(currency, begin, base_end, base, folder)
+    if df.empty:
+        return resample_arrays({"time": []}, period)
+    arrays = resample_arrays({field: df[field].to_numpy() for field in FIELDS}, period)
+    keep = (arrays["time"] >= begin) & (arrays["time"] <= end)
+    return {field: values[keep] for field, values in arrays.items()}
+
+
+def get_resampled_data(currency, begin="2020-01-01 00:00:00", end="now", granularity="1d",
+                       folder=cfg.COINS_FOLDER, base=None):
+    """ Same candles as get_candle_data(), derived from a granularity cached for the currency on the
+        whole range (or from base). Without such a cache, the candles are downloaded as usual. """
+    period = int(g_mapping[granularity])
+    first = math.ceil(date_to_milliseconds(begin) / period) * period
+    last = int(date_to_milliseconds(end)) // period * period
+    base = base or base_granularity(currency, granularity, first, last, folder)
+    if base is None:
+        return get_candle_data(currency, begin, end, granularity, folder)
+
+    last_closed = min(last, int(now_ms()) // period * period - period)
+    store = KlineStore(f"{folder}/resampled", currency, granularity)
+
+    # Derive the closed candles never derived before. The interval of open times [first, last_closed]
+    # is extended by 1 ms so that a single candle is not an empty interval.
+    for missing_begin, missing_end in store.missing(first, last_closed + 1) if first <= last_closed else []:
+        store.merge(_resampled(currency, missing_begin, missing_end, base, period, folder), missing_begin, missing_end)
+
+    frames = []
+    if store.exists():
+        frames.append(store.to_frame(*store.find(first, last_closed)))
+    if first <= last and last > last_closed:
+        # the candle still open is not cached
+        frames.append(pd.DataFrame({
+            field: values.astype(np.float64)
+            for field, values in _resampled(currency, last, last, base, period, folder).items()
+        }))
+    frames = [frame for frame in frames if not frame.empty]
+    if not frames:
+        return pd.DataFrame()
+    return frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True)
@@ -0,0 +1,239 @@
+""" Rules on indicator values written as text, e.g. "DI+14 > DI-14 and Parabolic_SAR < low and RSI14 < 40".
+    A rule is compiled once into a NumPy expression, then evaluated on whole arrays at once:
+    the last values of many currencies (one row per currency), or the whole history of one currency.
+
+    Syntax:
+        comparisons      <, <=, >, >=, ==, != (chains such as 30 < RSI14 < 70 are allowed)
+        arithmetic       +, -, *, / and parentheses
+        logic            and, or, not
+        columns          names as in the dataframes. Names may contain + and - (DI+14, MME12-0.15),
+                         so arithmetic + and - must be surrounded by spaces when next to a name.
+                         Other names are quoted with backticks, e.g. `MACD(12,26)` > 0.
+    A comparison involving a NaN value is neither true nor false, like in SQL: RSI14 < 40,
+    not RSI14 < 40 and RSI14 != 40 are all false when RSI14 is NaN, so that candles or currencies
+    without a value never match. "a or b" is still true when a is true and b involves a NaN value. """
+import re
+
+import numpy as np
+
+
+TOKEN = re.compile(r"""\s*(?:
+    (?P<number>(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?)
+    |`(?P<quoted>[^`]+)`
+    |(?P<name>[A-Za-z_][\w.]*(?:[+-]\w[\w.]*)*)
+    |(?P<op><=|>=|==|!=|<|>|\+|-|\*|/|\(|\))
+)""", re.VERBOSE)
+
+COMPARISONS = ("<", "<=", ">", ">=", "==", "!=")
+# comparison -> comparison true where the first one is false. Both are false on NaN values, but !=
+# which is true on them, so it also checks that the values are not NaN
+NEGATIONS = {"<": ">=", "<=": ">", ">": "<=", ">=": "<", "==": "!=", "!=": "=="}
+KEYWORDS = ("and", "or", "not")
+
+
+def tokenize(text):
+    tokens = []
+    position = 0
+    text = text.rstrip()
+    while position < len(text):
+        match = TOKEN.match(text, position)
+        if not match or match.end() == position:
+            raise ValueError(f"Unexpected character at position {position} in rule: {text}")
+        kind = match.lastgroup
+        value = match.group(kind)
+        if kind == "name" and value in KEYWORDS:
+            kind = "op"
+        elif kind == "quoted":
+            kind = "name"
+        tokens.append((kind, value))
+        position = match.end()
+    return tokens
+
+
+def _is_number(source):
+    try:
+        float(source)
+        return True
+    except ValueError:
+        return False
+
+
+class _Parser:
+    """ Recursive descent parser producing the source of the NumPy expression.
+        Each parse method returns (source, is_boolean). The source of a condition is a pair of
+        expressions: where it is true, and where it is false, both being false where it involves
+        NaN values. """
+    def __init__(self, text):
+        self.text = text
+        self.tokens = tokenize(text)
+        self.position = 0
+        self.columns = []
+
+    def error(self, message):
+        return ValueError(f"{message} in rule: {self.text}")
+
+    def peek(self):
+        return self.tokens[self.position] if self.position < len(self.tokens) else (None, None)
+
+    def accept(self, *ops):
+        kind, value = self.peek()
+        if kind == "op" and value in ops:
+            self.position += 1
+            return value
+        return None
+
+    def parse(self):
+        source, boolean = self.logical_or()
+        if self.position < len(self.tokens):
+            raise self.error(f"Unexpected '{self.peek()[1]}'")
+        if not boolean:
+            raise self.error("A rule must be a condition")
+        return source[0]
+
+    def logical(self, operator, true_operator, false_operator, operand):
+        source, boolean = operand()
+        while self.accept(operator):
+            other, other_boolean = operand()
+            if not (boolean and other_boolean):
+                raise self.error(f"'{operator}' needs conditions on both sides")
+            source = (
+                f"({source[0]} {true_operator} {other[0]})",
+                f"({source[1]} {false_operator} {other[1]})"
+            )
+        return source, boolean
+
+    def logical_or(self):
+        return self.logical("or", "|", "&", self.logical_and)
+
+    def logical_and(self):
+        return self.logical("and", "&", "|", self.logical_not)
+
+    def logical_not(self):
+        if self.accept("not"):
+            source, boolean = self.logical_not()
+            if not boolean:
+                raise self.error("'not' needs a condition")
+            return (source[1], source[0]), True
+        return self.comparison()
+
+    def comparison(self):
+        left, boolean = self.arithmetic()
+        true_conditions = []
+        false_conditions = []
+        while (operator := self.accept(*COMPARISONS)):
+            right, right_boolean = self.arithmetic()
+            if boolean or right_boolean:
+                raise self.error(f"'{operator}' compares values, not conditions")
+            conditions = {
+                operator: f"({left} {operator} {right})",
+                NEGATIONS[operator]: f"({left} {NEGATIONS[operator]} {right})",
+            }
+            if "!=" in conditions:
+                defined = [f"~isnan({value})" for value in (left, right) if not _is_number(value)]
+                conditions["!="] = f"({' & '.join([conditions['!=']] + defined)})"
+            true_conditions.append(conditions[operator])
+            false_conditions.append(conditions[NEGATIONS[operator]])
+            left = right
+        if not true_conditions:
+            return left, boolean
+        if len(true_conditions) == 1:
+            return (true_conditions[0], false_conditions[0]), True
+        return (f"({' & '.join(true_conditions)})", f"({' | '.join(false_conditions)})"), True
+
+    def binary(self, operators, operand):
+        source, boolean = operand()
+        while (operator := self.accept(*operators)):
+            other, other_boolean = operand()
+            if boolean or other_boolean:
+                raise self.error(f"'{operator}' needs values on both sides")
+            source = f"({source} {operator} {other})"
+        return source, boolean
+
+    def arithmetic(self):
+        return self.binary(("+", "-"), self.term)
+
+    def term(self):
+        return self.binary(("*", "/"), self.factor)
+
+    def factor(self):
+        kind, value = self.peek()
+        if kind is None:
+            raise self.error("Unexpected end")
+        self.position += 1
+        if kind == "number":
+            return repr(float(value)), False
+        if kind == "name":
+            if value not in self.columns:
+                self.columns.append(value)
+            return f"v[{self.columns.index(value)}]", False
+        if value == "-":
+            source, boolean = self.factor()
+            if boolean:
+                raise self.error("'-' needs a value")
+            return f"(-{source})", False
+        if value == "(":
+            source = self.logical_or()
+            if not self.accept(")"):
+                raise self.error("Missing ')'")
+            return source
+        raise self.error(f"Unexpected '{value}'")
+
+
+class Rule:
+    """ Condition on indicator values, compiled from text.
+        columns lists the columns used by the rule, in the order expected by evaluate_columns(). """
+    def __init__(self, text, name=None):
+        self.text = text
+        self.name = name or text
+        parser = _Parser(text)
+        self.source = parser.parse()
+        self.columns = parser.columns
+        self.code = compile(self.source, f"<rule {self.name}>", "eval")
+
+    def __reduce__(self):
+        return Rule, (self.text, self.name)
+
+    def __repr__(self):
+        return f"Rule({self.text!r})"
+
+    def evaluate_columns(self, values):
+        """ Evaluate the rule on a list of arrays, one per column of self.columns """
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.asarray(eval(self.code, {"__builtins__": {}}, {"v": values, "isnan": np.isnan}), dtype=bool)
+
+    def evaluate(self, data):
+        """ Evaluate the rule on each row of a dataframe or of a dict column -> array """
+        return self.evaluate_columns([np.asarray(data[column], dtype=np.float64) for column in self.columns])
+
+    def evaluate_matrix(self, matrix, columns):
+        """ Evaluate the rule on each row of a 2-D array whose columns are named by columns """
+        indexes = {column: index for index, column in enumerate(columns)}
+        return self.evaluate_columns([matrix[:, indexes[column]] for column in self.columns])
+
+    def __call__(self, df):
+        """ Whether the last row of df matches the rule. False if a column is missing. """
+        if df.empty or any(column not in df for column in self.columns):
+            return False
+        return bool(self.evaluate(df.iloc[-1:])[0])
+
+
+def latest_values(frames, columns):
+    """ 2-D array of the last value of each column in each dataframe, one row per dataframe.
+        Missing columns and empty dataframes give NaN. """
+    matrix = np.full((len(frames), len(columns)), np.nan)
+    for row, df in enumerate(frames):
+        if df.empty:
+            continue
+        for index, column in enumerate(columns):
+            if column in df:
+                matrix[row, index] = df[column].iloc[-1]
+    return matrix
+
+
+def screen(matrix, columns, rules):
+    """ Evaluate several rules on each row of a 2-D array whose columns are named by columns.
+        Returns a boolean array with one row per row of matrix and one column per rule. """
+    result = np.empty((len(matrix), len(rules)), dtype=bool)
+    for index, rule in enumerate(rules):
+        result[:, index] = rule.evaluate_matrix(matrix, columns)
+    return result
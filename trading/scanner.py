@@ -0,0 +1,141 @@
+""" Scan a list of currencies for the ones whose last candles match some rules.
+    Candles are loaded by threads, since loading waits on the exchange and the disk,
+    while indicators and rules are computed by a pool of processes. Each currency goes to the
+    process pool as soon as its candles are loaded, so that loading and computing overlap.
+    Candles reach the processes through shared memory rather than being pickled. """
+import json
+import os
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+import trading.config as cfg
+from trading.get_data import get_candle_data
+from trading.indicators.cache import IndicatorCache
+from trading.indicators.indicators import compute
+from trading.shared import SharedFrame
+
+
+ScanResult = namedtuple("ScanResult", ["symbol", "matches", "tail", "error"])
+ScanResult.__doc__ = """ Outcome of the scan of one currency.
+    matches is the list of the names of the rules that matched, tail the last candles with
+    the indicators, error the exception raised while loading or computing, if any. """
+
+SCAN_INDICATORS = ["parabolic_sar", "directional_movement", "rsi", "stochastic"]
+
+
+def load_skip_list(filename=cfg.SKIP_FILE):
+    """ Currencies that had no candles in previous scans """
+    try:
+        with open(filename, "r") as fp:
+            return json.load(fp)["empty"]
+    except (FileNotFoundError, json.JSONDecodeError, KeyError):
+        return []
+
+
+def save_skip_list(empty, filename=cfg.SKIP_FILE):
+    tmp_file = f"{filename}.tmp"
+    with open(tmp_file, "w") as fp:
+        json.dump({"empty": empty}, fp)
+    os.replace(tmp_file, filename)
+
+
+def _rule_names(rules):
+    if isinstance(rules, dict):
+        return rules
+    return {getattr(rule, "name", None) or rule.__name__: rule for rule in rules}
+
+
+def evaluate(df, indicators, rules, tail=5, symbol=None, granularity=None, cache_folder=None):
+    """ Compute the indicators on the candles of one currency and check the rules against them.
+        Runs in the worker processes, so only the last candles are sent back.
+        With a cache_folder, the indicator columns of the previous scans of the currency are read from
+        it and only extended to the new candles. """
+    if cache_folder:
+        # a currency is evaluated once per scan, only the disk tier of the cache is useful
+        df = IndicatorCache(max_bytes=0, folder=cache_folder).compute(symbol, granularity, df, indicators, inplace=True)
+    else:
+        df = compute(df, indicators, inplace=True)
+    matches = [name for name, rule in rules.items() if rule(df)]
+    return matches, df.tail(tail).copy()
+
+
+def evaluate_shared(info, indicators, rules, tail=5, symbol=None, granularity=None, cache_folder=None):
+    """ evaluate() on candles in shared memory """
+    frame = SharedFrame.attach(info)
+    try:
+        return evaluate(frame.to_frame(), indicators, rules, tail, symbol, granularity, cache_folder)
+    finally:
+        frame.close()
+
+
+def _load(symbol, begin, end, granularity, folder):
+    """ Candles of a currency copied to shared memory, None if there are none """
+    df = get_candle_data(symbol, begin, end, granularity, folder)
+    return None if df.empty else SharedFrame.create(df)
+
+
+def scan(symbols, rules, granularity="1d", begin="2021-01-01 00:00:00", end="now",
+         indicators=SCAN_INDICATORS, folder=cfg.COINS_FOLDER, skip_file=cfg.SKIP_FILE,
+         workers=None, loaders=cfg.DOWNLOAD_WORKERS, cache_folder=cfg.INDICATOR_CACHE_FOLDER):
+    """ Yield a ScanResult for each currency of symbols, in the order the scans finish.
+        rules are functions taking a dataframe of candles and indicators and returning a boolean,
+        given as a list or as a dict name -> rule. Rules and indicators are sent to the worker
+        processes, so rules must be defined at module level.
+        Currencies listed in skip_file are not scanned. Currencies without candles are added
+        to it, in one write at the end of the scan.
+        workers is the number of processes, one per core by default.
+        With a cache_folder, indicators are only computed on the candles added since the previous scan. """
+    rules = _rule_names(rules)
+    skipped = set(load_skip_list(skip_file))
+    empty = []
+    loader_pool = ThreadPoolExecutor(max_workers=loaders)
+    compute_pool = ProcessPoolExecutor(max_workers=workers)
+    loads = {}
+    computes = {}  # future -> (symbol, shared frame)
+    try:
+        # start the processes before the loader threads: a process forked while a thread
+        # holds a lock starts with that lock taken forever
+        compute_pool.submit(int).result()
+        loads.update({
+            loader_pool.submit(_load, symbol, begin, end, granularity, folder): symbol
+            for symbol in dict.fromkeys(symbols) if symbol not in skipped
+        })
+        pending = set(loads)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future in loads:
+                    symbol = loads.pop(future)
+                    try:
+                        frame = future.result()
+                    except Exception as e:
+                        yield ScanResult(symbol, [], None, e)
+                        continue
+                    if frame is None:
+                        empty.append(symbol)
+                        continue
+                    computation = compute_pool.submit(
+                        evaluate_shared, frame.info, indicators, rules, 5, symbol, granularity, cache_folder
+                    )
+                    computes[computation] = symbol, frame
+                    pending.add(computation)
+                else:
+                    symbol, frame = computes.pop(future)
+                    frame.unlink()
+                    try:
+                        matches, tail = future.result()
+                    except Exception as e:
+                        yield ScanResult(symbol, [], None, e)
+                    else:
+                        yield ScanResult(symbol, matches, tail, None)
+    finally:
+        loader_pool.shutdown(cancel_futures=True)
+        compute_pool.shutdown(cancel_futures=True)
+        # blocks of the scans left unfinished when the generator is closed early
+        frames = [frame for _, frame in computes.values()]
+        frames += [future.result() for future in loads if not future.cancelled() and not future.exception()]
+        for frame in frames:
+            if frame is not None:
+                frame.unlink()
+        if empty:
+            save_skip_list(sorted(skipped.union(empty)), skip_file)
@@ -0,0 +1,126 @@
+""" Candle arrays in shared memory, to hand them to other processes without copying them.
+    The process that loads the candles copies their columns once into a shared memory block,
+    and sends the small SharedFrameInfo describing it to the workers, which map the same block.
+    Output columns can be allocated in the block too, for the workers to write their results. """
+import os
+import threading
+from collections import namedtuple
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+import pandas as pd
+
+from trading.indicators.indicators import compute_columns
+
+
+SharedFrameInfo = namedtuple("SharedFrameInfo", ["name", "columns", "outputs", "length"])
+
+_tracker_lock = threading.Lock()
+
+
+def _reset_tracker_lock():
+    global _tracker_lock
+    _tracker_lock = threading.Lock()
+
+
+# a process forked while another thread creates a block would start with the lock taken
+os.register_at_fork(after_in_child=_reset_tracker_lock)
+
+
+def _create(size):
+    with _tracker_lock:
+        return shared_memory.SharedMemory(create=True, size=size)
+
+
+def _attach(name):
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)  # Python >= 3.13
+    except TypeError:
+        pass
+    # Before Python 3.13 every attached block is registered to be removed when the process exits,
+    # while it belongs to the process that created it
+    with _tracker_lock:
+        register = resource_tracker.register
+        resource_tracker.register = lambda name, rtype: None
+        try:
+            return shared_memory.SharedMemory(name=name)
+        finally:
+            resource_tracker.register = register
+
+
+class SharedFrame:
+    """ float64 columns of the same length stored one after the other in a shared memory block:
+        the input columns copied from a dataframe, then the output columns, filled with NaN.
+        The process that creates a SharedFrame removes the block with unlink(), or when leaving a
+        with statement. Other processes attach to it with SharedFrame.attach(info) and only close it.
+        Arrays and dataframes returned by column() and to_frame() are views on the block:
+        they must not be used after close(). """
+    def __init__(self, memory, columns, outputs, length, owner):
+        self.memory = memory
+        self.columns = list(columns)
+        self.outputs = list(outputs)
+        self.length = length
+        self.owner = owner
+        self.data = np.ndarray((len(self.columns) + len(self.outputs), length), dtype=np.float64, buffer=memory.buf)
+
+    @classmethod
+    def create(cls, df, columns=None, outputs=()):
+        """ Copy columns of df (all of them by default) into a new block, followed by the outputs """
+        columns = list(df.columns if columns is None else columns)
+        length = len(df)
+        size = max((len(columns) + len(outputs)) * length * 8, 1)
+        frame = cls(_create(size), columns, outputs, length, True)
+        for index, column in enumerate(columns):
+            frame.data[index] = df[column].to_numpy(dtype=np.float64)
+        frame.data[len(columns):] = np.nan
+        return frame
+
+    @classmethod
+    def attach(cls, info):
+        return cls(_attach(info.name), info.columns, info.outputs, info.length, False)
+
+    @property
+    def info(self):
+        return SharedFrameInfo(self.memory.name, self.columns, self.outputs, self.length)
+
+    def column(self, name):
+        return self.data[(self.columns + self.outputs).index(name)]
+
+    def to_frame(self, columns=None):
+        """ Dataframe of the input columns, or of the given columns, as views on the block """
+        columns = self.columns if columns is None else columns
+        return pd.DataFrame({column: self.column(column) for column in columns}, copy=False)
+
+    def close(self):
+        self.data = None
+        self.memory.close()
+
+    def unlink(self):
+        self.close()
+        if self.owner:
+            self.memory.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.unlink()
+
+
+def _write_indicators(frame, indicators):
+    written = []
+    for column, values in compute_columns(frame.to_frame(), indicators).items():
+        if column in frame.outputs:
+            frame.column(column)[:] = values
+            written.append(column)
+    return written
+
+
+def compute_shared(info, indicators):
+    """ Compute indicators on the input columns of a shared frame, in a worker process,
+        and write the indicator columns that are outputs of the frame. Returns their names. """
+    frame = SharedFrame.attach(info)
+    try:
+        return _write_indicators(frame, indicators)
+    finally:
+        frame.close()
@@ -0,0 +1,212 @@
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+
+FIELDS = {
+    "time": np.int64,
+    "open": np.float64,
+    "high": np.float64,
+    "low": np.float64,
+    "close": np.float64,
+    "volume": np.float64
+}
+
+
+def klines_to_arrays(klines):
+    """ Convert klines as returned by Binance (lists of strings) into one array per field """
+    return {
+        field: np.array([kline[i] for kline in klines], dtype=dtype).reshape(-1)
+        for i, (field, dtype) in enumerate(FIELDS.items())
+    }
+
+
+def _select(arrays, mask):
+    return {field: values[mask] for field, values in arrays.items()}
+
+
+def merge_intervals(intervals):
+    """ Sorted union of [begin, end] intervals, overlapping or touching intervals are merged """
+    merged = []
+    for begin, end in sorted(intervals):
+        if merged and begin <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([begin, end])
+    return merged
+
+
+def missing_intervals(begin, end, intervals):
+    """ Parts of [begin, end] that are not covered by the sorted intervals """
+    missing = []
+    for covered_begin, covered_end in intervals:
+        if covered_end < begin:
+            continue
+        if covered_begin > end:
+            break
+        if covered_begin > begin:
+            missing.append([begin, covered_begin])
+        begin = max(begin, covered_end)
+    if begin < end:
+        missing.append([begin, end])
+    return missing
+
+
+class KlineStore:
+    """ Columnar on-disk cache of the klines of one currency at one granularity.
+        Each field is a raw fixed-width array file in {folder}/{currency}_{granularity}/,
+        read through memory maps and extended by appending to the files.
+        meta.json holds the number of klines and the intervals already requested to the exchange,
+        including those for which it had no klines, so that they are not requested again. """
+    def __init__(self, folder, currency, granularity):
+        self.folder = folder
+        self.currency = currency
+        self.granularity = granularity
+        self.path = f"{folder}/{currency}_{granularity}"
+
+    def _field_file(self, field):
+        return f"{self.path}/{field}.bin"
+
+    @property
+    def meta_file(self):
+        return f"{self.path}/meta.json"
+
+    @property
+    def legacy_file(self):
+        return f"{self.folder}/{self.currency}_{self.granularity}_data.json"
+
+    def exists(self):
+        return os.path.exists(self.meta_file)
+
+    @property
+    def meta(self):
+        with open(self.meta_file, "r") as fp:
+            meta = json.load(fp)
+        if "intervals" not in meta:  # single range written by previous versions
+            meta["intervals"] = [[meta.pop("begin"), meta.pop("end")]]
+        return meta
+
+    def _write_meta(self, meta):
+        tmp_file = f"{self.meta_file}.tmp"
+        with open(tmp_file, "w") as fp:
+            json.dump(meta, fp)
+        os.replace(tmp_file, self.meta_file)
+
+    def __len__(self):
+        return self.meta["length"] if self.exists() else 0
+
+    @property
+    def intervals(self):
+        return self.meta["intervals"] if self.exists() else []
+
+    def missing(self, begin, end):
+        """ Parts of [begin, end] that were never requested to the exchange """
+        return missing_intervals(begin, end, self.intervals)
+
+    def column(self, field, length=None):
+        """ Read-only memory-mapped array of one field """
+        length = len(self) if length is None else length
+        if not length:
+            return np.empty(0, dtype=FIELDS[field])
+        return np.memmap(self._field_file(field), dtype=FIELDS[field], mode="r", shape=(length,))
+
+    def columns(self):
+        length = len(self)
+        return {field: self.column(field, length) for field in FIELDS}
+
+    def write(self, arrays, intervals):
+        """ Replace the content of the cache.
+            Files are replaced rather than overwritten, so that arrays already mapped stay valid. """
+        os.makedirs(self.path, exist_ok=True)
+        for field, dtype in FIELDS.items():
+            tmp_file = f"{self._field_file(field)}.tmp"
+            with open(tmp_file, "wb") as fp:
+                fp.write(np.ascontiguousarray(arrays[field], dtype=dtype).tobytes())
+            os.replace(tmp_file, self._field_file(field))
+        self._write_meta({"length": len(arrays["time"]), "intervals": merge_intervals(intervals)})
+
+    def _append(self, arrays, meta, index):
+        """ Replace the klines from index on, index being at most the number of cached klines.
+            New klines are appended to the files in place. When cached klines are replaced, the
+            files are copied first and the copies replace them, so that arrays already mapped on
+            the files keep their values, as with write(). """
+        for field, dtype in FIELDS.items():
+            itemsize = np.dtype(dtype).itemsize
+            filename = self._field_file(field)
+            target = filename
+            if index < meta["length"]:
+                target = f"{filename}.tmp"
+                shutil.copyfile(filename, target)
+            with open(target, "r+b") as fp:
+                # also drops what a previous interrupted append may have left after the last kline
+                fp.truncate(index * itemsize)
+                fp.seek(0, os.SEEK_END)
+                fp.write(np.ascontiguousarray(arrays[field], dtype=dtype).tobytes())
+            if target != filename:
+                os.replace(target, filename)
+        meta["length"] = index + len(arrays["time"])
+
+    def merge(self, arrays, begin, end):
+        """ Insert klines fetched for [begin, end] and mark the interval as requested.
+            A kline already cached with the same open time is replaced (e.g. a kline that was
+            still open when it was cached). Klines opened at or after the last cached one are
+            appended to the files, replacing the last one if they start with it, e.g. when a
+            range ending now is refreshed (see _append()). Other cases, such as filling a hole,
+            rewrite them. """
+        if not self.exists():
+            order = np.argsort(arrays["time"], kind="stable")
+            self.write(_select(arrays, order), [[begin, end]])
+            return
+
+        meta = self.meta
+        meta["intervals"] = merge_intervals(meta["intervals"] + [[begin, end]])
+        times = self.column("time", meta["length"])
+        new_times = arrays["time"]
+        if not len(new_times):
+            self._write_meta(meta)
+        elif not len(times) or (np.all(np.diff(new_times) > 0) and new_times[0] >= times[-1]):
+            self._append(arrays, meta, int(np.searchsorted(times, new_times[0], side="left")))
+            self._write_meta(meta)
+        else:
+            existing = {field: np.array(values) for field, values in self.columns().items()}
+            merged = {field: np.concatenate([arrays[field], existing[field]]) for field in FIELDS}
+            # np.unique keeps the first occurrence of each open time, i.e. the new kline
+            _, indexes = np.unique(merged["time"], return_index=True)
+            self.write(_select(merged, indexes), meta["intervals"])
+
+    def find(self, begin, end):
+        """ Indexes of the first kline opened at or after begin,
+            and of the one following the last kline opened at or before end """
+        times = self.column("time")
+        return (
+            int(np.searchsorted(times, begin, side="left")),
+            int(np.searchsorted(times, end, side="right"))
+        )
+
+    def to_frame(self, index_begin=0, index_end=None):
+        """ Dataframe of the klines between two indexes, with float64 columns.
+            Price and volume columns are views on the mapped files when pandas allows it. """
+        columns = self.columns()
+        return pd.DataFrame({
+            field: values[index_begin:index_end].astype(np.float64, copy=False)
+            for field, values in columns.items()
+        }, copy=False)
+
+    def remove(self):
+        shutil.rmtree(self.path, ignore_errors=True)
+
+    def migrate_json(self):
+        """ Convert the json file used by previous versions into the columnar format.
+            Returns False if there is no json file to convert. """
+        try:
+            with open(self.legacy_file, "r") as fp:
+                data = json.load(fp)["data"]
+        except (FileNotFoundError, json.JSONDecodeError):
+            return False
+        if data["klines"]:
+            self.write(klines_to_arrays(data["klines"]), [[data["begin"], data["end"]]])
+        os.remove(self.legacy_file)
+        return bool(data["klines"])
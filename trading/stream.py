@@ -0,0 +1,191 @@
+""" Live klines pushed by a websocket feed, instead of polling get_historical_klines.
+    Messages follow the Binance kline stream format:
+        {"e": "kline", "E": event time, "s": symbol, "k": {"t": open time, "T": close time, "i": interval,
+         "o": open, "h": high, "l": low, "c": close, "v": volume, "x": whether the kline is closed}}
+    A StreamIngestor updates incremental indicator states with the closed klines, checks rules on
+    the new values, then appends the klines to the cache. replay() and serve_replay() play cached
+    klines back in this format, so the whole path runs offline.
+    The websockets package is only needed to connect to or serve an actual websocket. """
+import asyncio
+import json
+import time
+from collections import deque
+
+import numpy as np
+
+import trading.config as cfg
+from trading.get_data import g_mapping
+from trading.store import KlineStore, klines_to_arrays
+
+try:
+    import websockets
+except ImportError:  # websockets is optional
+    websockets = None
+
+
+BINANCE_STREAM_URL = "wss://stream.binance.com:9443/ws"
+
+
+def _require_websockets():
+    if websockets is None:
+        raise ImportError("The websockets package is needed to use a websocket feed: pip install websockets")
+
+
+class LatencyStats:
+    """ Delays in ms between the emission of klines and the signals computed from them,
+        over the last size klines """
+    def __init__(self, size=10000):
+        self.samples = deque(maxlen=size)
+        self.count = 0
+
+    def add(self, latency):
+        self.samples.append(latency)
+        self.count += 1
+
+    def summary(self):
+        if not self.samples:
+            return {"count": self.count}
+        samples = np.array(self.samples)
+        return {
+            "count": self.count,
+            "mean": float(samples.mean()),
+            "p50": float(np.percentile(samples, 50)),
+            "p95": float(np.percentile(samples, 95)),
+            "p99": float(np.percentile(samples, 99)),
+            "max": float(samples.max()),
+        }
+
+
+class StreamIngestor:
+    """ Consumer of the kline messages of one currency at one granularity.
+        indicators is a dict column -> (IndicatorState, list of input fields), e.g.
+        {"RSI14": (RSIState(14), ["close"])}. States returning several values (ADXState) are given
+        a tuple of columns. rules are Rule objects checked on the candle fields and the indicator
+        values after each closed kline, on_signal(ingestor, rule, kline) is called for each match. """
+    def __init__(self, currency, granularity, indicators=None, rules=(), on_signal=None,
+                 folder=cfg.COINS_FOLDER, store=True):
+        self.currency = currency
+        self.granularity = granularity
+        self.period = int(g_mapping[granularity])
+        self.indicators = indicators or {}
+        self.rules = list(rules)
+        self.on_signal = on_signal
+        self.store = KlineStore(folder, currency, granularity) if store else None
+        self.values = {}
+        self.last_time = None
+        self.updates = 0
+        self.latency = LatencyStats()
+
+    def warm_up(self, df):
+        """ Feed the states with the candles of df, older than the streamed ones """
+        if df.empty:
+            return  # the states start with the streamed klines
+        for columns, (state, fields) in self.indicators.items():
+            values = state.update_many(*(df[field] for field in fields))
+            self._set_values(columns, tuple(v[-1] for v in values) if isinstance(values, tuple) else values[-1])
+        self.last_time = int(df["time"].iloc[-1])
+
+    def _set_values(self, columns, values):
+        if isinstance(columns, tuple):
+            self.values.update(zip(columns, values))
+        else:
+            self.values[columns] = values
+
+    def on_message(self, message):
+        """ Handle one message (json text or dict). Returns the rules matched by a closed kline. """
+        data = json.loads(message) if isinstance(message, (str, bytes)) else message
+        kline = data.get("k")
+        if data.get("e") != "kline" or kline is None or data.get("s", kline.get("s")) != self.currency:
+            return []
+        if not kline["x"]:  # kline still open, it comes again once closed
+            self.updates += 1
+            return []
+        open_time = int(kline["t"])
+        if self.last_time is not None and open_time <= self.last_time:
+            return []  # already seen, e.g. after a reconnection
+
+        candle = {
+            "time": open_time, "open": float(kline["o"]), "high": float(kline["h"]),
+            "low": float(kline["l"]), "close": float(kline["c"]), "volume": float(kline["v"]),
+        }
+        for columns, (state, fields) in self.indicators.items():
+            self._set_values(columns, state.update(*(candle[field] for field in fields)))
+        self.last_time = open_time
+
+        values = {name: np.array([value], dtype=np.float64) for name, value in {**candle, **self.values}.items()}
+        matches = [rule for rule in self.rules if all(column in values for column in rule.columns)
+                   and rule.evaluate(values)[0]]
+        for rule in matches:
+            if self.on_signal is not None:
+                self.on_signal(self, rule, candle)
+        if "E" in data:
+            self.latency.add(time.time() * 1000 - data["E"])
+
+        # the cache is written once the signals are out
+        if self.store is not None:
+            row = [candle["time"], kline["o"], kline["h"], kline["l"], kline["c"], kline["v"]]
+            # touching intervals are merged, so a continuous stream keeps one interval
+            self.store.merge(klines_to_arrays([row]), open_time, open_time + self.period)
+        return matches
+
+
+async def ingest(messages, ingestor, max_klines=None):
+    """ Feed the messages of an async iterable to ingestor, stopping after max_klines closed klines """
+    closed = 0
+    async for message in messages:
+        before = ingestor.last_time
+        ingestor.on_message(message)
+        if ingestor.last_time != before:
+            closed += 1
+            if max_klines is not None and closed >= max_klines:
+                return
+
+
+async def connect(currency, granularity, url=BINANCE_STREAM_URL):
+    """ Async iterator of the messages of the kline stream of a currency """
+    _require_websockets()
+    async with websockets.connect(f"{url}/{currency.lower()}@kline_{granularity}") as websocket:
+        async for message in websocket:
+            yield message
+
+
+def kline_messages(df, currency, granularity, updates_per_kline=0):
+    """ Kline messages from the candles of df, without event time. Each closed kline is preceded
+        by updates_per_kline messages of the kline still open, built from its open and close. """
+    period = int(g_mapping[granularity])
+    for time_, open_, high, low, close, volume in df[["time", "open", "high", "low", "close", "volume"]].itertuples(index=False):
+        for update in range(1, updates_per_kline + 1):
+            fraction = update / (updates_per_kline + 1)
+            price = open_ + (close - open_) * fraction
+            yield {"e": "kline", "s": currency, "k": {
+                "t": int(time_), "T": int(time_) + period - 1, "i": granularity, "o": str(open_),
+                "h": str(max(open_, price)), "l": str(min(open_, price)), "c": str(price),
+                "v": str(volume * fraction), "x": False
+            }}
+        yield {"e": "kline", "s": currency, "k": {
+            "t": int(time_), "T": int(time_) + period - 1, "i": granularity, "o": str(open_),
+            "h": str(high), "l": str(low), "c": str(close), "v": str(volume), "x": True
+        }}
+
+
+async def replay(df, currency, granularity, speed=None, updates_per_kline=0):
+    """ Async iterator of the kline messages of the candles of df, as json text.
+        speed is the number of klines per second of real time, as fast as possible if None. """
+    delay = 0 if not speed else 1 / speed / (updates_per_kline + 1)
+    for message in kline_messages(df, currency, granularity, updates_per_kline):
+        if delay:
+            await asyncio.sleep(delay)
+        message["E"] = time.time() * 1000
+        yield json.dumps(message)
+
+
+async def serve_replay(df, currency, granularity, host="localhost", port=8765, speed=None, updates_per_kline=0):
+    """ Websocket server replaying the candles of df to each client, see replay().
+        Returns the server, to be closed by the caller. """
+    _require_websockets()
+
+    async def handler(websocket):
+        async for message in replay(df, currency, granularity, speed, updates_per_kline):
+            await websocket.send(message)
+
+    return await websockets.serve(handler, host, port)